@@ -0,0 +1,165 @@
+# benchmarks/compact_output.py
+"""
+Compare the markup and compact output formats of `NerAgent.run`.
+
+Without `--model`, encodes the reference entities of each sample in both
+formats and reports the estimated output tokens. With `--model`, also calls the
+model `--repeat` times per sample and format and reports the output tokens the
+provider counted, the median latency and how many entities came back.
+
+    python benchmarks/compact_output.py
+    python benchmarks/compact_output.py --model gemma3n:e4b \
+        --base-url http://localhost:11434/v1 --api-key ollama
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import agents
+import openai
+
+from ner_agent import (
+    EntityType,
+    NerAgent,
+    _estimate_tokens,
+    _segment_text,
+    compact_type_codes,
+)
+
+SAMPLES: list[tuple[str, list[tuple[str, EntityType]]]] = [
+    (
+        "Elon Musk visited Tesla's Gigafactory in Austin on March 15, 2024, "
+        "and announced a 20% increase.",
+        [
+            ("Elon Musk", EntityType.PERSON),
+            ("Tesla", EntityType.PROPER_NOUN),
+            ("Gigafactory", EntityType.LOCATION),
+            ("Austin", EntityType.LOCATION),
+            ("March 15, 2024", EntityType.DATETIME),
+            ("20%", EntityType.NUMERIC),
+        ],
+    ),
+    (
+        "The International Business Machines Corporation and the Massachusetts "
+        "Institute of Technology opened the MIT-IBM Watson AI Lab in Cambridge, "
+        "Massachusetts in September 2017 with a $240 million commitment.",
+        [
+            ("International Business Machines Corporation", EntityType.PROPER_NOUN),
+            ("Massachusetts Institute of Technology", EntityType.PROPER_NOUN),
+            ("MIT-IBM Watson AI Lab", EntityType.LOCATION),
+            ("Cambridge", EntityType.LOCATION),
+            ("Massachusetts", EntityType.LOCATION),
+            ("September 2017", EntityType.DATETIME),
+            ("$240 million", EntityType.NUMERIC),
+        ],
+    ),
+    (
+        "La presidenta mexicana visitó la sede de las Naciones Unidas en Nueva "
+        "York el martes pasado para discutir los derechos humanos.",
+        [
+            ("mexicana", EntityType.NORP),
+            ("Naciones Unidas", EntityType.PROPER_NOUN),
+            ("Nueva York", EntityType.LOCATION),
+            ("martes pasado", EntityType.DATETIME),
+        ],
+    ),
+    (
+        "蘋果公司在台北101發表了iPhone 15，預計售價為新台幣35,000元",
+        [
+            ("蘋果公司", EntityType.PROPER_NOUN),
+            ("台北101", EntityType.LOCATION),
+            ("iPhone 15", EntityType.PROPER_NOUN),
+            ("新台幣35,000元", EntityType.NUMERIC),
+        ],
+    ),
+]
+
+_TYPE_CODES = {entity_type: code for code, entity_type in compact_type_codes.items()}
+
+
+def encode_markup(entities: list[tuple[str, EntityType]]) -> str:
+    items = [f"[{value}](#{entity_type})" for value, entity_type in entities]
+    return " | ".join(items + ["[done](#DONE)"])
+
+
+def encode_compact(text: str, entities: list[tuple[str, EntityType]]) -> str:
+    """Encode entities the way the compact format asks the model to."""
+    segments = _segment_text(text)
+    starts = {start: idx for idx, (start, _) in enumerate(segments)}
+    ends = {end: idx for idx, (_, end) in enumerate(segments)}
+    items: list[str] = []
+    pos = 0
+    for value, entity_type in entities:
+        start = text.index(value, pos)
+        end = pos = start + len(value)
+        code = _TYPE_CODES[entity_type]
+        if start in starts and end in ends:
+            first, last = starts[start], ends[end]
+            items.append(f"{code}{first}" if first == last else f"{code}{first}-{last}")
+        else:
+            items.append(f"{code}={value}")
+    return "|".join(items + ["END"])
+
+
+async def _timed_run(agent: NerAgent, text: str, model, compact: bool):
+    method = "run_compact" if compact else "run"
+    instructions, agent_input = agent._render_prompt(method, text)
+    started = time.perf_counter()
+    result = await agents.Runner.run(
+        agents.Agent(name="benchmark", model=model, instructions=instructions),
+        agent_input,
+        run_config=agents.RunConfig(tracing_disabled=True),
+    )
+    elapsed = time.perf_counter() - started
+    output = str(result.final_output)
+    entities = (
+        agent._parse_compact_entities(output, text)
+        if compact
+        else agent._parse_entities(output, text)
+    )
+    return result.context_wrapper.usage.output_tokens, elapsed, len(entities)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model", help="chat model to call; estimates only if unset")
+    parser.add_argument("--base-url")
+    parser.add_argument("--api-key")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print("estimated output tokens (markup -> compact)")
+    total_markup = total_compact = 0
+    for text, entities in SAMPLES:
+        markup = _estimate_tokens(encode_markup(entities))
+        compact = _estimate_tokens(encode_compact(text, entities))
+        total_markup += markup
+        total_compact += compact
+        print(f"  {markup:4d} -> {compact:4d}  {text[:48]}")
+    print(f"  total {total_markup} -> {total_compact}")
+
+    if not args.model:
+        return
+
+    agent = NerAgent()
+    model = agents.OpenAIChatCompletionsModel(
+        model=args.model,
+        openai_client=openai.AsyncOpenAI(base_url=args.base_url, api_key=args.api_key),
+    )
+    print(f"\n{args.model}: output tokens / median latency / entities")
+    for text, _ in SAMPLES:
+        row = []
+        for compact in (False, True):
+            runs = [
+                await _timed_run(agent, text, model, compact)
+                for _ in range(args.repeat)
+            ]
+            tokens = statistics.median(r[0] for r in runs)
+            latency = statistics.median(r[1] for r in runs)
+            row.append(f"{tokens:5.0f} {latency:6.2f}s {runs[-1][2]:2d}")
+        print(f"  markup {row[0]} | compact {row[1]}  {text[:32]}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,8 @@
 # ner_agent/__init__.py
+import asyncio
+import bisect
+import functools
+import hashlib
 import json
 import logging
 import pathlib
@@ -10,17 +14,55 @@ from dataclasses import asdict
 from enum import StrEnum
 
 import agents
+import httpx
 import jinja2
 import openai
 import pydantic
 from openai.types import ChatModel
+from openai.types.responses import ResponseTextDeltaEvent
 from str_or_none import str_or_none
 
+from ner_agent.cache import Cache, LRUCache, SQLiteCache, TieredCache  # noqa: F401
+from ner_agent.fewshot import (  # noqa: F401
+    DEFAULT_FEW_SHOT_EXAMPLES,
+    DEFAULT_MAX_EXAMPLES,
+    FewShotExample,
+    detect_scripts,
+    select_examples,
+)
+from ner_agent.gazetteer import Gazetteer  # noqa: F401
+from ner_agent.graph import RELATIONS, KnowledgeGraph  # noqa: F401
+from ner_agent.hedging import HedgePolicy, LatencyTracker  # noqa: F401
+from ner_agent.ratelimit import RateLimiter, Reservation, TokenBucket  # noqa: F401
+from ner_agent.rules import RuleRecognizer  # noqa: F401
+from ner_agent.spans import (  # noqa: F401
+    AhoCorasick,
+    NormalizedText,
+    SpanResolver,
+    leftmost_longest,
+)
+from ner_agent.synonyms import (  # noqa: F401
+    SynonymVerdict,
+    SynonymVerdictStore,
+    UnionFind,
+)
+
 __version__ = pathlib.Path(__file__).parent.joinpath("VERSION").read_text().strip()
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_MODEL = "gpt-4.1-nano"
+DEFAULT_CONCURRENCY = 8
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+DEFAULT_PACK_TOKEN_BUDGET = 1024
+DEFAULT_MAX_PACK_SIZE = 32
+DEFAULT_CHUNK_CHARS = 2000
+DEFAULT_CHUNK_OVERLAP_SENTENCES = 1
+STATIC_TEMPLATE_CACHE_SIZE = 256
+
+T = typing.TypeVar("T")
 
 
 class EntityType(StrEnum):
@@ -63,6 +105,18 @@ legacy_entity_map = types.MappingProxyType(
     }
 )
 
+# One-letter type codes of the compact output format.
+compact_type_codes = types.MappingProxyType(
+    {
+        "P": EntityType.PERSON,
+        "N": EntityType.NORP,
+        "L": EntityType.LOCATION,
+        "D": EntityType.DATETIME,
+        "Q": EntityType.NUMERIC,
+        "O": EntityType.PROPER_NOUN,
+    }
+)
+
 
 class NerAgent:
     instructions: str = textwrap.dedent(
@@ -77,35 +131,121 @@ class NerAgent:
         {% endfor %}
 
         # Examples
+        {% for example in examples %}
+        text: '''{{ example.text }}'''
+        entities: {% for value, entity_type in example.entities %}[{{ value }}](#{{ entity_type }}) | {% endfor %}[done](#DONE)
+        {% endfor %}
+        """  # noqa: E501
+    )
+    input_template: str = textwrap.dedent(
+        """
+        text: '''{{ text }}'''
+        entities:
+        """
+    )
 
-        text: '''Elon Musk visited Tesla's Gigafactory in Austin on March 15, 2024, and announced a 20% increase.'''
-        entities: [Elon Musk](#PERSON) | [Tesla](#PROPER_NOUN) | [Gigafactory](#LOCATION) | [Austin](#LOCATION) | [March 15, 2024](#DATETIME) | [20%](#NUMERIC) | [done](#DONE)
+    hybrid_instructions: str = textwrap.dedent(
+        """
+        Your task is to perform named entity recognition (NER) on the given text.
+        Dates, times and numbers are extracted separately; do not tag them.
+        Output format: [ENTITY_TEXT](#ENTITY_TYPE) separated by " | " (pipes).
+        Example: [Apple](#PROPER_NOUN) | [Taipei 101](#LOCATION) | [Tim Cook](#PERSON)
+
+        # Entity Definitions
+        {% for entity_type, entity_description in entity_descriptions.items() -%}
+        {% if entity_type not in ("DATETIME", "NUMERIC") -%}
+        - {{ entity_type }}: {{ entity_description }}
+        {% endif -%}
+        {% endfor %}
 
-        text: '''La presidenta mexicana visitó la sede de las Naciones Unidas en Nueva York el martes pasado para discutir los derechos humanos.'''
-        entities: [mexicana](#NORP) | [Naciones Unidas](#PROPER_NOUN) | [Nueva York](#LOCATION) | [martes pasado](#DATETIME) | [derechos humanos](#PROPER_NOUN) | [done](#DONE)
+        # Examples
+        {% for example in examples %}
+        text: '''{{ example.text }}'''
+        entities: {% for value, entity_type in example.entities if entity_type not in ("DATETIME", "NUMERIC") %}[{{ value }}](#{{ entity_type }}) | {% endfor %}[done](#DONE)
+        {% endfor %}
+        """  # noqa: E501
+    )
 
-        text: '''蘋果公司在台北101發表了iPhone 15，預計售價為新台幣35,000元'''
-        entities: [蘋果公司](#PROPER_NOUN) | [台北101](#LOCATION) | [iPhone 15](#PROPER_NOUN) | [新台幣35,000元](#NUMERIC) | [done](#DONE)
+    compact_instructions: str = textwrap.dedent(
+        """
+        Your task is to perform named entity recognition (NER) on the given text.
+        {% if hybrid -%}
+        Dates, times and numbers are extracted separately; do not tag them.
+        {% endif -%}
+        The text is also given as numbered segments. Refer to each entity by its type code and segment numbers instead of copying its text:
+        - CODE<first>-<last> for an entity spanning several segments, e.g. P0-1
+        - CODE<n> for an entity that is one whole segment, e.g. L8
+        - CODE=<exact text> only when the entity is part of a segment, e.g. L=台北101
+        Separate entities with "|", list them in order of appearance and end with END.
+
+        # Type Codes
+        {% for code, entity_type in compact_type_codes.items() -%}
+        {% if not hybrid or entity_type not in ("DATETIME", "NUMERIC") -%}
+        - {{ code }} ({{ entity_type }}): {{ entity_descriptions[entity_type] }}
+        {% endif -%}
+        {% endfor %}
+
+        # Examples
 
-        text: '''東京オリンピックで日本人選手が金メダルを獲得し、君が代が演奏された。'''
-        entities: [東京オリンピック](#PROPER_NOUN) | [日本人](#NORP) | [金メダル](#PROPER_NOUN) | [君が代](#PROPER_NOUN) | [done](#DONE)
+        text: '''Elon Musk visited Tesla's Gigafactory in Austin on March 15, 2024, and announced a 20% increase.'''
+        segments: 0:Elon 1:Musk 2:visited 3:Tesla 4:' 5:s 6:Gigafactory 7:in 8:Austin 9:on 10:March 11:15 12:, 13:2024 14:, 15:and 16:announced 17:a 18:20 19:% 20:increase 21:.
+        entities: P0-1|O3|L6|L8|{% if not hybrid %}D10-13|Q18-19|{% endif %}END
 
-        text: '''삼성전자는 서울 강남구에서 오전 9시에 갤럭시 S24를 공개했고, 한국어 AI 기능을 강조했다.'''
-        entities: [삼성전자](#PROPER_NOUN) | [서울](#LOCATION) | [강남구](#LOCATION) | [오전 9시](#DATETIME) | [갤럭시 S24](#PROPER_NOUN) | [한국어](#NORP) | [done](#DONE)
+        text: '''蘋果公司在台北101發表了iPhone 15，預計售價為新台幣35,000元'''
+        segments: 0:蘋果公司在台北 1:101 2:發表了 3:iPhone 4:15 5:， 6:預計售價為新台幣 7:35,000 8:元
+        entities: O=蘋果公司|L=台北101|O3-4|{% if not hybrid %}Q=新台幣35,000元|{% endif %}END
 
         text: '''The Buddhist monks from Mount Fuji will perform at Carnegie Hall next Friday, celebrating the first anniversary of their Peace Treaty.'''
-        entities: [Buddhist](#NORP) | [Mount Fuji](#LOCATION) | [Carnegie Hall](#LOCATION) | [next Friday](#DATETIME) | [first](#NUMERIC) | [Peace Treaty](#PROPER_NOUN) | [done](#DONE)
+        segments: 0:The 1:Buddhist 2:monks 3:from 4:Mount 5:Fuji 6:will 7:perform 8:at 9:Carnegie 10:Hall 11:next 12:Friday 13:, 14:celebrating 15:the 16:first 17:anniversary 18:of 19:their 20:Peace 21:Treaty 22:.
+        entities: N1|L4-5|L9-10|{% if not hybrid %}D11-12|Q16|{% endif %}O20-21|END
 
         text: '''L'Hôpital Saint-Louis est un des hôpitaux de Paris.'''
-        entities: [L'Hôpital Saint-Louis](#LOCATION) | [hôpitaux](#LOCATION) | [Paris](#LOCATION) | [done](#DONE)
-
-        # Input
-
+        segments: 0:L 1:' 2:Hôpital 3:Saint 4:- 5:Louis 6:est 7:un 8:des 9:hôpitaux 10:de 11:Paris 12:.
+        entities: L0-5|L9|L11|END
+        """  # noqa: E501
+    )
+    compact_input_template: str = textwrap.dedent(
+        """
         text: '''{{ text }}'''
+        segments: {% for segment in segments %}{% if not loop.first %} {% endif %}{{ loop.index0 }}:{{ segment }}{% endfor %}
         entities:
         """  # noqa: E501
     )
 
+    packed_instructions: str = textwrap.dedent(
+        """
+        Your task is to perform named entity recognition (NER) on each of the given texts.
+        Every text is introduced by its id. Answer with exactly one line per text, in the same order:
+        id: ID entities: [ENTITY_TEXT](#ENTITY_TYPE) | [ENTITY_TEXT](#ENTITY_TYPE) | [done](#DONE)
+        Only tag entities that appear in the text with the same id.
+
+        # Entity Definitions
+        {% for entity_type, entity_description in entity_descriptions.items() -%}
+        - {{ entity_type }}: {{ entity_description }}
+        {% endfor %}
+
+        # Examples
+
+        id: 0 text: '''Elon Musk visited Tesla's Gigafactory in Austin on March 15, 2024, and announced a 20% increase.'''
+        id: 1 text: '''蘋果公司在台北101發表了iPhone 15，預計售價為新台幣35,000元'''
+        id: 2 text: '''The weather is nice.'''
+        id: 3 text: '''L'Hôpital Saint-Louis est un des hôpitaux de Paris.'''
+        output:
+        id: 0 entities: [Elon Musk](#PERSON) | [Tesla](#PROPER_NOUN) | [Gigafactory](#LOCATION) | [Austin](#LOCATION) | [March 15, 2024](#DATETIME) | [20%](#NUMERIC) | [done](#DONE)
+        id: 1 entities: [蘋果公司](#PROPER_NOUN) | [台北101](#LOCATION) | [iPhone 15](#PROPER_NOUN) | [新台幣35,000元](#NUMERIC) | [done](#DONE)
+        id: 2 entities: [done](#DONE)
+        id: 3 entities: [L'Hôpital Saint-Louis](#LOCATION) | [hôpitaux](#LOCATION) | [Paris](#LOCATION) | [done](#DONE)
+        """  # noqa: E501
+    )
+    packed_input_template: str = textwrap.dedent(
+        """
+        {% for text in texts -%}
+        id: {{ loop.index0 }} text: '''{{ text }}'''
+        {% endfor -%}
+        output:
+        """
+    )
+
     simple_entities_instructions: str = textwrap.dedent(
         """
         ## ROLE: Named Entity Recognition (NER) Specialist
@@ -130,12 +270,15 @@ class NerAgent:
         Input: "台北文華東方酒店座落於台北市繁華商業中心與人文薈萃的敦化北路"
         Output:
         {% raw %}{"entities": ["台北文華東方酒店", "台北市繁華商業中心", "敦化北路"]}{% endraw %}
-
+        """  # noqa: E501
+    )
+    simple_entities_input_template: str = textwrap.dedent(
+        """
         ## TASK:
 
         Input: "{{ fact_text }}"
         Output:
-        """  # noqa: E501
+        """
     )
 
     synonyms_and_canonical_name_instructions: str = textwrap.dedent(
@@ -197,11 +340,15 @@ class NerAgent:
         "canonical_name": null
         }
 
+        """  # noqa: E501
+    )
+    synonyms_and_canonical_name_input_template: str = textwrap.dedent(
+        """
         ## TASK:
 
         Input: `{{ candidate_list }}`
         Output:
-        """  # noqa: E501
+        """
     )
 
     relation_extraction_instructions: str = textwrap.dedent(
@@ -264,13 +411,142 @@ class NerAgent:
             {"subject": "Mayo Clinic", "relation": "related_to", "object": "cardiology"}
         ]
         }{% endraw %}
-
+        """  # noqa: E501
+    ).strip()
+    relation_extraction_input_template: str = textwrap.dedent(
+        """
         ## TASK:
 
         Input: "{{ fact_text }}"
         Output:
+        """
+    )
+
+    joint_extraction_instructions: str = textwrap.dedent(
+        """
+        ## ROLE: Entity and Relation Extractor
+
+        You will be given a single text. In one pass, identify its named entities and the relationships between them.
+
+        ## ENTITY TYPES:
+        {% for entity_type, entity_description in entity_descriptions.items() -%}
+        - {{ entity_type }}: {{ entity_description }}
+        {% endfor %}
+        ## RELATION TYPES (use ONLY these):
+        - `is_a`: one entity IS A TYPE OF another.
+        - `has_a`: one entity HAS, OWNS, or CONTAINS another.
+        - `related_to`: any other association, like actions, locations, or conceptual links.
+
+        ## INSTRUCTIONS:
+        1.  **Entities**: List every entity in order of appearance. `text` MUST be copied exactly from the input; `type` MUST be one of the entity types.
+        2.  **Triplets**: Connect entities with `subject` and `object` given as the 0-based index of an entity in your `entities` list. Only relate entities you listed.
+        3.  **Output Format**: You MUST return a single JSON object with the keys "entities" and "triplets". Return empty lists if nothing is found.
+
+        ## EXAMPLES:
+
+        ### Example 1
+        Input: "LeBron James plays for the Los Angeles Lakers in Los Angeles."
+        Output:
+        {% raw %}{
+        "entities": [
+            {"text": "LeBron James", "type": "PERSON"},
+            {"text": "Los Angeles Lakers", "type": "PROPER_NOUN"},
+            {"text": "Los Angeles", "type": "LOCATION"}
+        ],
+        "triplets": [
+            {"subject": 0, "relation": "related_to", "object": 1},
+            {"subject": 1, "relation": "related_to", "object": 2}
+        ]
+        }{% endraw %}
+
+        ### Example 2
+        Input: "蘋果公司在台北101發表了iPhone 15"
+        Output:
+        {% raw %}{
+        "entities": [
+            {"text": "蘋果公司", "type": "PROPER_NOUN"},
+            {"text": "台北101", "type": "LOCATION"},
+            {"text": "iPhone 15", "type": "PROPER_NOUN"}
+        ],
+        "triplets": [
+            {"subject": 0, "relation": "has_a", "object": 2},
+            {"subject": 0, "relation": "related_to", "object": 1}
+        ]
+        }{% endraw %}
         """  # noqa: E501
     ).strip()
+    joint_extraction_input_template: str = textwrap.dedent(
+        """
+        ## TASK:
+
+        Input: "{{ text }}"
+        Output:
+        """
+    )
+
+    def __init__(
+        self,
+        *,
+        cache: typing.Optional[Cache] = None,
+        base_url: typing.Optional[str] = None,
+        api_key: typing.Optional[str] = None,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        single_flight: bool = True,
+        rate_limits: typing.Optional[typing.Mapping[str, RateLimiter]] = None,
+        hedging: typing.Optional[HedgePolicy] = None,
+        rule_recognizer: typing.Optional[RuleRecognizer] = None,
+        gazetteer: typing.Optional[Gazetteer] = None,
+        synonym_store: typing.Optional[SynonymVerdictStore] = None,
+        few_shot_examples: typing.Optional[typing.Sequence[FewShotExample]] = None,
+        max_few_shot_examples: int = DEFAULT_MAX_EXAMPLES,
+    ):
+        self.cache = cache
+        self.single_flight = single_flight
+        self.rate_limits = dict(rate_limits or {})
+        self.hedging = hedging
+        self.rule_recognizer = rule_recognizer or RuleRecognizer()
+        self.gazetteer = gazetteer
+        self.synonym_store = synonym_store
+        self.few_shot_examples = (
+            DEFAULT_FEW_SHOT_EXAMPLES
+            if few_shot_examples is None
+            else _freeze_examples(few_shot_examples)
+        )
+        self.max_few_shot_examples = max_few_shot_examples
+        self.base_url = base_url
+        self.api_key = api_key
+        self.http_limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+
+        # Clients and chat models built from model names are owned by the agent
+        # and reused across calls; `aclose` releases their connections.
+        self._openai_clients: dict[
+            tuple[str | None, str | None], openai.AsyncOpenAI
+        ] = {}
+        self._chat_models: dict[str, agents.OpenAIResponsesModel] = {}
+
+        # Model calls in flight, keyed like the cache, so identical concurrent
+        # requests share one call.
+        self._in_flight: dict[str, asyncio.Task[agents.RunResult]] = {}
+
+    async def __aenter__(self) -> "NerAgent":
+        return self
+
+    async def __aexit__(self, *exc_info: typing.Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the OpenAI clients owned by this agent."""
+        clients = list(self._openai_clients.values())
+        self._openai_clients.clear()
+        self._chat_models.clear()
+        for client in clients:
+            await client.close()
 
     async def run(
         self,
@@ -286,25 +562,94 @@ class NerAgent:
         model_settings: typing.Optional[agents.ModelSettings] = None,
         tracing_disabled: bool = True,
         verbose: bool = False,
+        escalation_model: (
+            agents.OpenAIChatCompletionsModel
+            | agents.OpenAIResponsesModel
+            | ChatModel
+            | str
+            | None
+        ) = None,
+        hybrid: bool = False,
+        compact: bool = False,
+        few_shot_examples: typing.Optional[typing.Sequence[FewShotExample]] = None,
         **kwargs,
     ) -> "NerResult":
+        """
+        Extract entities from `text`. With `escalation_model`, outputs that look
+        unreliable (unresolved spans, unknown entity types or a missing `DONE`
+        marker) are redone with that model.
+
+        With `hybrid`, DATETIME and NUMERIC entities are found locally by
+        `rule_recognizer` and the model is asked only for the other types. With
+        a `gazetteer`, its known surfaces are tagged locally as well. Where a
+        local match overlaps a model entity, the model entity is kept; texts
+        with no letters outside the local matches skip the model entirely.
+
+        With `compact`, the text is also sent as numbered segments and the model
+        answers with one-letter type codes and segment ranges (`P0-1|L8|END`),
+        copying text only for entities inside a segment. This shortens the
+        output, which dominates the latency of a call.
+
+        The prompt carries only the examples from `few_shot_examples` written
+        in the scripts of `text`; pass `few_shot_examples` to pick them by hand.
+        """
         if str_or_none(text) is None:
             raise ValueError("text is required")
 
         chat_model = self._to_chat_model(model)
-
-        agent_instructions: str = (
-            jinja2.Template(self.instructions)
-            .render(
-                text=text,
-                entity_descriptions=entity_descriptions,
+        escalation_chat_model = (
+            None if escalation_model is None else self._to_chat_model(escalation_model)
+        )
+        method = ("run_compact" if compact else "run") + ("_hybrid" if hybrid else "")
+        if compact:
+            templates: tuple[str, ...] = (
+                self.compact_instructions,
+                self.compact_input_template,
+                json.dumps(dict(compact_type_codes)),
+            )
+        else:
+            examples = self._few_shot_examples(text, few_shot_examples)
+            templates = (
+                self.hybrid_instructions if hybrid else self.instructions,
+                self.input_template,
+                json.dumps(examples, ensure_ascii=False),
+            )
+        templates += (json.dumps(dict(entity_descriptions)),)
+        if hybrid:
+            templates += (
+                json.dumps([[t, p.pattern] for t, p in self.rule_recognizer.rules]),
             )
-            .strip()
+        if self.gazetteer is not None:
+            self.gazetteer.compile()
+            templates += (f"gazetteer:{self.gazetteer.fingerprint}",)
+
+        cache_key = self._cache_key(
+            method,
+            chat_model,
+            model_settings,
+            templates=templates,
+            payload=_cascade_payload(text, escalation_chat_model),
+        )
+        if (cached := self._cache_get(cache_key, NerResult)) is not None:
+            return cached
+
+        local_entities = self._local_entities(text, hybrid=hybrid)
+        if (hybrid or self.gazetteer is not None) and not _has_text_outside(
+            text, local_entities
+        ):
+            ner_result = NerResult(text=text, entities=local_entities)
+            self._cache_set(cache_key, ner_result)
+            return ner_result
+
+        agent_instructions, agent_input = self._render_prompt(
+            method, text, examples=None if compact else examples
         )
 
         if verbose:
             print("\n\n--- LLM INSTRUCTIONS ---\n")
             print(agent_instructions)
+            print("\n\n--- LLM INPUT ---\n")
+            print(agent_input)
 
         agent = agents.Agent(
             name="ner-agent",
@@ -312,8 +657,11 @@ class NerAgent:
             model_settings=model_settings or agents.ModelSettings(),
             instructions=agent_instructions,
         )
-        result = await agents.Runner.run(
-            agent, text, run_config=agents.RunConfig(tracing_disabled=tracing_disabled)
+        result = await self._run_agent(
+            agent,
+            agent_input,
+            tracing_disabled=tracing_disabled,
+            flight_key=cache_key,
         )
 
         if verbose:
@@ -329,11 +677,45 @@ class NerAgent:
                 ),
             )
 
-        return NerResult(
+        entity_string = str(result.final_output)
+        if compact:
+            entities = self._parse_compact_entities(entity_string, original_text=text)
+        else:
+            entities = self._parse_entities(entity_string, original_text=text)
+        ner_result = NerResult(
             text=text,
-            entities=self._parse_entities(str(result.final_output), original_text=text),
+            entities=(
+                _merge_local_entities(entities, local_entities)
+                if local_entities
+                else entities
+            ),
         )
 
+        if escalation_chat_model is not None and (
+            issues := (
+                _compact_output_issues(entity_string, text) + _output_issues(entities)
+                if compact
+                else _output_issues(entities, entity_string)
+            )
+        ):
+            logger.info(
+                f"Escalating to {_model_name(escalation_chat_model)}: "
+                f"{', '.join(issues)}"
+            )
+            ner_result = await self.run(
+                text,
+                model=escalation_chat_model,
+                model_settings=model_settings,
+                tracing_disabled=tracing_disabled,
+                verbose=verbose,
+                hybrid=hybrid,
+                compact=compact,
+                few_shot_examples=few_shot_examples,
+            )
+
+        self._cache_set(cache_key, ner_result)
+        return ner_result
+
     async def analyze_entities(
         self,
         text: str,
@@ -348,24 +730,46 @@ class NerAgent:
         model_settings: typing.Optional[agents.ModelSettings] = None,
         tracing_disabled: bool = True,
         verbose: bool = False,
+        escalation_model: (
+            agents.OpenAIChatCompletionsModel
+            | agents.OpenAIResponsesModel
+            | ChatModel
+            | str
+            | None
+        ) = None,
     ) -> "NerResult":
+        """
+        List the entity names in `text`. With `escalation_model`, results with
+        names that cannot be located in `text` are redone with that model.
+        """
         if str_or_none(text) is None:
             raise ValueError("text is required")
 
         chat_model = self._to_chat_model(model)
+        escalation_chat_model = (
+            None if escalation_model is None else self._to_chat_model(escalation_model)
+        )
 
-        class SimpleEntitiesResult(pydantic.BaseModel):
-            entities: list[str] = pydantic.Field(default_factory=list)
-
-        agent_instructions: str = (
-            jinja2.Template(self.simple_entities_instructions)
-            .render(fact_text=text)
-            .strip()
+        cache_key = self._cache_key(
+            "analyze_entities",
+            chat_model,
+            model_settings,
+            templates=(
+                self.simple_entities_instructions,
+                self.simple_entities_input_template,
+            ),
+            payload=_cascade_payload(text, escalation_chat_model),
         )
+        if (cached := self._cache_get(cache_key, NerResult)) is not None:
+            return cached
+
+        agent_instructions, agent_input = self._render_prompt("analyze_entities", text)
 
         if verbose:
             print("\n\n--- LLM INSTRUCTIONS ---\n")
             print(agent_instructions)
+            print("\n\n--- LLM INPUT ---\n")
+            print(agent_input)
 
         agent = agents.Agent(
             name="simple-entities-agent",
@@ -374,8 +778,11 @@ class NerAgent:
             instructions=agent_instructions,
             output_type=SimpleEntitiesResult,
         )
-        result = await agents.Runner.run(
-            agent, text, run_config=agents.RunConfig(tracing_disabled=tracing_disabled)
+        result = await self._run_agent(
+            agent,
+            agent_input,
+            tracing_disabled=tracing_disabled,
+            flight_key=cache_key,
         )
 
         if verbose:
@@ -393,15 +800,28 @@ class NerAgent:
 
         entities_result = result.final_output_as(SimpleEntitiesResult)
 
-        entities: list[Entity] = []
-        used_spans: list[tuple[int, int]] = []
-        for entity in entities_result.entities:
-            start_pos, end_pos = _claim_span(text, entity, used_spans)
-            entities.append(
-                Entity(name=entity, value=entity, start=start_pos, end=end_pos)
+        ner_result = NerResult(
+            text=text,
+            entities=self._resolve_entity_names(entities_result.entities, text),
+        )
+
+        if escalation_chat_model is not None and (
+            issues := _output_issues(ner_result.entities)
+        ):
+            logger.info(
+                f"Escalating to {_model_name(escalation_chat_model)}: "
+                f"{', '.join(issues)}"
+            )
+            ner_result = await self.analyze_entities(
+                text,
+                model=escalation_chat_model,
+                model_settings=model_settings,
+                tracing_disabled=tracing_disabled,
+                verbose=verbose,
             )
 
-        return NerResult(text=text, entities=entities)
+        self._cache_set(cache_key, ner_result)
+        return ner_result
 
     async def analyze_synonyms_and_canonical_name(
         self,
@@ -421,17 +841,37 @@ class NerAgent:
         if not candidate_list:
             raise ValueError("candidate_list is required")
 
+        if self.synonym_store is not None and (
+            known := self.synonym_store.lookup(candidate_list)
+        ):
+            return SynonymsAndCanonicalNameResult(**known._asdict())
+
         chat_model = self._to_chat_model(model)
 
-        agent_instructions: str = (
-            jinja2.Template(self.synonyms_and_canonical_name_instructions)
-            .render(candidate_list=json.dumps(candidate_list, ensure_ascii=False))
-            .strip()
+        cache_key = self._cache_key(
+            "analyze_synonyms_and_canonical_name",
+            chat_model,
+            model_settings,
+            templates=(
+                self.synonyms_and_canonical_name_instructions,
+                self.synonyms_and_canonical_name_input_template,
+            ),
+            payload=candidate_list,
+        )
+        if (
+            cached := self._cache_get(cache_key, SynonymsAndCanonicalNameResult)
+        ) is not None:
+            return self._record_synonyms(candidate_list, cached)
+
+        agent_instructions, agent_input = self._render_prompt(
+            "analyze_synonyms_and_canonical_name", candidate_list
         )
 
         if verbose:
             print("\n\n--- LLM INSTRUCTIONS ---\n")
             print(agent_instructions)
+            print("\n\n--- LLM INPUT ---\n")
+            print(agent_input)
 
         agent = agents.Agent(
             name="synonyms-and-canonical-name-agent",
@@ -441,10 +881,11 @@ class NerAgent:
             output_type=SynonymsAndCanonicalNameResult,
         )
 
-        result = await agents.Runner.run(
+        result = await self._run_agent(
             agent,
-            agent_instructions,
-            run_config=agents.RunConfig(tracing_disabled=tracing_disabled),
+            agent_input,
+            tracing_disabled=tracing_disabled,
+            flight_key=cache_key,
         )
 
         if verbose:
@@ -460,7 +901,9 @@ class NerAgent:
                 ),
             )
 
-        return result.final_output_as(SynonymsAndCanonicalNameResult)
+        synonyms_result = result.final_output_as(SynonymsAndCanonicalNameResult)
+        self._cache_set(cache_key, synonyms_result)
+        return self._record_synonyms(candidate_list, synonyms_result)
 
     async def extract_relations(
         self,
@@ -483,15 +926,28 @@ class NerAgent:
 
         chat_model = self._to_chat_model(model)
 
-        agent_instructions: str = (
-            jinja2.Template(self.relation_extraction_instructions)
-            .render(fact_text=fact_text)
-            .strip()
+        cache_key = self._cache_key(
+            "extract_relations",
+            chat_model,
+            model_settings,
+            templates=(
+                self.relation_extraction_instructions,
+                self.relation_extraction_input_template,
+            ),
+            payload=fact_text,
+        )
+        if (cached := self._cache_get(cache_key, RelationExtractionResult)) is not None:
+            return cached
+
+        agent_instructions, agent_input = self._render_prompt(
+            "extract_relations", fact_text
         )
 
         if verbose:
             print("\n\n--- LLM INSTRUCTIONS ---\n")
             print(agent_instructions)
+            print("\n\n--- LLM INPUT ---\n")
+            print(agent_input)
 
         agent = agents.Agent(
             name="relation-extraction-agent",
@@ -500,10 +956,11 @@ class NerAgent:
             instructions=agent_instructions,
             output_type=RelationExtractionResult,
         )
-        result = await agents.Runner.run(
+        result = await self._run_agent(
             agent,
-            agent_instructions,
-            run_config=agents.RunConfig(tracing_disabled=tracing_disabled),
+            agent_input,
+            tracing_disabled=tracing_disabled,
+            flight_key=cache_key,
         )
 
         if verbose:
@@ -519,63 +976,97 @@ class NerAgent:
                 ),
             )
 
-        return result.final_output_as(RelationExtractionResult)
+        relations_result = result.final_output_as(RelationExtractionResult)
+        self._cache_set(cache_key, relations_result)
+        return relations_result
 
-    def _parse_entities(
+    async def extract_entities_and_relations(
         self,
-        entity_string: str,
-        original_text: str = "",
-    ) -> list["Entity"]:
+        text: str,
+        *,
+        model: (
+            agents.OpenAIChatCompletionsModel
+            | agents.OpenAIResponsesModel
+            | ChatModel
+            | str
+            | None
+        ) = None,
+        model_settings: typing.Optional[agents.ModelSettings] = None,
+        tracing_disabled: bool = True,
+        verbose: bool = False,
+    ) -> "JointExtractionResult":
         """
-        Parse entities from strings containing zero or more occurrences of the pattern
-        [ENTITY_TEXT](#ENTITY_TYPE). Robust to arbitrary whitespace, newlines, and
-        missing pipe separators.
-
-        Args:
-            entity_string: Raw model output containing entity markup.
-            original_text: Original source text (optional, but recommended for spans).
+        Extract typed entities and the triplets between them in one model call.
 
-        Returns:
-            List[Entity]
+        The model lists entities and refers to them by index in its triplets, so
+        every triplet connects two of the returned entities. Entity spans are
+        resolved the same way as in `run`.
         """
-        if not entity_string:
-            return []
-
-        # Global pattern: [text](#TYPE)
-        pattern = re.compile(
-            r"\[([^\]]+)\]\s*\(\s*#\s*([^)]+?)\s*\)", flags=re.IGNORECASE
-        )
+        if str_or_none(text) is None:
+            raise ValueError("text is required")
 
-        entities: list[Entity] = []
-        used_spans: list[tuple[int, int]] = []
+        chat_model = self._to_chat_model(model)
 
-        for m in pattern.finditer(entity_string):
-            entity_text = m.group(1).strip()
-            raw_type = m.group(2).strip().upper()
+        cache_key = self._cache_key(
+            "extract_entities_and_relations",
+            chat_model,
+            model_settings,
+            templates=(
+                self.joint_extraction_instructions,
+                self.joint_extraction_input_template,
+            ),
+            payload=text,
+        )
+        if (cached := self._cache_get(cache_key, JointExtractionResult)) is not None:
+            return cached
 
-            ent_type = legacy_entity_map.get(raw_type, raw_type)
+        agent_instructions, agent_input = self._render_prompt(
+            "extract_entities_and_relations", text
+        )
 
-            # Skip unknown types to avoid validation errors downstream.
-            if ent_type not in EntityType.__members__:
-                if ent_type != "DONE":
-                    logger.warning(f"Unknown entity type: {raw_type}")
-                continue
+        if verbose:
+            print("\n\n--- LLM INSTRUCTIONS ---\n")
+            print(agent_instructions)
+            print("\n\n--- LLM INPUT ---\n")
+            print(agent_input)
 
-            start_pos, end_pos = _claim_span(original_text, entity_text, used_spans)
+        agent = agents.Agent(
+            name="joint-extraction-agent",
+            model=chat_model,
+            model_settings=model_settings or agents.ModelSettings(),
+            instructions=agent_instructions,
+            output_type=JointExtractionOutput,
+        )
+        result = await self._run_agent(
+            agent,
+            agent_input,
+            tracing_disabled=tracing_disabled,
+            flight_key=cache_key,
+        )
 
-            entities.append(
-                Entity(
-                    name=ent_type,
-                    value=entity_text,
-                    start=start_pos,
-                    end=end_pos,
-                )
+        if verbose:
+            print("\n\n--- LLM OUTPUT ---\n")
+            print(str(result.final_output))
+            print("\n--- LLM USAGE ---\n")
+            print(
+                "Usage:",
+                json.dumps(
+                    asdict(result.context_wrapper.usage),
+                    ensure_ascii=False,
+                    default=str,
+                ),
             )
 
-        return entities
+        joint_result = self._resolve_joint_output(
+            result.final_output_as(JointExtractionOutput), text
+        )
+        self._cache_set(cache_key, joint_result)
+        return joint_result
 
-    def _to_chat_model(
+    def run_stream(
         self,
+        text: str,
+        *,
         model: (
             agents.OpenAIChatCompletionsModel
             | agents.OpenAIResponsesModel
@@ -583,25 +1074,1093 @@ class NerAgent:
             | str
             | None
         ) = None,
-    ) -> agents.OpenAIChatCompletionsModel | agents.OpenAIResponsesModel:
-        model = DEFAULT_MODEL if model is None else model
-
-        if isinstance(model, str):
-            openai_client = openai.AsyncOpenAI()
-            return agents.OpenAIResponsesModel(
-                model=model,
-                openai_client=openai_client,
-            )
+        model_settings: typing.Optional[agents.ModelSettings] = None,
+        tracing_disabled: bool = True,
+        verbose: bool = False,
+    ) -> "NerStream":
+        """
+        Streaming variant of `run`. Iterate the returned `NerStream` to receive
+        span-aligned entities as the model generates them; `result` and `usage`
+        are set once iteration finishes.
+
+        Like `run`, it shares `run`'s cache entries, merges `gazetteer` matches
+        and calls the model within its `rate_limits` budget; the reservation is
+        held until the stream ends. Streams are not hedged and not shared
+        between identical concurrent calls, since each caller consumes its own
+        stream.
+        """
+        if str_or_none(text) is None:
+            raise ValueError("text is required")
 
-        else:
-            return model
+        chat_model = self._to_chat_model(model)
 
+        examples = self._few_shot_examples(text)
+        templates: tuple[str, ...] = (
+            self.instructions,
+            self.input_template,
+            json.dumps(examples, ensure_ascii=False),
+            json.dumps(dict(entity_descriptions)),
+        )
+        if self.gazetteer is not None:
+            self.gazetteer.compile()
+            templates += (f"gazetteer:{self.gazetteer.fingerprint}",)
+        cache_key = self._cache_key(
+            "run", chat_model, model_settings, templates=templates, payload=text
+        )
+        cached = self._cache_get(cache_key, NerResult)
+        if cached is not None:
+            return NerStream(text, cached_result=cached)
+
+        local_entities = self._local_entities(text)
+        if self.gazetteer is not None and not _has_text_outside(text, local_entities):
+            ner_result = NerResult(text=text, entities=local_entities)
+            self._cache_set(cache_key, ner_result)
+            return NerStream(text, cached_result=ner_result)
+
+        agent_instructions, agent_input = self._render_prompt(
+            "run", text, examples=examples
+        )
 
-class Entity(pydantic.BaseModel):
-    name: str
-    value: str
-    start: int = 0
-    end: int = 0
+        if verbose:
+            print("\n\n--- LLM INSTRUCTIONS ---\n")
+            print(agent_instructions)
+            print("\n\n--- LLM INPUT ---\n")
+            print(agent_input)
+
+        agent = agents.Agent(
+            name="ner-agent",
+            model=chat_model,
+            model_settings=model_settings or agents.ModelSettings(),
+            instructions=agent_instructions,
+        )
+        return NerStream(
+            text,
+            start=functools.partial(
+                agents.Runner.run_streamed,
+                agent,
+                agent_input,
+                run_config=agents.RunConfig(tracing_disabled=tracing_disabled),
+            ),
+            on_complete=functools.partial(self._cache_set, cache_key),
+            limiter=self.rate_limits.get(_model_name(chat_model)),
+            estimated_tokens=_estimate_call_tokens(agent_instructions, agent_input),
+            local_entities=local_entities,
+        )
+
+    async def run_many(
+        self,
+        texts: typing.Iterable[str],
+        *,
+        model: (
+            agents.OpenAIChatCompletionsModel
+            | agents.OpenAIResponsesModel
+            | ChatModel
+            | str
+            | None
+        ) = None,
+        model_settings: typing.Optional[agents.ModelSettings] = None,
+        tracing_disabled: bool = True,
+        verbose: bool = False,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        **kwargs,
+    ) -> list["NerResult | Exception"]:
+        """Run `run` over many texts with at most `concurrency` requests in flight.
+
+        Results keep the input order. A failing item is returned as its exception
+        instead of aborting the batch.
+        """
+        chat_model = self._to_chat_model(model)
+        return await _gather_bounded(
+            (
+                functools.partial(
+                    self.run,
+                    text,
+                    model=chat_model,
+                    model_settings=model_settings,
+                    tracing_disabled=tracing_disabled,
+                    verbose=verbose,
+                    **kwargs,
+                )
+                for text in texts
+            ),
+            concurrency=concurrency,
+        )
+
+    async def run_packed(
+        self,
+        texts: typing.Iterable[str],
+        *,
+        model: (
+            agents.OpenAIChatCompletionsModel
+            | agents.OpenAIResponsesModel
+            | ChatModel
+            | str
+            | None
+        ) = None,
+        model_settings: typing.Optional[agents.ModelSettings] = None,
+        tracing_disabled: bool = True,
+        verbose: bool = False,
+        token_budget: int = DEFAULT_PACK_TOKEN_BUDGET,
+        max_pack_size: int = DEFAULT_MAX_PACK_SIZE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> list["NerResult | Exception"]:
+        """
+        Run NER on many short texts, packing several texts into each prompt.
+
+        Texts are grouped greedily so that the estimated tokens of each pack stay
+        within `token_budget` (a text larger than the budget gets a pack of its
+        own). Results keep the input order; a failed pack returns its exception
+        for every text in it.
+        """
+        texts = list(texts)
+        chat_model = self._to_chat_model(model)
+
+        results: list[NerResult | Exception] = [
+            ValueError("text is required") for _ in texts
+        ]
+        valid_indices = [i for i, t in enumerate(texts) if str_or_none(t) is not None]
+
+        packs = _pack_texts(
+            [texts[i] for i in valid_indices],
+            token_budget=token_budget,
+            max_pack_size=max_pack_size,
+        )
+        packs = [[valid_indices[i] for i in pack] for pack in packs]
+
+        pack_results = await _gather_bounded(
+            (
+                functools.partial(
+                    self._run_pack,
+                    [texts[i] for i in pack],
+                    chat_model=chat_model,
+                    model_settings=model_settings,
+                    tracing_disabled=tracing_disabled,
+                    verbose=verbose,
+                )
+                for pack in packs
+            ),
+            concurrency=concurrency,
+        )
+
+        for pack, pack_result in zip(packs, pack_results):
+            for offset, idx in enumerate(pack):
+                results[idx] = (
+                    pack_result
+                    if isinstance(pack_result, Exception)
+                    else pack_result[offset]
+                )
+        return results
+
+    async def run_chunked(
+        self,
+        text: str,
+        *,
+        model: (
+            agents.OpenAIChatCompletionsModel
+            | agents.OpenAIResponsesModel
+            | ChatModel
+            | str
+            | None
+        ) = None,
+        model_settings: typing.Optional[agents.ModelSettings] = None,
+        tracing_disabled: bool = True,
+        verbose: bool = False,
+        max_chunk_chars: int = DEFAULT_CHUNK_CHARS,
+        overlap_sentences: int = DEFAULT_CHUNK_OVERLAP_SENTENCES,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        **kwargs,
+    ) -> "NerResult":
+        """
+        Run NER on a long document by splitting it on sentence boundaries.
+
+        Chunks of at most `max_chunk_chars` characters (sharing
+        `overlap_sentences` sentences with the previous chunk) are processed
+        concurrently, their entity offsets are mapped back to document
+        coordinates, and duplicates found in overlap regions are removed.
+        """
+        if str_or_none(text) is None:
+            raise ValueError("text is required")
+
+        chat_model = self._to_chat_model(model)
+
+        chunks = [
+            (start, end)
+            for start, end in _chunk_sentences(
+                _split_sentences(text),
+                max_chars=max_chunk_chars,
+                overlap=overlap_sentences,
+            )
+            if str_or_none(text[start:end]) is not None
+        ]
+
+        chunk_results = await _gather_bounded(
+            (
+                functools.partial(
+                    self.run,
+                    text[start:end],
+                    model=chat_model,
+                    model_settings=model_settings,
+                    tracing_disabled=tracing_disabled,
+                    verbose=verbose,
+                    **kwargs,
+                )
+                for start, end in chunks
+            ),
+            concurrency=concurrency,
+        )
+
+        chunk_entities: list[list[Entity]] = []
+        for (start, _), chunk_result in zip(chunks, chunk_results):
+            if isinstance(chunk_result, Exception):
+                raise chunk_result
+            chunk_entities.append(
+                [
+                    (
+                        entity.model_copy(
+                            update={
+                                "start": entity.start + start,
+                                "end": entity.end + start,
+                            }
+                        )
+                        if entity.start >= 0
+                        else entity
+                    )
+                    for entity in chunk_result.entities
+                ]
+            )
+
+        return NerResult(text=text, entities=_merge_chunk_entities(chunk_entities))
+
+    async def _run_pack(
+        self,
+        texts: list[str],
+        *,
+        chat_model: agents.OpenAIChatCompletionsModel | agents.OpenAIResponsesModel,
+        model_settings: typing.Optional[agents.ModelSettings] = None,
+        tracing_disabled: bool = True,
+        verbose: bool = False,
+    ) -> list["NerResult"]:
+        agent_instructions = _render_static_template(self.packed_instructions)
+        agent_input = _render_template(self.packed_input_template, texts=texts)
+
+        if verbose:
+            print("\n\n--- LLM INSTRUCTIONS ---\n")
+            print(agent_instructions)
+            print("\n\n--- LLM INPUT ---\n")
+            print(agent_input)
+
+        agent = agents.Agent(
+            name="ner-packed-agent",
+            model=chat_model,
+            model_settings=model_settings or agents.ModelSettings(),
+            instructions=agent_instructions,
+        )
+        result = await self._run_agent(
+            agent, agent_input, tracing_disabled=tracing_disabled
+        )
+
+        if verbose:
+            print("\n\n--- LLM OUTPUT ---\n")
+            print(str(result.final_output))
+            print("\n--- LLM USAGE ---\n")
+            print(
+                "Usage:",
+                json.dumps(
+                    asdict(result.context_wrapper.usage),
+                    ensure_ascii=False,
+                    default=str,
+                ),
+            )
+
+        return [
+            NerResult(text=text, entities=entities)
+            for text, entities in zip(
+                texts,
+                self._parse_packed_entities(
+                    str(result.final_output), original_texts=texts
+                ),
+            )
+        ]
+
+    async def analyze_entities_many(
+        self,
+        texts: typing.Iterable[str],
+        *,
+        model: (
+            agents.OpenAIChatCompletionsModel
+            | agents.OpenAIResponsesModel
+            | ChatModel
+            | str
+            | None
+        ) = None,
+        model_settings: typing.Optional[agents.ModelSettings] = None,
+        tracing_disabled: bool = True,
+        verbose: bool = False,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> list["NerResult | Exception"]:
+        """Batch variant of `analyze_entities`, see `run_many`."""
+        chat_model = self._to_chat_model(model)
+        return await _gather_bounded(
+            (
+                functools.partial(
+                    self.analyze_entities,
+                    text,
+                    model=chat_model,
+                    model_settings=model_settings,
+                    tracing_disabled=tracing_disabled,
+                    verbose=verbose,
+                )
+                for text in texts
+            ),
+            concurrency=concurrency,
+        )
+
+    async def extract_relations_many(
+        self,
+        fact_texts: typing.Iterable[str],
+        *,
+        model: (
+            agents.OpenAIChatCompletionsModel
+            | agents.OpenAIResponsesModel
+            | ChatModel
+            | str
+            | None
+        ) = None,
+        model_settings: typing.Optional[agents.ModelSettings] = None,
+        tracing_disabled: bool = True,
+        verbose: bool = False,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> list["RelationExtractionResult | Exception"]:
+        """Batch variant of `extract_relations`, see `run_many`."""
+        chat_model = self._to_chat_model(model)
+        return await _gather_bounded(
+            (
+                functools.partial(
+                    self.extract_relations,
+                    fact_text,
+                    model=chat_model,
+                    model_settings=model_settings,
+                    tracing_disabled=tracing_disabled,
+                    verbose=verbose,
+                )
+                for fact_text in fact_texts
+            ),
+            concurrency=concurrency,
+        )
+
+    async def extract_entities_and_relations_many(
+        self,
+        texts: typing.Iterable[str],
+        *,
+        model: (
+            agents.OpenAIChatCompletionsModel
+            | agents.OpenAIResponsesModel
+            | ChatModel
+            | str
+            | None
+        ) = None,
+        model_settings: typing.Optional[agents.ModelSettings] = None,
+        tracing_disabled: bool = True,
+        verbose: bool = False,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> list["JointExtractionResult | Exception"]:
+        """Batch variant of `extract_entities_and_relations`, see `run_many`."""
+        chat_model = self._to_chat_model(model)
+        return await _gather_bounded(
+            (
+                functools.partial(
+                    self.extract_entities_and_relations,
+                    text,
+                    model=chat_model,
+                    model_settings=model_settings,
+                    tracing_disabled=tracing_disabled,
+                    verbose=verbose,
+                )
+                for text in texts
+            ),
+            concurrency=concurrency,
+        )
+
+    def _parse_entities(
+        self,
+        entity_string: str,
+        original_text: str = "",
+    ) -> list["Entity"]:
+        """
+        Parse entities from strings containing zero or more occurrences of the pattern
+        [ENTITY_TEXT](#ENTITY_TYPE). Robust to arbitrary whitespace, newlines, and
+        missing pipe separators.
+
+        Args:
+            entity_string: Raw model output containing entity markup.
+            original_text: Original source text (optional, but recommended for spans).
+
+        Returns:
+            List[Entity]
+        """
+        if not entity_string:
+            return []
+
+        parser = EntityMarkupParser()
+        markups = parser.feed(entity_string) + parser.close()
+
+        entities: list[Entity] = []
+        span_resolver = SpanResolver(original_text)
+        span_resolver.prime(entity_text for entity_text, _ in markups)
+
+        for entity_text, raw_type in markups:
+            entity = _to_entity(entity_text, raw_type, span_resolver)
+            if entity is not None:
+                entities.append(entity)
+
+        return entities
+
+    def _parse_compact_entities(
+        self, output: str, original_text: str
+    ) -> list["Entity"]:
+        """
+        Parse the compact output format: `CODE<first>-<last>`, `CODE<n>` or
+        `CODE=<text>` items separated by `|`. Segment references are mapped to
+        exact spans of `original_text`; copied text is located like markup.
+        """
+        segments = _segment_text(original_text)
+        items = [
+            (idx, m, _compact_entity_type(m.group(1)))
+            for idx, m in enumerate(map(_COMPACT_ITEM_PATTERN.match, output.split("|")))
+            if m is not None
+        ]
+
+        entities: dict[int, Entity] = {}
+        span_resolver = SpanResolver(original_text)
+        # Segment references are exact, so they claim their spans before any
+        # copied text is searched for.
+        for idx, m, entity_type in items:
+            if entity_type is None or m.group(4) is not None:
+                continue
+            first = int(m.group(2))
+            last = int(m.group(3) or first)
+            if not first <= last < len(segments):
+                logger.warning(f"Segment reference out of range: {m.group(0)!r}")
+                continue
+            start, end = segments[first][0], segments[last][1]
+            if span_resolver.claim_span(start, end):
+                entities[idx] = Entity(
+                    name=entity_type,
+                    value=original_text[start:end],
+                    start=start,
+                    end=end,
+                )
+
+        surfaces = [(idx, m.group(4).strip(), t) for idx, m, t in items if m.group(4)]
+        span_resolver.prime(surface for _, surface, _ in surfaces)
+        for idx, surface, entity_type in surfaces:
+            if entity_type is not None:
+                start, end = span_resolver.claim(surface)
+                entities[idx] = Entity(
+                    name=entity_type, value=surface, start=start, end=end
+                )
+
+        return [entities[idx] for idx in sorted(entities)]
+
+    def _local_entities(self, text: str, *, hybrid: bool = False) -> list["Entity"]:
+        """Entities found without the model: gazetteer and, if `hybrid`, rules."""
+        matches: list[tuple[int, int, str]] = []
+        if self.gazetteer is not None:
+            matches.extend(self.gazetteer.find(text))
+        if hybrid:
+            matches.extend(self.rule_recognizer.find(text))
+        return [
+            Entity(name=entity_type, value=text[start:end], start=start, end=end)
+            for start, end, entity_type in leftmost_longest(matches)
+        ]
+
+    def _resolve_entity_names(
+        self, names: list[str], original_text: str
+    ) -> list["Entity"]:
+        """Claim spans for the bare entity names `analyze_entities` returns."""
+        entities: list[Entity] = []
+        span_resolver = SpanResolver(original_text)
+        span_resolver.prime(names)
+        for name in names:
+            start_pos, end_pos = span_resolver.claim(name)
+            entities.append(Entity(name=name, value=name, start=start_pos, end=end_pos))
+        return entities
+
+    def _resolve_joint_output(
+        self, output: "JointExtractionOutput", original_text: str
+    ) -> "JointExtractionResult":
+        """
+        Claim entity spans and turn index-based triplets into `Triplet`s.
+        Entities of unknown types or not found in the text are dropped, and so
+        are triplets with an unknown relation or an index that does not point
+        at a kept entity.
+        """
+        span_resolver = SpanResolver(original_text)
+        span_resolver.prime(entity.text.strip() for entity in output.entities)
+        entities: list[Entity] = []
+        kept: dict[int, Entity] = {}
+        for idx, joint_entity in enumerate(output.entities):
+            entity = _to_entity(joint_entity.text, joint_entity.type, span_resolver)
+            if entity is None:
+                continue
+            if entity.start < 0:
+                logger.warning(f"Dropping entity not found in text: {entity.value!r}")
+                continue
+            entities.append(entity)
+            kept[idx] = entity
+
+        triplets: list[Triplet] = []
+        for joint_triplet in output.triplets:
+            subject_entity = kept.get(joint_triplet.subject)
+            object_entity = kept.get(joint_triplet.object)
+            relation = joint_triplet.relation.strip().lower()
+            if subject_entity is None or object_entity is None:
+                logger.warning(f"Dropping triplet with unknown entity: {joint_triplet}")
+                continue
+            if relation not in RELATIONS:
+                logger.warning(
+                    f"Dropping triplet with unknown relation: {joint_triplet}"
+                )
+                continue
+            triplets.append(
+                Triplet(
+                    subject=subject_entity.value,
+                    relation=relation,
+                    object=object_entity.value,
+                )
+            )
+
+        return JointExtractionResult(
+            ner=NerResult(text=original_text, entities=entities),
+            relations=RelationExtractionResult(triplets=triplets),
+        )
+
+    def _few_shot_examples(
+        self,
+        text: str,
+        few_shot_examples: typing.Optional[typing.Sequence[FewShotExample]] = None,
+    ) -> tuple[FewShotExample, ...]:
+        """Hand-picked `few_shot_examples`, else those selected for `text`."""
+        if few_shot_examples is not None:
+            return _freeze_examples(few_shot_examples)
+        return select_examples(
+            text, self.few_shot_examples, max_examples=self.max_few_shot_examples
+        )
+
+    def _record_synonyms(
+        self,
+        candidate_list: list[str],
+        result: "SynonymsAndCanonicalNameResult",
+    ) -> "SynonymsAndCanonicalNameResult":
+        """Store a verdict in `synonym_store`, keeping group names consistent."""
+        if self.synonym_store is None:
+            return result
+        verdict = self.synonym_store.record(
+            candidate_list, result.is_synonymous, result.canonical_name
+        )
+        return SynonymsAndCanonicalNameResult(**verdict._asdict())
+
+    def _render_prompt(
+        self,
+        method: str,
+        payload: typing.Any,
+        *,
+        examples: typing.Optional[tuple[FewShotExample, ...]] = None,
+    ) -> tuple[str, str]:
+        """
+        Render the `(instructions, input)` pair `method` sends for `payload`.
+        `run` prompts use `examples`, selected for `payload` if not given.
+        """
+        if method in ("run", "run_hybrid"):
+            if examples is None:
+                examples = self._few_shot_examples(payload)
+            return (
+                _render_static_template(
+                    (
+                        self.hybrid_instructions
+                        if method == "run_hybrid"
+                        else self.instructions
+                    ),
+                    examples=examples,
+                ),
+                _render_template(self.input_template, text=payload),
+            )
+        if method in ("run_compact", "run_compact_hybrid"):
+            return (
+                _render_static_template(
+                    self.compact_instructions, hybrid=method == "run_compact_hybrid"
+                ),
+                _render_template(
+                    self.compact_input_template,
+                    text=payload,
+                    segments=[payload[s:e] for s, e in _segment_text(payload)],
+                ),
+            )
+        if method == "analyze_entities":
+            return (
+                _render_static_template(self.simple_entities_instructions),
+                _render_template(
+                    self.simple_entities_input_template, fact_text=payload
+                ),
+            )
+        if method == "analyze_synonyms_and_canonical_name":
+            return (
+                _render_static_template(self.synonyms_and_canonical_name_instructions),
+                _render_template(
+                    self.synonyms_and_canonical_name_input_template,
+                    candidate_list=json.dumps(payload, ensure_ascii=False),
+                ),
+            )
+        if method == "extract_relations":
+            return (
+                _render_static_template(self.relation_extraction_instructions),
+                _render_template(
+                    self.relation_extraction_input_template, fact_text=payload
+                ),
+            )
+        if method == "extract_entities_and_relations":
+            return (
+                _render_static_template(self.joint_extraction_instructions),
+                _render_template(self.joint_extraction_input_template, text=payload),
+            )
+        raise ValueError(f"Unknown method: {method}")
+
+    def _parse_packed_entities(
+        self,
+        entity_string: str,
+        original_texts: list[str],
+    ) -> list[list["Entity"]]:
+        """
+        Split packed model output on its `id: N` markers and parse each section
+        against the source text with the same id. Missing ids yield no entities.
+        """
+        sections: dict[int, str] = {}
+        markers = list(_PACKED_ID_PATTERN.finditer(entity_string or ""))
+        for m, next_m in zip(markers, markers[1:] + [None]):
+            idx = int(m.group(1))
+            end = next_m.start() if next_m else len(entity_string)
+            if not 0 <= idx < len(original_texts):
+                logger.warning(f"Unknown packed text id: {idx}")
+                continue
+            sections[idx] = sections.get(idx, "") + entity_string[m.end() : end]
+
+        for idx in range(len(original_texts)):
+            if idx not in sections:
+                logger.warning(f"Missing packed text id: {idx}")
+
+        return [
+            self._parse_entities(sections.get(idx, ""), original_text=text)
+            for idx, text in enumerate(original_texts)
+        ]
+
+    def _cache_key(
+        self,
+        method: str,
+        chat_model: agents.OpenAIChatCompletionsModel | agents.OpenAIResponsesModel,
+        model_settings: typing.Optional[agents.ModelSettings],
+        *,
+        templates: tuple[str, ...],
+        payload: typing.Any,
+    ) -> str | None:
+        """
+        Content-addressed key over the model identity, model settings, prompt
+        template version and input, used for the cache and for single-flight.
+        Returns None when the model cannot be identified.
+        """
+        model_name = getattr(chat_model, "model", None)
+        if model_name is None:
+            logger.debug(f"Not caching, unknown model name for {chat_model!r}")
+            return None
+
+        client = getattr(chat_model, "_client", None)
+        key_material = json.dumps(
+            {
+                "method": method,
+                "model": [
+                    type(chat_model).__name__,
+                    str(model_name),
+                    str(getattr(client, "base_url", "")),
+                ],
+                "model_settings": asdict(model_settings or agents.ModelSettings()),
+                "template": hashlib.sha256(
+                    "\x00".join(templates).encode("utf-8")
+                ).hexdigest(),
+                "input": payload,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+    async def _run_agent(
+        self,
+        agent: agents.Agent,
+        agent_input: str,
+        *,
+        tracing_disabled: bool = True,
+        flight_key: str | None = None,
+    ) -> agents.RunResult:
+        """
+        Run `agent` on `agent_input`. While a call with the same `flight_key` is
+        in flight, later callers await it instead of calling the model again;
+        the call is shielded so a cancelled caller does not fail the others.
+        """
+        run_config = agents.RunConfig(tracing_disabled=tracing_disabled)
+        if flight_key is None or not self.single_flight:
+            return await self._call_model(agent, agent_input, run_config)
+
+        task = self._in_flight.get(flight_key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._call_model(agent, agent_input, run_config)
+            )
+            self._in_flight[flight_key] = task
+
+            def _release(done: asyncio.Task) -> None:
+                if self._in_flight.get(flight_key) is done:
+                    del self._in_flight[flight_key]
+
+            task.add_done_callback(_release)
+        else:
+            logger.debug(f"Joining in-flight request {flight_key}")
+
+        return await asyncio.shield(task)
+
+    async def _call_model(
+        self,
+        agent: agents.Agent,
+        agent_input: str,
+        run_config: agents.RunConfig,
+    ) -> agents.RunResult:
+        """
+        Call the model, within the model's `rate_limits` budget if it has one,
+        retrying rate limit errors with backoff.
+        """
+        limiter = self.rate_limits.get(str(getattr(agent.model, "model", "")))
+        if limiter is None:
+            return await self._run_once(agent, agent_input, run_config)
+
+        estimated_tokens = _estimate_call_tokens(str(agent.instructions), agent_input)
+
+        attempt = 0
+        while True:
+            async with limiter.reserve(estimated_tokens) as reservation:
+                try:
+                    result = await self._run_once(
+                        agent,
+                        agent_input,
+                        run_config,
+                        limiter=limiter,
+                        estimated_tokens=estimated_tokens,
+                    )
+                except openai.RateLimitError:
+                    reservation.rate_limited = True
+                    if attempt >= limiter.max_retries:
+                        raise
+                else:
+                    usage = result.context_wrapper.usage
+                    reservation.actual_tokens = usage.total_tokens or None
+                    return result
+
+            delay = limiter.backoff(attempt)
+            logger.info(f"Rate limited, retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _run_once(
+        self,
+        agent: agents.Agent,
+        agent_input: str,
+        run_config: agents.RunConfig,
+        *,
+        limiter: typing.Optional[RateLimiter] = None,
+        estimated_tokens: int = 0,
+    ) -> agents.RunResult:
+        """
+        Run the agent once, hedged by `self.hedging` if set. With a `limiter`,
+        a hedge is only sent if it can reserve its own slot and budget at once.
+        """
+        call = functools.partial(
+            agents.Runner.run, agent, agent_input, run_config=run_config
+        )
+        if self.hedging is None:
+            return await call()
+
+        hedge_factory = None
+        if limiter is not None:
+
+            def hedge_factory() -> typing.Optional[typing.Awaitable[agents.RunResult]]:
+                reservation = limiter.try_acquire(estimated_tokens)
+                if reservation is None:
+                    return None
+                return _run_reserved(limiter, reservation, call)
+
+        return await self.hedging.run(
+            str(getattr(agent.model, "model", "")), call, hedge_factory=hedge_factory
+        )
+
+    def _cache_get(
+        self, cache_key: str | None, result_type: type[pydantic.BaseModel]
+    ) -> typing.Any:
+        if self.cache is None or cache_key is None:
+            return None
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return None
+        try:
+            return result_type.model_validate_json(cached)
+        except pydantic.ValidationError as e:
+            logger.warning(f"Ignoring invalid cache entry {cache_key}: {e}")
+            return None
+
+    def _cache_set(self, cache_key: str | None, result: pydantic.BaseModel) -> None:
+        if self.cache is None or cache_key is None:
+            return
+        self.cache.set(cache_key, result.model_dump_json())
+
+    def _to_chat_model(
+        self,
+        model: (
+            agents.OpenAIChatCompletionsModel
+            | agents.OpenAIResponsesModel
+            | ChatModel
+            | str
+            | None
+        ) = None,
+    ) -> agents.OpenAIChatCompletionsModel | agents.OpenAIResponsesModel:
+        model = DEFAULT_MODEL if model is None else model
+
+        if isinstance(model, str):
+            chat_model = self._chat_models.get(model)
+            if chat_model is None:
+                chat_model = agents.OpenAIResponsesModel(
+                    model=model,
+                    openai_client=self._get_openai_client(self.base_url, self.api_key),
+                )
+                self._chat_models[model] = chat_model
+            return chat_model
+
+        else:
+            return model
+
+    def _get_openai_client(
+        self,
+        base_url: typing.Optional[str] = None,
+        api_key: typing.Optional[str] = None,
+    ) -> openai.AsyncOpenAI:
+        """Return the pooled client for `base_url`/`api_key`, creating it once."""
+        key = (base_url, api_key)
+        client = self._openai_clients.get(key)
+        if client is None:
+            client = openai.AsyncOpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                http_client=openai.DefaultAsyncHttpxClient(limits=self.http_limits),
+            )
+            self._openai_clients[key] = client
+        return client
+
+
+class EntityMarkupParser:
+    """
+    Incremental parser for `[ENTITY_TEXT](#ENTITY_TYPE)` markup.
+
+    `feed` accepts output chunks split at arbitrary boundaries and returns the
+    `(entity_text, raw_type)` pairs completed so far; `close` flushes the end of
+    the output. Whitespace and newlines around the brackets, parentheses and
+    `#` are tolerated and pipes are not required. Only an unfinished markup is
+    kept between feeds, so parsing is linear in the output length.
+    """
+
+    _OUTSIDE = 0
+    _TEXT = 1
+    _AFTER_TEXT = 2
+    _BEFORE_HASH = 3
+    _TYPE = 4
+
+    def __init__(self):
+        self._state = self._OUTSIDE
+        self._text_parts: list[str] = []
+        self._type_parts: list[str] = []
+
+    def feed(self, chunk: str) -> list[tuple[str, str]]:
+        found: list[tuple[str, str]] = []
+        pos = 0
+        n = len(chunk)
+        while pos < n:
+            state = self._state
+            if state == self._OUTSIDE:
+                idx = chunk.find("[", pos)
+                if idx < 0:
+                    break
+                self._text_parts = []
+                self._state = self._TEXT
+                pos = idx + 1
+
+            elif state == self._TEXT:
+                idx = chunk.find("]", pos)
+                if idx < 0:
+                    self._text_parts.append(chunk[pos:])
+                    break
+                self._text_parts.append(chunk[pos:idx])
+                # "[]" cannot match; the "]" itself is ignored outside a markup.
+                has_text = any(self._text_parts)
+                self._state = self._AFTER_TEXT if has_text else self._OUTSIDE
+                pos = idx + 1
+
+            elif state == self._TYPE:
+                idx = chunk.find(")", pos)
+                if idx < 0:
+                    self._type_parts.append(chunk[pos:])
+                    break
+                self._type_parts.append(chunk[pos:idx])
+                raw_type = "".join(self._type_parts)
+                if raw_type:
+                    found.append(("".join(self._text_parts).strip(), raw_type.strip()))
+                self._state = self._OUTSIDE
+                pos = idx + 1
+
+            else:
+                char = chunk[pos]
+                if char.isspace():
+                    pos += 1
+                elif state == self._AFTER_TEXT and char == "(":
+                    self._state = self._BEFORE_HASH
+                    pos += 1
+                elif state == self._BEFORE_HASH and char == "#":
+                    self._type_parts = []
+                    self._state = self._TYPE
+                    pos += 1
+                else:
+                    # No match; the failing character may itself start one.
+                    self._state = self._OUTSIDE
+
+        return found
+
+    def close(self) -> list[tuple[str, str]]:
+        found: list[tuple[str, str]] = []
+        # An unterminated type may still contain complete markups.
+        while self._state == self._TYPE:
+            leftover = "".join(self._type_parts)
+            self._state = self._OUTSIDE
+            found.extend(self.feed(leftover))
+        self._state = self._OUTSIDE
+        self._text_parts = []
+        self._type_parts = []
+        return found
+
+
+class NerStream:
+    """
+    Entities of a streaming `NerAgent.run_stream` call.
+
+    `async for entity in stream` yields each entity as soon as its markup is
+    complete, then the `local_entities` no model entity overlaps. After
+    iteration, `result` holds the aggregated `NerResult` and `usage` the token
+    usage of the call.
+
+    The call is made by `start` when iteration begins, after reserving
+    `estimated_tokens` from `limiter` if given; the reservation is settled with
+    the reported usage when the stream ends.
+    """
+
+    def __init__(
+        self,
+        text: str,
+        *,
+        run_result: typing.Optional[agents.RunResultStreaming] = None,
+        start: typing.Optional[typing.Callable[[], agents.RunResultStreaming]] = None,
+        cached_result: typing.Optional["NerResult"] = None,
+        on_complete: typing.Optional[typing.Callable[["NerResult"], None]] = None,
+        limiter: typing.Optional[RateLimiter] = None,
+        estimated_tokens: int = 0,
+        local_entities: typing.Sequence["Entity"] = (),
+    ):
+        self.text = text
+        self.run_result = run_result
+        self.result: NerResult | None = cached_result
+        self.usage: agents.Usage | None = (
+            None if run_result or start else agents.Usage()
+        )
+        self._start = start
+        self._on_complete = on_complete
+        self._limiter = limiter
+        self._estimated_tokens = estimated_tokens
+        self._local_entities = list(local_entities)
+
+    def __aiter__(self) -> typing.AsyncIterator["Entity"]:
+        return self.stream_entities()
+
+    async def stream_entities(self) -> typing.AsyncIterator["Entity"]:
+        if self.result is not None:
+            for entity in self.result.entities:
+                yield entity
+            return
+        if self.run_result is None and self._start is None:
+            raise RuntimeError("stream has no run result")
+
+        reservation = None
+        if self._limiter is not None:
+            reservation = await self._limiter.acquire(self._estimated_tokens)
+        try:
+            if self.run_result is None:
+                assert self._start is not None
+                self.run_result = self._start()
+
+            entities: list[Entity] = []
+            span_resolver = SpanResolver(self.text)
+            parser = EntityMarkupParser()
+            async for event in self.run_result.stream_events():
+                if event.type != "raw_response_event" or not isinstance(
+                    event.data, ResponseTextDeltaEvent
+                ):
+                    continue
+
+                for entity_text, raw_type in parser.feed(event.data.delta):
+                    entity = _to_entity(entity_text, raw_type, span_resolver)
+                    if entity is not None:
+                        entities.append(entity)
+                        yield entity
+
+            for entity_text, raw_type in parser.close():
+                entity = _to_entity(entity_text, raw_type, span_resolver)
+                if entity is not None:
+                    entities.append(entity)
+                    yield entity
+
+            self.usage = self.run_result.context_wrapper.usage
+            if reservation is not None:
+                reservation.actual_tokens = self.usage.total_tokens or None
+        except openai.RateLimitError:
+            if reservation is not None:
+                reservation.rate_limited = True
+            raise
+        finally:
+            if reservation is not None:
+                assert self._limiter is not None
+                await self._limiter.release(reservation)
+
+        merged = (
+            _merge_local_entities(entities, self._local_entities)
+            if self._local_entities
+            else entities
+        )
+        streamed = {id(entity) for entity in entities}
+        for entity in merged:
+            if id(entity) not in streamed:
+                yield entity
+
+        self.result = NerResult(text=self.text, entities=merged)
+        if self._on_complete is not None:
+            self._on_complete(self.result)
+
+
+class Entity(pydantic.BaseModel):
+    name: str
+    value: str
+    start: int = 0
+    end: int = 0
 
 
 Entities = pydantic.TypeAdapter(list[Entity])
@@ -612,6 +2171,12 @@ class NerResult(pydantic.BaseModel):
     entities: list[Entity] = pydantic.Field(default_factory=list)
 
 
+class SimpleEntitiesResult(pydantic.BaseModel):
+    """Pydantic model for parsing the simple entities agent's output."""
+
+    entities: list[str] = pydantic.Field(default_factory=list)
+
+
 class SynonymsAndCanonicalNameResult(pydantic.BaseModel):
     """Pydantic model for parsing the synonyms and canonical name agent's output."""
 
@@ -633,20 +2198,408 @@ class RelationExtractionResult(pydantic.BaseModel):
     triplets: list[Triplet] = pydantic.Field(default_factory=list)
 
 
-def _claim_span(
-    original_text: str, surface: str, used_spans: list[tuple[int, int]]
-) -> tuple[int, int]:
+class JointEntity(pydantic.BaseModel):
+    """An entity in the joint extraction agent's output."""
+
+    text: str
+    type: str
+
+
+class JointTriplet(pydantic.BaseModel):
+    """A triplet in the joint extraction agent's output, by entity index."""
+
+    subject: int
+    relation: str
+    object: int
+
+
+class JointExtractionOutput(pydantic.BaseModel):
+    """Pydantic model for parsing the joint extraction agent's output."""
+
+    entities: list[JointEntity] = pydantic.Field(default_factory=list)
+    triplets: list[JointTriplet] = pydantic.Field(default_factory=list)
+
+
+class JointExtractionResult(pydantic.BaseModel):
+    """Entities and relations from one `extract_entities_and_relations` call."""
+
+    ner: NerResult
+    relations: RelationExtractionResult
+
+
+def _to_entity(
+    entity_text: str,
+    raw_type: str,
+    span_resolver: SpanResolver,
+) -> typing.Optional["Entity"]:
+    """
+    Build an entity from one parsed markup, mapping legacy type names and
+    claiming its span. Returns None for `DONE` and unknown types.
+    """
+    entity_text = entity_text.strip()
+    raw_type = raw_type.strip().upper()
+
+    ent_type = legacy_entity_map.get(raw_type, raw_type)
+
+    # Skip unknown types to avoid validation errors downstream.
+    if ent_type not in EntityType.__members__:
+        if ent_type != "DONE":
+            logger.warning(f"Unknown entity type: {raw_type}")
+        return None
+
+    start_pos, end_pos = span_resolver.claim(entity_text)
+    return Entity(name=ent_type, value=entity_text, start=start_pos, end=end_pos)
+
+
+def _output_issues(
+    entities: list["Entity"], entity_string: typing.Optional[str] = None
+) -> list[str]:
+    """
+    Signs that a model output is unreliable: entities whose span could not be
+    found and, for markup output, unknown entity types or a missing `DONE`.
+    """
+    issues: list[str] = []
+    if entity_string is not None:
+        parser = EntityMarkupParser()
+        raw_types = {
+            legacy_entity_map.get(t.strip().upper(), t.strip().upper())
+            for _, t in parser.feed(entity_string) + parser.close()
+        }
+        if "DONE" not in raw_types:
+            issues.append("missing DONE marker")
+        if unknown := raw_types - set(EntityType.__members__) - {"DONE"}:
+            issues.append(f"unknown entity types {sorted(unknown)}")
+
+    if unresolved := sum(entity.start == -1 for entity in entities):
+        issues.append(f"{unresolved} unresolved spans")
+    return issues
+
+
+def _compact_entity_type(code: str) -> typing.Optional[EntityType]:
+    """Map a compact type code (or a full type name) to its entity type."""
+    code = code.strip().upper()
+    if code in compact_type_codes:
+        return compact_type_codes[code]
+    code = legacy_entity_map.get(code, code)
+    if code in EntityType.__members__:
+        return EntityType(code)
+    logger.warning(f"Unknown entity type code: {code}")
+    return None
+
+
+def _compact_output_issues(output: str, text: str) -> list[str]:
+    """Compact-format counterpart of the markup checks in `_output_issues`."""
+    issues: list[str] = []
+    parts = [part.strip() for part in output.split("|")]
+    if not any(part.upper() == "END" for part in parts):
+        issues.append("missing END marker")
+
+    segment_count = len(_segment_text(text))
+    unknown: set[str] = set()
+    out_of_range = 0
+    for m in filter(None, map(_COMPACT_ITEM_PATTERN.match, parts)):
+        code = m.group(1).upper()
+        if code not in compact_type_codes and (
+            legacy_entity_map.get(code, code) not in EntityType.__members__
+        ):
+            unknown.add(code)
+        if m.group(2) is not None and int(m.group(3) or m.group(2)) >= segment_count:
+            out_of_range += 1
+    if unknown:
+        issues.append(f"unknown entity types {sorted(unknown)}")
+    if out_of_range:
+        issues.append(f"{out_of_range} segment references out of range")
+    return issues
+
+
+def _estimate_call_tokens(instructions: str, agent_input: str) -> int:
+    # The reply length is unknown up front; assume it is about as long as the
+    # input and reconcile the reservation with the reported usage.
+    return _estimate_tokens(instructions) + 2 * _estimate_tokens(agent_input)
+
+
+async def _run_reserved(
+    limiter: RateLimiter,
+    reservation: Reservation,
+    call: typing.Callable[[], typing.Awaitable[agents.RunResult]],
+) -> agents.RunResult:
+    """Await `call()` and settle `reservation` with its outcome."""
+    try:
+        result = await call()
+    except openai.RateLimitError:
+        reservation.rate_limited = True
+        raise
+    else:
+        reservation.actual_tokens = result.context_wrapper.usage.total_tokens or None
+        return result
+    finally:
+        await limiter.release(reservation)
+
+
+def _has_text_outside(text: str, entities: list["Entity"]) -> bool:
+    """
+    Whether `text` has any letter or digit outside the spans of `entities`.
+    Digits count too: without a rule match, only the model can tag them.
+    """
+    pos = 0
+    for entity in sorted(entities, key=lambda e: e.start):
+        if any(char.isalnum() for char in text[pos : entity.start]):
+            return True
+        pos = max(pos, entity.end)
+    return any(char.isalnum() for char in text[pos:])
+
+
+def _merge_local_entities(
+    entities: list["Entity"], local_entities: list["Entity"]
+) -> list["Entity"]:
+    """
+    Add the locally found entities that overlap no resolved model entity,
+    ordered by start. Model entities without a span are kept at the end.
+    """
+    # Resolved spans never overlap, so sorted by start their ends are sorted too.
+    claimed = sorted((e.start, e.end) for e in entities if e.start >= 0)
+    merged = [e for e in entities if e.start >= 0]
+    for entity in local_entities:
+        idx = bisect.bisect_left(claimed, (entity.end,))
+        if idx > 0 and claimed[idx - 1][1] > entity.start:
+            continue
+        merged.append(entity)
+    merged.sort(key=lambda e: e.start)
+    return merged + [e for e in entities if e.start < 0]
+
+
+def _cascade_payload(
+    text: str,
+    escalation_chat_model: typing.Optional[
+        agents.OpenAIChatCompletionsModel | agents.OpenAIResponsesModel
+    ],
+) -> typing.Any:
+    # A cascade can return the escalation model's result, so it is cached apart
+    # from single-model calls.
+    if escalation_chat_model is None:
+        return text
+    return {"text": text, "escalation_model": _model_name(escalation_chat_model)}
+
+
+def _model_name(chat_model: typing.Any) -> str:
+    return str(getattr(chat_model, "model", type(chat_model).__name__))
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_template(source: str) -> jinja2.Template:
+    return jinja2.Template(source)
+
+
+def _freeze_examples(
+    examples: typing.Sequence[FewShotExample],
+) -> tuple[FewShotExample, ...]:
+    # Rendered prompts are cached on their examples, so lists must become tuples.
+    return tuple(
+        FewShotExample(
+            example.text,
+            tuple((value, entity_type) for value, entity_type in example.entities),
+        )
+        for example in examples
+    )
+
+
+@functools.lru_cache(maxsize=STATIC_TEMPLATE_CACHE_SIZE)
+def _render_static_template(source: str, **kwargs: typing.Any) -> str:
+    """
+    Render a system prompt that depends on no per-call input. The result is
+    byte-identical across calls so provider-side prefix caching can reuse it.
+    Bounded, since hand-picked few-shot examples add one entry per example set.
+    """
+    return (
+        _compile_template(source)
+        .render(
+            entity_descriptions=entity_descriptions,
+            compact_type_codes=compact_type_codes,
+            **kwargs,
+        )
+        .strip()
+    )
+
+
+def _render_template(source: str, **kwargs: typing.Any) -> str:
+    return _compile_template(source).render(**kwargs).strip()
+
+
+_PACKED_ID_PATTERN = re.compile(
+    r"^[ \t]*id\s*:\s*(\d+)\s*(?:entities\s*:)?", flags=re.IGNORECASE | re.MULTILINE
+)
+_CJK_PATTERN = re.compile(
+    r"[\u1100-\u11ff\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]"
+)
+# Segments of the compact format: a run of CJK letters, a run of other
+# letters, a number, or any other single visible character.
+_SEGMENT_PATTERN = re.compile(
+    r"(?:(?=[^\W\d_])[\u1100-\u11ff\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff])+"
+    r"|(?:(?![\u1100-\u11ff\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff])[^\W\d_])+"
+    r"|\d+(?:[.,]\d+)*"
+    r"|\S"
+)
+_COMPACT_ITEM_PATTERN = re.compile(
+    r"^\s*([A-Za-z_]+)\s*(?:(\d+)\s*(?:-\s*(\d+))?|=\s*(.*\S))\s*$", flags=re.DOTALL
+)
+
+
+def _segment_text(text: str) -> list[tuple[int, int]]:
+    """Spans of the numbered segments `text` is shown as in the compact format."""
+    return [m.span() for m in _SEGMENT_PATTERN.finditer(text)]
+
+
+def _estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate: one token per CJK character, about four characters per
+    token for everything else.
+    """
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _pack_texts(
+    texts: list[str],
+    *,
+    token_budget: int = DEFAULT_PACK_TOKEN_BUDGET,
+    max_pack_size: int = DEFAULT_MAX_PACK_SIZE,
+) -> list[list[int]]:
+    """
+    Group text indices greedily, in order, so each group's estimated tokens
+    (including a small per-text overhead for its id line) stay within
+    `token_budget` and each group has at most `max_pack_size` texts.
+    """
+    if token_budget < 1 or max_pack_size < 1:
+        raise ValueError("token_budget and max_pack_size must be >= 1")
+
+    packs: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+    for idx, text in enumerate(texts):
+        tokens = _estimate_tokens(text) + 8
+        if current and (
+            current_tokens + tokens > token_budget or len(current) >= max_pack_size
+        ):
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append(idx)
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+_SENTENCE_END_PATTERN = re.compile(r"[.!?]+[\"')\]]*(?=\s)|[。！？]+|\n+")
+
+
+def _split_sentences(text: str) -> list[tuple[int, int]]:
+    """
+    Split text into contiguous sentence spans covering the whole text. Boundaries
+    are Latin terminators followed by whitespace, CJK terminators and newlines.
+    """
+    spans: list[tuple[int, int]] = []
+    start = 0
+    for m in _SENTENCE_END_PATTERN.finditer(text):
+        if m.end() > start:
+            spans.append((start, m.end()))
+            start = m.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+
+def _chunk_sentences(
+    sentence_spans: list[tuple[int, int]],
+    *,
+    max_chars: int = DEFAULT_CHUNK_CHARS,
+    overlap: int = DEFAULT_CHUNK_OVERLAP_SENTENCES,
+) -> list[tuple[int, int]]:
+    """
+    Merge sentence spans into chunk spans of at most `max_chars` characters, each
+    starting `overlap` sentences before the end of the previous chunk. A single
+    sentence longer than `max_chars` is hard-split.
+    """
+    if max_chars < 1 or overlap < 0:
+        raise ValueError("max_chars must be >= 1 and overlap must be >= 0")
+
+    sentences: list[tuple[int, int]] = []
+    for start, end in sentence_spans:
+        for piece_start in range(start, end, max_chars):
+            sentences.append((piece_start, min(piece_start + max_chars, end)))
+
+    chunks: list[tuple[int, int]] = []
+    i = 0
+    while i < len(sentences):
+        j = i + 1
+        while j < len(sentences) and sentences[j][1] - sentences[i][0] <= max_chars:
+            j += 1
+        chunks.append((sentences[i][0], sentences[j - 1][1]))
+        if j >= len(sentences):
+            break
+        i = max(j - overlap, i + 1)
+    return chunks
+
+
+def _merge_chunk_entities(chunk_entities: list[list["Entity"]]) -> list["Entity"]:
+    """
+    Merge per-chunk entities already in document coordinates. Exact duplicates
+    and entities contained in a same-type entity from another chunk are dropped;
+    unresolved entities (-1, -1) are deduplicated by type and value.
+    """
+    located: list[tuple[int, Entity]] = []
+    unresolved: dict[tuple[str, str], Entity] = {}
+    for chunk_idx, entities in enumerate(chunk_entities):
+        for entity in entities:
+            if entity.start < 0:
+                unresolved.setdefault((entity.name, entity.value), entity)
+            else:
+                located.append((chunk_idx, entity))
+
+    located.sort(key=lambda item: (item[1].start, -item[1].end))
+
+    merged: list[Entity] = []
+    seen: set[tuple[str, int, int]] = set()
+    # Widest kept span end per type; entities are sorted by start, so anything
+    # ending before it is contained in an entity that was already kept.
+    reach: dict[str, tuple[int, int]] = {}
+    for chunk_idx, entity in located:
+        key = (entity.name, entity.start, entity.end)
+        if key in seen:
+            continue
+        reach_end, reach_chunk = reach.get(entity.name, (-1, chunk_idx))
+        if entity.end <= reach_end and reach_chunk != chunk_idx:
+            continue
+        seen.add(key)
+        merged.append(entity)
+        if entity.end > reach_end:
+            reach[entity.name] = (entity.end, chunk_idx)
+
+    return merged + list(unresolved.values())
+
+
+async def _gather_bounded(
+    factories: typing.Iterable[typing.Callable[[], typing.Awaitable[T]]],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> list[T | Exception]:
     """
-    Find the next non-overlapping occurrence of `surface` in original_text.
-    Returns (-1, -1) if not found or no original_text was supplied.
+    Await the coroutines produced by `factories` with at most `concurrency` of them
+    running at once. Results are returned in input order; exceptions are captured
+    per item.
     """
-    if not original_text:
-        return (0, 0)  # maintain current default behavior when text unknown
-
-    # Search all occurrences; pick the first that doesn't overlap a prior claim.
-    for mt in re.finditer(re.escape(surface), original_text):
-        s, e = mt.span()
-        if all(not (s < ue and e > us) for us, ue in used_spans):
-            used_spans.append((s, e))
-            return (s, e)
-    return (-1, -1)
+    if concurrency < 1:
+        raise ValueError("concurrency must be >= 1")
+
+    results: dict[int, T | Exception] = {}
+    pending = enumerate(factories)
+
+    async def _worker() -> None:
+        for idx, factory in pending:
+            try:
+                results[idx] = await factory()
+            except Exception as e:
+                logger.debug(f"Batch item {idx} failed: {e!r}")
+                results[idx] = e
+
+    await asyncio.gather(*(_worker() for _ in range(concurrency)))
+    return [results[idx] for idx in range(len(results))]
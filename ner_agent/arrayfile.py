@@ -0,0 +1,69 @@
+# ner_agent/arrayfile.py
+import array
+import json
+import mmap
+import os
+import pathlib
+import struct
+import sys
+import typing
+
+
+def save_arrays(
+    path: str | pathlib.Path,
+    magic: bytes,
+    header: dict[str, typing.Any],
+    arrays: typing.Mapping[str, array.array],
+) -> None:
+    """
+    Atomically write `magic`, a JSON `header` and the `arrays`, each aligned to
+    8 bytes, so `load_arrays` can map them without copying.
+    """
+    header = {
+        **header,
+        "byteorder": sys.byteorder,
+        "arrays": [
+            [name, values.typecode, len(values)] for name, values in arrays.items()
+        ],
+    }
+    encoded = json.dumps(header).encode("utf-8")
+
+    path = pathlib.Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(magic + struct.pack("<I", len(encoded)) + encoded)
+        for values in arrays.values():
+            f.write(b"\x00" * (-f.tell() % 8))
+            values.tofile(f)
+    os.replace(tmp_path, path)
+
+
+def load_arrays(
+    path: str | pathlib.Path, magic: bytes
+) -> tuple[dict[str, typing.Any], dict[str, memoryview], mmap.mmap]:
+    """
+    Memory-map a file written by `save_arrays`. Returns its header, a read-only
+    memoryview per array and the mapping that backs them.
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[: len(magic)] != magic:
+        mapped.close()
+        raise ValueError(f"{path} is not a {magic.decode()} file")
+
+    (header_len,) = struct.unpack_from("<I", mapped, len(magic))
+    offset = len(magic) + 4
+    header = json.loads(mapped[offset : offset + header_len])
+    if header["byteorder"] != sys.byteorder:
+        mapped.close()
+        raise ValueError(f"{path} was written on a {header['byteorder']} host")
+
+    view = memoryview(mapped)
+    offset += header_len
+    arrays: dict[str, memoryview] = {}
+    for name, typecode, length in header["arrays"]:
+        offset += -offset % 8
+        nbytes = length * array.array(typecode).itemsize
+        arrays[name] = view[offset : offset + nbytes].cast(typecode)
+        offset += nbytes
+    return header, arrays, mapped
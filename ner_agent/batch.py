@@ -0,0 +1,228 @@
+# ner_agent/batch.py
+import hashlib
+import json
+import logging
+import pathlib
+import typing
+
+import agents
+import pydantic
+from agents.models.chatcmpl_converter import Converter
+from openai.types import ChatModel
+
+from ner_agent import (
+    DEFAULT_MODEL,
+    JointExtractionOutput,
+    JointExtractionResult,
+    NerAgent,
+    NerResult,
+    RelationExtractionResult,
+    SimpleEntitiesResult,
+    SynonymsAndCanonicalNameResult,
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+# Structured output type each method asks the model for; None means free text.
+OUTPUT_TYPES: dict[str, type[pydantic.BaseModel] | None] = {
+    "run": None,
+    "analyze_entities": SimpleEntitiesResult,
+    "analyze_synonyms_and_canonical_name": SynonymsAndCanonicalNameResult,
+    "extract_relations": RelationExtractionResult,
+    "extract_entities_and_relations": JointExtractionOutput,
+}
+
+BatchResult = (
+    NerResult
+    | SynonymsAndCanonicalNameResult
+    | RelationExtractionResult
+    | JointExtractionResult
+)
+
+
+class BatchItemError(Exception):
+    """A batch result line that failed or could not be parsed."""
+
+    def __init__(self, custom_id: str, message: str):
+        super().__init__(f"{custom_id}: {message}")
+        self.custom_id = custom_id
+
+
+def batch_custom_id(method: str, index: int, payload: typing.Any) -> str:
+    """
+    Stable id for one batch request: the method, the input position and a
+    digest of the input, so re-rendering the same inputs yields the same ids.
+    """
+    digest = hashlib.sha256(
+        json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()[:16]
+    return f"{method}-{index}-{digest}"
+
+
+def manifest_path_for(requests_path: str | pathlib.Path) -> pathlib.Path:
+    requests_path = pathlib.Path(requests_path)
+    return requests_path.with_name(requests_path.name + ".manifest.jsonl")
+
+
+def write_batch_requests(
+    agent: NerAgent,
+    payloads: typing.Iterable[typing.Any],
+    requests_path: str | pathlib.Path,
+    *,
+    method: str = "run",
+    model: ChatModel | str = DEFAULT_MODEL,
+    model_settings: typing.Optional[agents.ModelSettings] = None,
+    manifest_path: typing.Optional[str | pathlib.Path] = None,
+) -> int:
+    """
+    Write one Batch API request line per payload, using the prompts `method`
+    sends interactively. Each line's custom id and input are recorded in a
+    manifest next to the requests file, which `read_batch_results` needs to
+    resolve entity spans. Payloads are streamed; returns the number written.
+    """
+    if method not in OUTPUT_TYPES:
+        raise ValueError(f"method must be one of {tuple(OUTPUT_TYPES)}")
+
+    output_type = OUTPUT_TYPES[method]
+    response_format = (
+        Converter.convert_response_format(agents.AgentOutputSchema(output_type))
+        if output_type is not None
+        else None
+    )
+    settings_params = _model_settings_params(model_settings)
+    manifest_path = manifest_path or manifest_path_for(requests_path)
+
+    count = 0
+    with (
+        open(requests_path, "w", encoding="utf-8") as requests_file,
+        open(manifest_path, "w", encoding="utf-8") as manifest_file,
+    ):
+        for index, payload in enumerate(payloads):
+            instructions, agent_input = agent._render_prompt(method, payload)
+            body: dict[str, typing.Any] = {
+                "model": str(model),
+                "messages": [
+                    {"role": "system", "content": instructions},
+                    {"role": "user", "content": agent_input},
+                ],
+                **settings_params,
+            }
+            if response_format is not None:
+                body["response_format"] = response_format
+
+            custom_id = batch_custom_id(method, index, payload)
+            request = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": body,
+            }
+            entry = {"custom_id": custom_id, "method": method, "input": payload}
+            requests_file.write(json.dumps(request, ensure_ascii=False) + "\n")
+            manifest_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            count += 1
+
+    return count
+
+
+def read_batch_results(
+    agent: NerAgent,
+    results_path: str | pathlib.Path,
+    manifest_path: str | pathlib.Path,
+) -> typing.Iterator[tuple[str, BatchResult | BatchItemError]]:
+    """
+    Parse a Batch API output file back into result objects, yielding
+    `(custom_id, result)` in file order. Failed or unparseable lines yield a
+    `BatchItemError` instead of raising, like the `*_many` methods.
+    """
+    manifest: dict[str, tuple[str, typing.Any]] = {}
+    with open(manifest_path, encoding="utf-8") as manifest_file:
+        for line in manifest_file:
+            if line.strip():
+                entry = json.loads(line)
+                manifest[entry["custom_id"]] = (entry["method"], entry["input"])
+
+    with open(results_path, encoding="utf-8") as results_file:
+        for line in results_file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            custom_id = record.get("custom_id", "")
+            try:
+                if custom_id not in manifest:
+                    raise BatchItemError(custom_id, "not in manifest")
+                method, payload = manifest[custom_id]
+                content = _response_content(custom_id, record)
+                yield custom_id, _to_result(agent, method, payload, content)
+            except BatchItemError as e:
+                logger.warning(f"Batch item failed: {e}")
+                yield custom_id, e
+            except (pydantic.ValidationError, ValueError) as e:
+                logger.warning(f"Batch item {custom_id} has invalid output: {e}")
+                yield custom_id, BatchItemError(custom_id, f"invalid output: {e}")
+
+
+def _to_result(
+    agent: NerAgent, method: str, payload: typing.Any, content: str
+) -> BatchResult:
+    if method == "run":
+        return NerResult(
+            text=payload,
+            entities=agent._parse_entities(content, original_text=payload),
+        )
+    if method == "analyze_entities":
+        names = SimpleEntitiesResult.model_validate_json(content).entities
+        return NerResult(
+            text=payload, entities=agent._resolve_entity_names(names, payload)
+        )
+    if method == "extract_entities_and_relations":
+        return agent._resolve_joint_output(
+            JointExtractionOutput.model_validate_json(content), payload
+        )
+    output_type = OUTPUT_TYPES[method]
+    assert output_type is not None
+    return output_type.model_validate_json(content)
+
+
+def _response_content(custom_id: str, record: dict[str, typing.Any]) -> str:
+    if record.get("error"):
+        raise BatchItemError(custom_id, json.dumps(record["error"]))
+
+    response = record.get("response") or {}
+    if response.get("status_code") != 200:
+        raise BatchItemError(custom_id, f"status code {response.get('status_code')}")
+
+    try:
+        message = response["body"]["choices"][0]["message"]
+    except (KeyError, IndexError, TypeError):
+        raise BatchItemError(custom_id, "response has no message")
+    if message.get("refusal"):
+        raise BatchItemError(custom_id, f"refused: {message['refusal']}")
+    return message.get("content") or ""
+
+
+def _model_settings_params(
+    model_settings: typing.Optional[agents.ModelSettings],
+) -> dict[str, typing.Any]:
+    """Chat Completions body parameters for the supported `ModelSettings`."""
+    if model_settings is None:
+        return {}
+
+    params: dict[str, typing.Any] = {}
+    for name in (
+        "temperature",
+        "top_p",
+        "frequency_penalty",
+        "presence_penalty",
+        "max_tokens",
+    ):
+        value = getattr(model_settings, name)
+        if value is not None:
+            params[name] = value
+    if model_settings.reasoning is not None and model_settings.reasoning.effort:
+        params["reasoning_effort"] = model_settings.reasoning.effort
+    params.update(model_settings.extra_body or {})
+    params.update(model_settings.extra_args or {})
+    return params
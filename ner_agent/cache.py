@@ -0,0 +1,132 @@
+# ner_agent/cache.py
+import collections
+import logging
+import pathlib
+import sqlite3
+import threading
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LRU_MAX_BYTES = 64 * 1024 * 1024
+
+
+@typing.runtime_checkable
+class Cache(typing.Protocol):
+    """Key-value store for serialized results. Keys and values are strings."""
+
+    def get(self, key: str) -> str | None: ...
+
+    def set(self, key: str, value: str) -> None: ...
+
+
+class LRUCache:
+    """In-process LRU cache evicting least recently used entries by total size."""
+
+    def __init__(self, max_bytes: int = DEFAULT_LRU_MAX_BYTES):
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be >= 1")
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data: collections.OrderedDict[str, str] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        entry_size = _entry_size(key, value)
+        if entry_size > self.max_bytes:
+            logger.debug(f"Skipping cache entry larger than max_bytes: {key}")
+            return
+
+        with self._lock:
+            old_value = self._data.pop(key, None)
+            if old_value is not None:
+                self.size -= _entry_size(key, old_value)
+            self._data[key] = value
+            self.size += entry_size
+            while self.size > self.max_bytes:
+                old_key, old_value = self._data.popitem(last=False)
+                self.size -= _entry_size(old_key, old_value)
+
+
+class SQLiteCache:
+    """
+    Persistent cache in a SQLite database in WAL mode, so several worker
+    processes can share one file and entries survive restarts.
+    """
+
+    def __init__(self, path: str | pathlib.Path, *, timeout: float = 30.0):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, timeout=timeout, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at) "
+                "VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    """
+    Look up tiers in order (fastest first) and backfill faster tiers on a hit.
+    Writes go to every tier.
+    """
+
+    def __init__(self, *tiers: Cache):
+        if not tiers:
+            raise ValueError("at least one cache tier is required")
+        self.tiers = tiers
+
+    def get(self, key: str) -> str | None:
+        for idx, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster_tier in self.tiers[:idx]:
+                    faster_tier.set(key, value)
+                return value
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        for tier in self.tiers:
+            tier.set(key, value)
+
+
+def _entry_size(key: str, value: str) -> int:
+    return len(key.encode("utf-8")) + len(value.encode("utf-8"))
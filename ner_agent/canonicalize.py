@@ -0,0 +1,299 @@
+# ner_agent/canonicalize.py
+import collections
+import functools
+import logging
+import random
+import re
+import typing
+import unicodedata
+import zlib
+
+import agents
+import pydantic
+from openai.types import ChatModel
+
+from ner_agent import (
+    DEFAULT_CONCURRENCY,
+    NerAgent,
+    SynonymsAndCanonicalNameResult,
+    _gather_bounded,
+)
+from ner_agent.synonyms import UnionFind
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_NUM_PERM = 32
+DEFAULT_BANDS = 8
+DEFAULT_MAX_BLOCK_SIZE = 8
+DEFAULT_NGRAM = 3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_DIGITS = re.compile(r"\d+")
+
+
+class CanonicalCluster(pydantic.BaseModel):
+    canonical_name: str
+    surfaces: list[str]
+    resolved_by: typing.Literal["local", "model"]
+
+
+class CanonicalizationResult(pydantic.BaseModel):
+    clusters: list[CanonicalCluster]
+    model_calls: int = 0
+    failed_blocks: list[list[str]] = pydantic.Field(default_factory=list)
+
+    def mapping(self) -> dict[str, str]:
+        """Surface to the canonical name of its cluster."""
+        return {
+            surface: cluster.canonical_name
+            for cluster in self.clusters
+            for surface in cluster.surfaces
+        }
+
+
+def fold_key(surface: str) -> str:
+    """
+    Case- and width-insensitive key: NFKC, casefolded, with punctuation dropped
+    and whitespace collapsed. Surfaces with the same key are merged locally.
+    """
+    folded = unicodedata.normalize("NFKC", surface).casefold()
+    kept = (
+        " " if char.isspace() else char
+        for char in folded
+        if char.isspace() or unicodedata.category(char)[0] not in "PSC"
+    )
+    return " ".join("".join(kept).split())
+
+
+def transliteration_key(key: str) -> str:
+    """`fold_key` output with diacritics stripped, e.g. "müller" -> "muller"."""
+    decomposed = unicodedata.normalize("NFKD", key)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class MinHasher:
+    """MinHash signatures of character n-gram sets, deterministic for a seed."""
+
+    def __init__(
+        self,
+        num_perm: int = DEFAULT_NUM_PERM,
+        *,
+        ngram: int = DEFAULT_NGRAM,
+        seed: int = 0,
+    ):
+        rng = random.Random(seed)
+        self.ngram = ngram
+        self._params = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def shingles(self, key: str) -> set[int]:
+        padded = f" {key} "
+        n = min(self.ngram, len(padded))
+        return {
+            zlib.crc32(padded[i : i + n].encode("utf-8"))
+            for i in range(len(padded) - n + 1)
+        }
+
+    def signature(self, key: str) -> tuple[int, ...]:
+        shingles = self.shingles(key)
+        return tuple(
+            min((a * s + b) % _MERSENNE_PRIME for s in shingles)
+            for a, b in self._params
+        )
+
+
+def similarity(a: typing.Sequence[int], b: typing.Sequence[int]) -> float:
+    """Jaccard similarity estimated from two MinHash signatures."""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def candidate_blocks(
+    keys: typing.Sequence[str],
+    *,
+    threshold: float = DEFAULT_THRESHOLD,
+    num_perm: int = DEFAULT_NUM_PERM,
+    bands: int = DEFAULT_BANDS,
+    seed: int = 0,
+) -> list[list[str]]:
+    """
+    Group fold keys that may name the same entity.
+
+    Keys sharing a transliteration key are grouped directly. The rest are
+    bucketed by LSH bands of their MinHash signatures, and a key joins a
+    bucket's first key when their estimated similarity reaches `threshold` and
+    both carry the same numbers, so "iphone 14" and "iphone 15" stay apart.
+    Each key is hashed once and compared once per band, so the work is linear
+    in the number of keys.
+    """
+    if num_perm % bands:
+        raise ValueError("num_perm must be a multiple of bands")
+    rows = num_perm // bands
+    hasher = MinHasher(num_perm, seed=seed)
+    blocks = UnionFind(keys)
+
+    by_translit: dict[str, str] = {}
+    signatures: dict[str, tuple[int, ...]] = {}
+    for key in keys:
+        translit = transliteration_key(key)
+        if (first := by_translit.setdefault(translit, key)) != key:
+            blocks.union(first, key)
+        elif translit not in signatures:
+            signatures[translit] = hasher.signature(translit)
+
+    translits = list(signatures)
+    for band in range(bands):
+        buckets: dict[tuple[int, ...], str] = {}
+        for translit in translits:
+            signature = signatures[translit]
+            anchor = buckets.setdefault(
+                signature[band * rows : (band + 1) * rows], translit
+            )
+            if (
+                anchor != translit
+                and similarity(signatures[anchor], signature) >= threshold
+                and _DIGITS.findall(anchor) == _DIGITS.findall(translit)
+            ):
+                blocks.union(by_translit[anchor], by_translit[translit])
+
+    return typing.cast(list[list[str]], blocks.groups())
+
+
+async def canonicalize(
+    agent: NerAgent,
+    surfaces: typing.Iterable[str],
+    *,
+    model: (
+        agents.OpenAIChatCompletionsModel
+        | agents.OpenAIResponsesModel
+        | ChatModel
+        | str
+        | None
+    ) = None,
+    model_settings: typing.Optional[agents.ModelSettings] = None,
+    tracing_disabled: bool = True,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    threshold: float = DEFAULT_THRESHOLD,
+    num_perm: int = DEFAULT_NUM_PERM,
+    bands: int = DEFAULT_BANDS,
+    max_block_size: int = DEFAULT_MAX_BLOCK_SIZE,
+    seed: int = 0,
+) -> CanonicalizationResult:
+    """
+    Cluster entity surfaces and pick a canonical name for each cluster.
+
+    Surfaces that differ only in case, width, punctuation or spacing are merged
+    locally and named by their most frequent spelling. Candidate blocks that
+    still hold several distinct keys are ambiguous; one representative per key
+    is sent to `analyze_synonyms_and_canonical_name`, at most `concurrency`
+    calls at a time, and positive verdicts are merged with union-find. Blocks
+    larger than `max_block_size` are split into chunks that share the block's
+    first key, so positive verdicts still join across chunks. A chunk of more
+    than two keys judged not synonymous is asked again as pairs against its
+    first key, and the keys that key rejects are asked again among themselves.
+    The number of model calls grows with the ambiguous blocks, not with the
+    surfaces; `model_calls` counts every call, including the re-asked ones.
+
+    A failed call leaves its keys unmerged and is reported in `failed_blocks`.
+    """
+    if max_block_size < 2:
+        raise ValueError("max_block_size must be >= 2")
+
+    counts: collections.Counter[str] = collections.Counter(
+        s for s in (s.strip() for s in surfaces) if s
+    )
+    spellings: dict[str, list[str]] = {}
+    for surface in counts:
+        spellings.setdefault(fold_key(surface) or surface, []).append(surface)
+    representative = {
+        key: max(group, key=lambda s: counts[s]) for key, group in spellings.items()
+    }
+
+    chunks: list[list[str]] = []
+    for block in candidate_blocks(
+        list(spellings),
+        threshold=threshold,
+        num_perm=num_perm,
+        bands=bands,
+        seed=seed,
+    ):
+        if len(block) < 2:
+            continue
+        anchor, rest = block[0], block[1:]
+        step = max_block_size - 1
+        chunks.extend([anchor, *rest[i : i + step]] for i in range(0, len(rest), step))
+
+    clusters = UnionFind(spellings)
+    model_names: dict[str, str] = {}
+    failed_blocks: list[list[str]] = []
+    model_calls = 0
+    # Each query is a chunk of keys, plus the list collecting the keys its
+    # anchor rejected when the chunk is one pair of a split chunk.
+    queries: list[tuple[list[str], typing.Optional[list[str]]]] = [
+        (chunk, None) for chunk in chunks
+    ]
+    while queries:
+        verdicts = await _gather_bounded(
+            (
+                functools.partial(
+                    agent.analyze_synonyms_and_canonical_name,
+                    [representative[key] for key in chunk],
+                    model=model,
+                    model_settings=model_settings,
+                    tracing_disabled=tracing_disabled,
+                )
+                for chunk, _ in queries
+            ),
+            concurrency=concurrency,
+        )
+        model_calls += len(queries)
+
+        next_queries: list[tuple[list[str], typing.Optional[list[str]]]] = []
+        rejected_sets: dict[int, list[str]] = {}
+        for (chunk, rejected), verdict in zip(queries, verdicts):
+            if not isinstance(verdict, SynonymsAndCanonicalNameResult):
+                logger.warning(f"Canonicalization block failed: {verdict!r}")
+                failed_blocks.append([representative[key] for key in chunk])
+            elif verdict.is_synonymous:
+                for key in chunk[1:]:
+                    clusters.union(chunk[0], key)
+                if verdict.canonical_name:
+                    model_names.setdefault(chunk[0], verdict.canonical_name)
+            elif rejected is not None:
+                rejected.append(chunk[1])
+                rejected_sets[id(rejected)] = rejected
+            elif len(chunk) > 2:
+                # One outlier rejects the whole chunk, so ask about each key
+                # against the anchor; the keys it rejects are asked again
+                # among themselves.
+                split: list[str] = []
+                next_queries.extend(([chunk[0], key], split) for key in chunk[1:])
+        next_queries.extend(
+            (keys, None) for keys in rejected_sets.values() if len(keys) > 1
+        )
+        queries = next_queries
+
+    result = CanonicalizationResult(
+        clusters=[], model_calls=model_calls, failed_blocks=failed_blocks
+    )
+    for keys in typing.cast(list[list[str]], clusters.groups()):
+        members = [surface for key in keys for surface in spellings[key]]
+        if len(keys) > 1:
+            canonical_name = next(
+                (model_names[k] for k in keys if k in model_names),
+                max(members, key=lambda s: counts[s]),
+            )
+            resolved_by: typing.Literal["local", "model"] = "model"
+        else:
+            canonical_name = representative[keys[0]]
+            resolved_by = "local"
+        result.clusters.append(
+            CanonicalCluster(
+                canonical_name=canonical_name,
+                surfaces=members,
+                resolved_by=resolved_by,
+            )
+        )
+    return result
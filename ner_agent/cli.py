@@ -0,0 +1,313 @@
+# ner_agent/cli.py
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import pathlib
+import sys
+import typing
+
+import agents
+
+from ner_agent import DEFAULT_CONCURRENCY, DEFAULT_MODEL, NerAgent
+
+logger = logging.getLogger(__name__)
+
+METHODS = (
+    "run",
+    "analyze_entities",
+    "extract_relations",
+    "extract_entities_and_relations",
+)
+DEFAULT_CHECKPOINT_EVERY = 100
+
+
+class Checkpoint:
+    """
+    Record of finished input lines, stored as a watermark (every line below it
+    is settled) plus the settled lines above it, so its size does not grow with
+    the input. Lines that failed are settled too but kept in `failed`, so a
+    resumed run retries them. `output_offset` is the size of the output file
+    when the checkpoint was saved, so a resumed run can drop results written
+    after it. Saved atomically as JSON.
+    """
+
+    def __init__(self, path: str | pathlib.Path):
+        self.path = pathlib.Path(path)
+        self.watermark = 0
+        self.done: set[int] = set()
+        self.failed: set[int] = set()
+        self.output_offset: typing.Optional[int] = None
+
+    @classmethod
+    def load(cls, path: str | pathlib.Path) -> "Checkpoint":
+        checkpoint = cls(path)
+        if checkpoint.path.exists():
+            data = json.loads(checkpoint.path.read_text())
+            checkpoint.watermark = data["watermark"]
+            checkpoint.done = set(data["done"])
+            checkpoint.failed = set(data.get("failed", ()))
+            checkpoint.output_offset = data.get("output_offset")
+        return checkpoint
+
+    def is_done(self, line_no: int) -> bool:
+        return (
+            line_no < self.watermark or line_no in self.done
+        ) and line_no not in self.failed
+
+    def mark_done(self, line_no: int) -> None:
+        self.failed.discard(line_no)
+        if line_no < self.watermark:
+            return
+        self.done.add(line_no)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+
+    def mark_failed(self, line_no: int) -> None:
+        self.mark_done(line_no)
+        self.failed.add(line_no)
+
+    def save(self) -> None:
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(
+            json.dumps(
+                {
+                    "watermark": self.watermark,
+                    "done": sorted(self.done),
+                    "failed": sorted(self.failed),
+                    "output_offset": self.output_offset,
+                }
+            )
+        )
+        os.replace(tmp_path, self.path)
+
+
+async def process_lines(
+    agent: NerAgent,
+    lines: typing.Iterable[str],
+    write: typing.Callable[[str], None],
+    *,
+    method: str = "run",
+    model: (
+        agents.OpenAIChatCompletionsModel | agents.OpenAIResponsesModel | str | None
+    ) = None,
+    input_format: str = "jsonl",
+    text_field: str = "text",
+    id_field: str = "id",
+    concurrency: int = DEFAULT_CONCURRENCY,
+    ordered: bool = False,
+    checkpoint: typing.Optional[Checkpoint] = None,
+    checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+    tell: typing.Optional[typing.Callable[[], int]] = None,
+) -> None:
+    """
+    Run `method` over every input line and `write` one JSON line per result.
+
+    At most `concurrency` requests are in flight. Results are written in
+    completion order, or in input order with `ordered` (which then holds at
+    most a bounded window of finished results). Lines already finished in
+    `checkpoint` are skipped, and each line is marked done only after its
+    output was written, so a resumed run never loses results. Lines that
+    failed get an error record and are retried by a resumed run. `tell`
+    returns the current size of the output, saved with every checkpoint so
+    a resumed run can truncate results written after it. If `write` raises,
+    the remaining lines are cancelled and the error is re-raised.
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+    if concurrency < 1:
+        raise ValueError("concurrency must be >= 1")
+
+    call = getattr(agent, method)
+    slots = asyncio.Semaphore(concurrency)
+    window = asyncio.Condition()
+    window_size = 4 * concurrency
+    # Finished lines waiting for their turn: output and whether it failed.
+    ready: dict[int, tuple[str | None, bool]] = {}
+    next_line = 0
+    finished = 0
+    # First error raised by `write`; stops the run and is re-raised.
+    error: typing.Optional[Exception] = None
+
+    def _save_checkpoint() -> None:
+        assert checkpoint is not None
+        if tell is not None:
+            checkpoint.output_offset = tell()
+        checkpoint.save()
+
+    def _finish(line_no: int, output: str | None, failed: bool) -> None:
+        nonlocal finished
+        if output is not None:
+            write(output)
+        if checkpoint is not None:
+            if failed:
+                checkpoint.mark_failed(line_no)
+            else:
+                checkpoint.mark_done(line_no)
+            finished += 1
+            if finished % checkpoint_every == 0:
+                _save_checkpoint()
+
+    async def _emit(line_no: int, output: str | None, failed: bool = False) -> None:
+        nonlocal next_line, error
+        if error is not None:
+            return
+        if not ordered:
+            try:
+                _finish(line_no, output, failed)
+            except Exception as e:
+                error = e
+            return
+        async with window:
+            ready[line_no] = (output, failed)
+            try:
+                while next_line in ready:
+                    _finish(next_line, *ready.pop(next_line))
+                    next_line += 1
+            except Exception as e:
+                error = e
+            window.notify_all()
+
+    async def _handle(line_no: int, raw: str) -> None:
+        failed = False
+        try:
+            record_id, text = _parse_line(
+                raw, line_no, input_format, text_field, id_field
+            )
+            result = await call(text, model=model)
+            output = {"id": record_id, "line": line_no, "result": result.model_dump()}
+        except Exception as e:
+            logger.warning(f"Line {line_no} failed: {e!r}")
+            output = {"line": line_no, "error": f"{type(e).__name__}: {e}"}
+            failed = True
+        finally:
+            slots.release()
+        await _emit(line_no, json.dumps(output, ensure_ascii=False), failed)
+
+    tasks: set[asyncio.Task] = set()
+    try:
+        for line_no, raw in enumerate(lines):
+            if checkpoint is not None and checkpoint.is_done(line_no):
+                await _emit(line_no, None)
+                continue
+            if ordered:
+                async with window:
+                    await window.wait_for(
+                        lambda: error is not None or line_no - next_line < window_size
+                    )
+            if error is not None:
+                break
+            await slots.acquire()
+            task = asyncio.create_task(_handle(line_no, raw))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        while tasks and error is None:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # Only left over after a failed write or an interrupt.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if checkpoint is not None:
+            _save_checkpoint()
+    if error is not None:
+        raise error
+
+
+def _parse_line(
+    raw: str, line_no: int, input_format: str, text_field: str, id_field: str
+) -> tuple[typing.Any, str]:
+    if input_format == "lines":
+        return line_no, raw.rstrip("\r\n")
+    record = json.loads(raw)
+    return record.get(id_field, line_no), record[text_field]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="ner-agent",
+        description="Run NerAgent over JSONL or plain-text lines and stream JSONL results.",  # noqa: E501
+    )
+    parser.add_argument("input", nargs="?", default="-", help="input file, - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="output file, - for stdout")
+    parser.add_argument("-m", "--method", choices=METHODS, default="run")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--api-key", default=None)
+    parser.add_argument("--input-format", choices=("jsonl", "lines"), default="jsonl")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument(
+        "--ordered", action="store_true", help="write results in input order"
+    )
+    parser.add_argument(
+        "--checkpoint", default=None, help="checkpoint file used to resume a run"
+    )
+    parser.add_argument(
+        "--checkpoint-every", type=int, default=DEFAULT_CHECKPOINT_EVERY
+    )
+    return parser
+
+
+async def _main(args: argparse.Namespace) -> None:
+    checkpoint = Checkpoint.load(args.checkpoint) if args.checkpoint else None
+    resuming = checkpoint is not None and checkpoint.path.exists()
+
+    with contextlib.ExitStack() as stack:
+        input_stream = (
+            sys.stdin
+            if args.input == "-"
+            else stack.enter_context(open(args.input, encoding="utf-8"))
+        )
+        output_stream = (
+            sys.stdout
+            if args.output == "-"
+            else stack.enter_context(
+                open(args.output, "a" if resuming else "w", encoding="utf-8")
+            )
+        )
+        tell = None if output_stream is sys.stdout else output_stream.tell
+        offset = checkpoint.output_offset if resuming and checkpoint else None
+        if tell is not None and offset is not None:
+            # Drop results written after the checkpoint; their lines rerun.
+            # `truncate` leaves the position, and so `tell`, where it was.
+            output_stream.truncate(offset)
+            output_stream.seek(offset)
+
+        def _write(line: str) -> None:
+            output_stream.write(line + "\n")
+            output_stream.flush()
+
+        async with NerAgent(base_url=args.base_url, api_key=args.api_key) as agent:
+            await process_lines(
+                agent,
+                input_stream,
+                _write,
+                method=args.method,
+                model=args.model,
+                input_format=args.input_format,
+                text_field=args.text_field,
+                id_field=args.id_field,
+                concurrency=args.concurrency,
+                ordered=args.ordered,
+                checkpoint=checkpoint,
+                checkpoint_every=args.checkpoint_every,
+                tell=tell,
+            )
+
+
+def main(argv: typing.Optional[typing.Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# ner_agent/columnar.py
+import array
+import sys
+import typing
+
+from ner_agent import Entity, EntityType, NerResult
+
+if typing.TYPE_CHECKING:
+    import numpy
+
+DEFAULT_TYPE_NAMES: tuple[str, ...] = tuple(str(t) for t in EntityType)
+
+
+class ColumnarNerResult:
+    """
+    Column-oriented, memory-compact form of a `NerResult`.
+
+    Entities are stored as an int32 `starts` column, an int32 `ends` column and
+    a uint8 `types` column of codes into `type_names`. Values are not stored:
+    `value(i)` slices the source text, and only values that differ from their
+    slice (unresolved spans, normalized alignments) are kept, interned, in
+    `values`. `buffers()` exposes the columns without copying through the
+    buffer protocol, as NumPy and Arrow expect.
+    """
+
+    __slots__ = ("text", "starts", "ends", "types", "type_names", "values")
+
+    def __init__(
+        self,
+        text: str,
+        starts: array.array,
+        ends: array.array,
+        types: array.array,
+        *,
+        type_names: tuple[str, ...] = DEFAULT_TYPE_NAMES,
+        values: typing.Optional[dict[int, str]] = None,
+    ):
+        if not len(starts) == len(ends) == len(types):
+            raise ValueError("starts, ends and types must have the same length")
+        self.text = text
+        self.starts = starts
+        self.ends = ends
+        self.types = types
+        self.type_names = type_names
+        self.values = values or {}
+
+    @classmethod
+    def from_ner_result(
+        cls,
+        result: NerResult,
+        *,
+        type_names: tuple[str, ...] = DEFAULT_TYPE_NAMES,
+    ) -> "ColumnarNerResult":
+        text = result.text
+        names = list(type_names)
+        codes = {name: code for code, name in enumerate(names)}
+
+        starts = array.array("i")
+        ends = array.array("i")
+        types = array.array("B")
+        values: dict[int, str] = {}
+        for idx, entity in enumerate(result.entities):
+            code = codes.get(entity.name)
+            if code is None:
+                if len(names) > 255:
+                    raise ValueError("more than 256 distinct entity names")
+                code = codes[entity.name] = len(names)
+                names.append(sys.intern(str(entity.name)))
+
+            starts.append(entity.start)
+            ends.append(entity.end)
+            types.append(code)
+            if entity.start < 0 or text[entity.start : entity.end] != entity.value:
+                values[idx] = sys.intern(entity.value)
+
+        return cls(text, starts, ends, types, type_names=tuple(names), values=values)
+
+    def to_ner_result(self) -> NerResult:
+        return NerResult(text=self.text, entities=list(self))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __iter__(self) -> typing.Iterator[Entity]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def __getitem__(self, idx: int) -> Entity:
+        if idx < 0:
+            idx += len(self)
+        return Entity(
+            name=self.type_names[self.types[idx]],
+            value=self.value(idx),
+            start=self.starts[idx],
+            end=self.ends[idx],
+        )
+
+    def value(self, idx: int) -> str:
+        override = self.values.get(idx)
+        if override is not None:
+            return override
+        return self.text[self.starts[idx] : self.ends[idx]]
+
+    def name(self, idx: int) -> str:
+        return self.type_names[self.types[idx]]
+
+    def buffers(self) -> dict[str, memoryview]:
+        """Zero-copy views of the `starts`, `ends` and `types` columns."""
+        return {
+            "starts": memoryview(self.starts),
+            "ends": memoryview(self.ends),
+            "types": memoryview(self.types),
+        }
+
+    def to_numpy(self) -> dict[str, "numpy.ndarray"]:
+        """Zero-copy NumPy arrays of the columns. Requires `numpy`."""
+        try:
+            import numpy
+        except ImportError as e:
+            raise ImportError("to_numpy requires numpy: pip install numpy") from e
+
+        return {
+            name: numpy.frombuffer(buffer, dtype=dtype)
+            for (name, buffer), dtype in zip(
+                self.buffers().items(), (numpy.int32, numpy.int32, numpy.uint8)
+            )
+        }
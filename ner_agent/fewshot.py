@@ -0,0 +1,183 @@
+# ner_agent/fewshot.py
+import bisect
+import collections
+import typing
+
+DEFAULT_MAX_EXAMPLES = 3
+DEFAULT_MIN_SHARE = 0.1
+
+# (first code point, last code point, script), sorted and non-overlapping.
+_SCRIPT_RANGES: tuple[tuple[int, int, str], ...] = (
+    (0x0041, 0x024F, "latin"),
+    (0x0370, 0x03FF, "greek"),
+    (0x0400, 0x052F, "cyrillic"),
+    (0x0590, 0x05FF, "hebrew"),
+    (0x0600, 0x06FF, "arabic"),
+    (0x0900, 0x097F, "devanagari"),
+    (0x0E00, 0x0E7F, "thai"),
+    (0x1100, 0x11FF, "hangul"),
+    (0x1E00, 0x1EFF, "latin"),
+    (0x3040, 0x30FF, "kana"),
+    (0x3130, 0x318F, "hangul"),
+    (0x31F0, 0x31FF, "kana"),
+    (0x3400, 0x4DBF, "han"),
+    (0x4E00, 0x9FFF, "han"),
+    (0xAC00, 0xD7AF, "hangul"),
+    (0xF900, 0xFAFF, "han"),
+    (0xFF21, 0xFF5A, "latin"),
+    (0xFF66, 0xFF9F, "kana"),
+    (0x20000, 0x2FA1F, "han"),
+)
+_RANGE_STARTS = [first for first, _, _ in _SCRIPT_RANGES]
+# A CJK character carries about as much as a short word in alphabetic scripts.
+_SCRIPT_WEIGHTS = {"han": 2.0, "kana": 2.0, "hangul": 2.0}
+
+
+class FewShotExample(typing.NamedTuple):
+    """One `run()` prompt example: a text and its `(value, entity type)` pairs."""
+
+    text: str
+    entities: tuple[tuple[str, str], ...]
+
+    @property
+    def script(self) -> str:
+        return primary_script(self.text)
+
+
+DEFAULT_FEW_SHOT_EXAMPLES: tuple[FewShotExample, ...] = (
+    FewShotExample(
+        "Elon Musk visited Tesla's Gigafactory in Austin on March 15, 2024, and announced a 20% increase.",  # noqa: E501
+        (
+            ("Elon Musk", "PERSON"),
+            ("Tesla", "PROPER_NOUN"),
+            ("Gigafactory", "LOCATION"),
+            ("Austin", "LOCATION"),
+            ("March 15, 2024", "DATETIME"),
+            ("20%", "NUMERIC"),
+        ),
+    ),
+    FewShotExample(
+        "La presidenta mexicana visitó la sede de las Naciones Unidas en Nueva York el martes pasado para discutir los derechos humanos.",  # noqa: E501
+        (
+            ("mexicana", "NORP"),
+            ("Naciones Unidas", "PROPER_NOUN"),
+            ("Nueva York", "LOCATION"),
+            ("martes pasado", "DATETIME"),
+            ("derechos humanos", "PROPER_NOUN"),
+        ),
+    ),
+    FewShotExample(
+        "蘋果公司在台北101發表了iPhone 15，預計售價為新台幣35,000元",
+        (
+            ("蘋果公司", "PROPER_NOUN"),
+            ("台北101", "LOCATION"),
+            ("iPhone 15", "PROPER_NOUN"),
+            ("新台幣35,000元", "NUMERIC"),
+        ),
+    ),
+    FewShotExample(
+        "東京オリンピックで日本人選手が金メダルを獲得し、君が代が演奏された。",
+        (
+            ("東京オリンピック", "PROPER_NOUN"),
+            ("日本人", "NORP"),
+            ("金メダル", "PROPER_NOUN"),
+            ("君が代", "PROPER_NOUN"),
+        ),
+    ),
+    FewShotExample(
+        "삼성전자는 서울 강남구에서 오전 9시에 갤럭시 S24를 공개했고, 한국어 AI 기능을 강조했다.",  # noqa: E501
+        (
+            ("삼성전자", "PROPER_NOUN"),
+            ("서울", "LOCATION"),
+            ("강남구", "LOCATION"),
+            ("오전 9시", "DATETIME"),
+            ("갤럭시 S24", "PROPER_NOUN"),
+            ("한국어", "NORP"),
+        ),
+    ),
+    FewShotExample(
+        "The Buddhist monks from Mount Fuji will perform at Carnegie Hall next Friday, celebrating the first anniversary of their Peace Treaty.",  # noqa: E501
+        (
+            ("Buddhist", "NORP"),
+            ("Mount Fuji", "LOCATION"),
+            ("Carnegie Hall", "LOCATION"),
+            ("next Friday", "DATETIME"),
+            ("first", "NUMERIC"),
+            ("Peace Treaty", "PROPER_NOUN"),
+        ),
+    ),
+    FewShotExample(
+        "L'Hôpital Saint-Louis est un des hôpitaux de Paris.",
+        (
+            ("L'Hôpital Saint-Louis", "LOCATION"),
+            ("hôpitaux", "LOCATION"),
+            ("Paris", "LOCATION"),
+        ),
+    ),
+)
+
+
+def script_of(char: str) -> typing.Optional[str]:
+    """Script of a letter, "other" for letters outside the table, else None."""
+    if not char.isalpha():
+        return None
+    code = ord(char)
+    idx = bisect.bisect_right(_RANGE_STARTS, code) - 1
+    if idx >= 0 and code <= _SCRIPT_RANGES[idx][1]:
+        return _SCRIPT_RANGES[idx][2]
+    return "other"
+
+
+def script_shares(text: str) -> dict[str, float]:
+    """Weighted share of each script among the letters of `text`."""
+    counts: collections.Counter[str] = collections.Counter(
+        script for script in map(script_of, text) if script is not None
+    )
+    weighted = {s: n * _SCRIPT_WEIGHTS.get(s, 1.0) for s, n in counts.items()}
+    total = sum(weighted.values())
+    return {s: w / total for s, w in weighted.items()} if total else {}
+
+
+def detect_scripts(
+    text: str, *, min_share: float = DEFAULT_MIN_SHARE
+) -> frozenset[str]:
+    """Scripts making up at least `min_share` of the letters of `text`."""
+    return frozenset(
+        s for s, share in script_shares(text).items() if share >= min_share
+    )
+
+
+def primary_script(text: str) -> str:
+    shares = script_shares(text)
+    return max(shares, key=shares.__getitem__) if shares else "other"
+
+
+def select_examples(
+    text: str,
+    examples: typing.Sequence[FewShotExample] = DEFAULT_FEW_SHOT_EXAMPLES,
+    *,
+    max_examples: int = DEFAULT_MAX_EXAMPLES,
+) -> tuple[FewShotExample, ...]:
+    """
+    Pick the examples written in a script of `text`, in registry order and at
+    most `max_examples` of them, but at least one per detected script when
+    available. Texts in scripts no example covers get the first examples.
+    """
+    scripts = detect_scripts(text)
+    matching = [example for example in examples if example.script in scripts]
+    if not matching:
+        return tuple(examples[:max_examples])
+
+    # One example per script first, so mixed-script texts see each of them.
+    chosen: list[FewShotExample] = []
+    covered: set[str] = set()
+    for example in matching:
+        if example.script not in covered:
+            chosen.append(example)
+            covered.add(example.script)
+    for example in matching:
+        if len(chosen) >= max_examples:
+            break
+        if example not in chosen:
+            chosen.append(example)
+    return tuple(sorted(chosen, key=matching.index))
@@ -0,0 +1,279 @@
+# ner_agent/gazetteer.py
+import array
+import bisect
+import hashlib
+import mmap
+import pathlib
+import typing
+
+from ner_agent.arrayfile import load_arrays, save_arrays
+from ner_agent.spans import AhoCorasick, leftmost_longest
+
+MAGIC = b"NERGAZ01"
+DEFAULT_LEARN_TYPES = ("PERSON", "NORP", "LOCATION", "PROPER_NOUN")
+MIN_PENDING_SURFACES = 1 << 12
+
+# Flat automaton arrays: name -> array typecode. Node `n` owns the transitions
+# `edge_chars[edge_starts[n]:edge_starts[n + 1]]`, sorted by code point.
+_ARRAYS = {
+    "edge_starts": "i",
+    "edge_chars": "I",
+    "edge_targets": "i",
+    "fail": "i",
+    "output": "i",
+    "dict_link": "i",
+    "lengths": "i",
+    "types": "B",
+    "surface_offsets": "i",
+    "surfaces": "B",
+}
+
+
+class _Learnable(typing.Protocol):
+    name: str
+    value: str
+    start: int
+
+
+class Gazetteer:
+    """
+    Known entity surfaces and their types, matched in one pass over a text.
+
+    The surfaces are compiled into an Aho-Corasick automaton stored in flat
+    arrays. `save` writes them to one file and `load` memory-maps it, so loading
+    does no parsing and worker processes that load the same file share its
+    pages.
+
+    Surfaces added after compiling, e.g. by `learn`, go to a pending buffer
+    that `find` matches by dictionary lookups at word starts. The buffer is
+    folded into the automaton once it outgrows `MIN_PENDING_SURFACES` and half
+    the compiled surfaces, so recompiles stay proportional to what was added.
+    """
+
+    def __init__(
+        self,
+        entries: typing.Union[
+            typing.Mapping[str, str], typing.Iterable[tuple[str, str]]
+        ] = (),
+    ):
+        self._entries: typing.Optional[dict[str, str]] = {}
+        self._arrays: typing.Optional[dict[str, typing.Any]] = None
+        self._mmap: typing.Optional[mmap.mmap] = None
+        self._pending: dict[str, str] = {}
+        self._pending_lengths: set[int] = set()
+        self._digest = hashlib.sha256()
+        self.type_names: tuple[str, ...] = ()
+        self.fingerprint = ""
+        self.update(entries)
+
+    def __len__(self) -> int:
+        if self._entries is None:
+            assert self._arrays is not None
+            return len(self._arrays["lengths"])
+        return len(self._entries)
+
+    def __contains__(self, surface: str) -> bool:
+        return surface in self.entries()
+
+    def entries(self) -> dict[str, str]:
+        """Surface to entity type, decoded from the compiled file if needed."""
+        if self._entries is None:
+            assert self._arrays is not None
+            offsets = self._arrays["surface_offsets"]
+            blob = self._arrays["surfaces"]
+            types = self._arrays["types"]
+            self._entries = {
+                bytes(blob[offsets[i] : offsets[i + 1]]).decode("utf-8"): (
+                    self.type_names[types[i]]
+                )
+                for i in range(len(types))
+            }
+        return self._entries
+
+    def add(self, surface: str, entity_type: str) -> None:
+        surface = surface.strip()
+        if not surface:
+            return
+        entries = self.entries()
+        if entries.get(surface) == entity_type:
+            return
+        entries[surface] = entity_type
+        if self._arrays is None:
+            return
+        self._pending[surface] = entity_type
+        self._pending_lengths.add(len(surface))
+        self._digest.update(_digest_entry(surface, entity_type))
+        self.fingerprint = self._digest.hexdigest()
+
+    def update(
+        self,
+        entries: typing.Union[
+            typing.Mapping[str, str], typing.Iterable[tuple[str, str]]
+        ],
+    ) -> None:
+        items = entries.items() if isinstance(entries, typing.Mapping) else entries
+        for surface, entity_type in items:
+            self.add(surface, str(entity_type))
+
+    def learn(
+        self,
+        entities: typing.Iterable[_Learnable],
+        *,
+        types: typing.Collection[str] = DEFAULT_LEARN_TYPES,
+    ) -> None:
+        """Add resolved entities of the given `types`, e.g. from `run()` results."""
+        for entity in entities:
+            if entity.start >= 0 and str(entity.name) in types:
+                self.add(entity.value, str(entity.name))
+
+    def compile(self) -> None:
+        """Build the automaton, folding in pending surfaces once there are many."""
+        if self._arrays is not None:
+            compiled = len(self._arrays["lengths"])
+            if len(self._pending) < max(MIN_PENDING_SURFACES, compiled // 2):
+                return
+        entries = self.entries()
+        surfaces = list(entries)
+        self.type_names = tuple(sorted(set(entries.values())))
+        if len(self.type_names) > 256:
+            raise ValueError("more than 256 distinct entity types")
+        codes = {name: code for code, name in enumerate(self.type_names)}
+
+        arrays = {name: array.array(code) for name, code in _ARRAYS.items()}
+        arrays["edge_starts"].append(0)
+        if surfaces:
+            automaton = AhoCorasick(surfaces)
+            for transitions in automaton._goto:
+                for char, target in sorted(transitions.items()):
+                    arrays["edge_chars"].append(ord(char))
+                    arrays["edge_targets"].append(target)
+                arrays["edge_starts"].append(len(arrays["edge_chars"]))
+            arrays["fail"].extend(automaton._fail)
+            arrays["output"].extend(automaton._output)
+            arrays["dict_link"].extend(automaton._dict_link)
+        else:
+            arrays["edge_starts"].append(0)
+            arrays["fail"].append(0)
+            arrays["output"].append(-1)
+            arrays["dict_link"].append(-1)
+
+        digest = hashlib.sha256()
+        arrays["surface_offsets"].append(0)
+        for surface in surfaces:
+            encoded = surface.encode("utf-8")
+            arrays["lengths"].append(len(surface))
+            arrays["types"].append(codes[entries[surface]])
+            arrays["surfaces"].frombytes(encoded)
+            arrays["surface_offsets"].append(len(arrays["surfaces"]))
+            digest.update(_digest_entry(surface, entries[surface]))
+
+        self._arrays = arrays
+        self._pending = {}
+        self._pending_lengths = set()
+        self._digest = digest
+        self.fingerprint = digest.hexdigest()
+
+    def find(self, text: str) -> list[tuple[int, int, str]]:
+        """
+        Return `(start, end, entity_type)` for known surfaces in `text` that do
+        not cut through a word, keeping the earliest and then longest match.
+        """
+        self.compile()
+        arrays = self._arrays
+        assert arrays is not None
+        edge_starts = arrays["edge_starts"]
+        edge_chars = arrays["edge_chars"]
+        edge_targets = arrays["edge_targets"]
+        fail = arrays["fail"]
+        output = arrays["output"]
+        dict_link = arrays["dict_link"]
+        lengths = arrays["lengths"]
+        types = arrays["types"]
+
+        matches: list[tuple[int, int, str]] = []
+        node = 0
+        for end, char in enumerate(text, 1):
+            code = ord(char)
+            while True:
+                lo, hi = edge_starts[node], edge_starts[node + 1]
+                idx = bisect.bisect_left(edge_chars, code, lo, hi)
+                if idx < hi and edge_chars[idx] == code:
+                    node = edge_targets[idx]
+                    break
+                if node == 0:
+                    break
+                node = fail[node]
+
+            match = node if output[node] != -1 else dict_link[node]
+            while match != -1:
+                entry = output[match]
+                start = end - lengths[entry]
+                if _on_word_boundary(text, start, end) and (
+                    not self._pending or text[start:end] not in self._pending
+                ):
+                    matches.append((start, end, self.type_names[types[entry]]))
+                match = dict_link[match]
+
+        if self._pending:
+            matches.extend(self._find_pending(text))
+        return leftmost_longest(matches)
+
+    def save(self, path: str | pathlib.Path) -> None:
+        """Write the compiled automaton to `path`, atomically."""
+        if self._pending:
+            self._arrays = None
+        self.compile()
+        assert self._arrays is not None
+        save_arrays(
+            path,
+            MAGIC,
+            {"type_names": self.type_names, "fingerprint": self.fingerprint},
+            {name: self._arrays[name] for name in _ARRAYS},
+        )
+
+    def _find_pending(self, text: str) -> list[tuple[int, int, str]]:
+        lengths = sorted(self._pending_lengths)
+        matches = []
+        for start in range(len(text)):
+            prev_in_word = start > 0 and _is_word_char(text[start - 1])
+            if prev_in_word and _is_word_char(text[start]):
+                continue
+            for length in lengths:
+                end = start + length
+                if end > len(text):
+                    break
+                entity_type = self._pending.get(text[start:end])
+                if entity_type is not None and _on_word_boundary(text, start, end):
+                    matches.append((start, end, entity_type))
+        return matches
+
+    @classmethod
+    def load(cls, path: str | pathlib.Path) -> "Gazetteer":
+        """Memory-map a file written by `save`."""
+        header, arrays, mapped = load_arrays(path, MAGIC)
+        gazetteer = cls()
+        gazetteer._entries = None
+        gazetteer._arrays = dict(arrays)
+        gazetteer._mmap = mapped
+        gazetteer.type_names = tuple(header["type_names"])
+        gazetteer.fingerprint = header["fingerprint"]
+        gazetteer._digest = hashlib.sha256(bytes.fromhex(gazetteer.fingerprint))
+        return gazetteer
+
+
+def _digest_entry(surface: str, entity_type: str) -> bytes:
+    return surface.encode("utf-8") + b"\x00" + entity_type.encode("utf-8") + b"\x00"
+
+
+def _is_word_char(char: str) -> bool:
+    # Scripts written without spaces (CJK, kana, Hangul) have no word breaks
+    # to respect.
+    return char.isalnum() and char < "\u2e80"
+
+
+def _on_word_boundary(text: str, start: int, end: int) -> bool:
+    if start > 0 and _is_word_char(text[start - 1]) and _is_word_char(text[start]):
+        return False
+    if end < len(text) and _is_word_char(text[end - 1]) and _is_word_char(text[end]):
+        return False
+    return True
@@ -0,0 +1,358 @@
+# ner_agent/graph.py
+import array
+import bisect
+import heapq
+import itertools
+import logging
+import mmap
+import pathlib
+import typing
+
+from ner_agent.arrayfile import load_arrays, save_arrays
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"NERKG001"
+RELATIONS = ("is_a", "has_a", "related_to")
+MIN_PENDING_EDGES = 1 << 16
+
+_RELATION_CODES = {relation: code for code, relation in enumerate(RELATIONS)}
+# Node IDs are non-negative int32s, so a whole edge packs into 64 bits.
+_ID_BITS = 31
+_ID_MASK = (1 << _ID_BITS) - 1
+
+
+class _TripletLike(typing.Protocol):
+    subject: str
+    relation: str
+    object: str
+
+
+class KnowledgeGraph:
+    """
+    Deduplicated `(subject, relation, object)` edges over interned node names.
+
+    Node names are interned to int32 IDs and relations to one-byte codes from
+    `RELATIONS`. Edges live in two CSR indexes: outgoing edges grouped by
+    subject, then relation, then object, and incoming edges grouped by object,
+    then relation, then subject. A node's neighbors, optionally of one
+    relation, are a contiguous slice found by binary search.
+
+    New edges and names go to a pending buffer that queries merge in.
+    `compact` splices the buffer into the indexes and the sorted name table,
+    copying untouched stretches as whole arrays; it runs on its own once the
+    buffer outgrows `MIN_PENDING_EDGES` and half the stored edges, so
+    rebuilds stay proportional to the edges added.
+    `save` writes the arrays to one file and `load` memory-maps it.
+    """
+
+    def __init__(self, triplets: typing.Iterable[_TripletLike] = ()):
+        self._arrays: dict[str, typing.Any] = _empty_index()
+        self._base_nodes = 0
+        self._mapped_nodes = 0
+        self._ids: dict[str, int] = {}
+        self._added_names: list[str] = []
+        self._pending: set[int] = set()
+        self._pending_index: dict[str, dict[int, list[int]]] = {"out": {}, "in": {}}
+        self._mmap: typing.Optional[mmap.mmap] = None
+        self.add_triplets(triplets)
+
+    def __len__(self) -> int:
+        """Number of distinct edges."""
+        return len(self._arrays["out_targets"]) + len(self._pending)
+
+    @property
+    def num_nodes(self) -> int:
+        return self._base_nodes + len(self._added_names)
+
+    def add(self, subject: str, relation: str, object: str) -> bool:
+        """Add one edge. Unknown relations are logged and skipped."""
+        kept = self._add(subject, relation, object)
+        self._maybe_compact()
+        return kept
+
+    def add_triplets(self, triplets: typing.Iterable[_TripletLike]) -> int:
+        """
+        Add `Triplet`s, e.g. from `extract_relations`. Returns the number kept.
+        The buffer is checked once at the end, so a bulk load compacts once.
+        """
+        kept = sum(self._add(t.subject, t.relation, t.object) for t in triplets)
+        self._maybe_compact()
+        return kept
+
+    def node_id(self, name: str) -> typing.Optional[int]:
+        name = name.strip()
+        node = self._ids.get(name)
+        if node is not None or not self._mapped_nodes:
+            return node
+        # Names loaded from a file are only in the mapped, sorted name table.
+        encoded = name.encode("utf-8")
+        order = self._arrays["name_order"]
+        idx = bisect.bisect_left(order, encoded, key=self._name_bytes)
+        if idx < len(order) and self._name_bytes(order[idx]) == encoded:
+            return order[idx]
+        return None
+
+    def name(self, node_id: int) -> str:
+        if node_id >= self._base_nodes:
+            return self._added_names[node_id - self._base_nodes]
+        return self._name_bytes(node_id).decode("utf-8")
+
+    def objects(self, subject: str, relation: typing.Optional[str] = None) -> list[str]:
+        """Objects of `subject`'s edges, of one `relation` if given."""
+        return self._neighbors("out", subject, relation)
+
+    def subjects(self, object: str, relation: typing.Optional[str] = None) -> list[str]:
+        """Subjects of edges pointing at `object`, of one `relation` if given."""
+        return self._neighbors("in", object, relation)
+
+    def triplets(
+        self, relation: typing.Optional[str] = None
+    ) -> typing.Iterator[tuple[str, str, str]]:
+        """Yield every edge as `(subject, relation, object)` names."""
+        code = None if relation is None else self._relation_code(relation)
+        for node in range(self.num_nodes):
+            for key in self._edge_keys("out", node, code):
+                yield (
+                    self.name(node),
+                    RELATIONS[key >> _ID_BITS],
+                    self.name(key & _ID_MASK),
+                )
+
+    def compact(self) -> None:
+        """Merge pending edges and names into the CSR indexes and name table."""
+        if not self._pending and not self._added_names:
+            return
+
+        num_nodes = self.num_nodes
+        arrays: dict[str, typing.Any] = {}
+        for direction, pending in self._pending_index.items():
+            arrays.update(_merge_index(direction, self._arrays, pending, num_nodes))
+        arrays.update(self._merged_names())
+        self._arrays = arrays
+        self._base_nodes = num_nodes
+        self._added_names = []
+        self._pending = set()
+        self._pending_index = {"out": {}, "in": {}}
+
+    def save(self, path: str | pathlib.Path) -> None:
+        """Write the compacted graph to `path`, atomically."""
+        self.compact()
+        save_arrays(path, MAGIC, {"num_nodes": self.num_nodes}, self._arrays)
+
+    @classmethod
+    def load(cls, path: str | pathlib.Path) -> "KnowledgeGraph":
+        """Memory-map a file written by `save`."""
+        header, arrays, mapped = load_arrays(path, MAGIC)
+        graph = cls()
+        graph._base_nodes = graph._mapped_nodes = header["num_nodes"]
+        graph._arrays = dict(arrays)
+        graph._mmap = mapped
+        return graph
+
+    def _add(self, subject: str, relation: str, object: str) -> bool:
+        code = _RELATION_CODES.get(_normalize_relation(relation))
+        subject, object = subject.strip(), object.strip()
+        if code is None:
+            logger.warning(f"Skipping unknown relation {relation!r}")
+            return False
+        if not subject or not object:
+            return False
+        src, dst = self._intern(subject), self._intern(object)
+        if self._has_edge(src, code, dst):
+            return True
+
+        self._pending.add((src << (_ID_BITS + 2)) | (code << _ID_BITS) | dst)
+        self._pending_index["out"].setdefault(src, []).append((code << _ID_BITS) | dst)
+        self._pending_index["in"].setdefault(dst, []).append((code << _ID_BITS) | src)
+        return True
+
+    def _maybe_compact(self) -> None:
+        stored = len(self._arrays["out_targets"])
+        if len(self._pending) >= max(MIN_PENDING_EDGES, stored // 2):
+            self.compact()
+
+    def _intern(self, name: str) -> int:
+        node = self.node_id(name)
+        if node is None:
+            node = self._ids[name] = self.num_nodes
+            self._added_names.append(name)
+        return node
+
+    def _name_bytes(self, node_id: int) -> bytes:
+        offsets = self._arrays["name_offsets"]
+        return bytes(self._arrays["names"][offsets[node_id] : offsets[node_id + 1]])
+
+    def _has_edge(self, src: int, code: int, dst: int) -> bool:
+        key = (src << (_ID_BITS + 2)) | (code << _ID_BITS) | dst
+        if key in self._pending:
+            return True
+        offsets = self._arrays["out_offsets"]
+        if src >= len(offsets) - 1:
+            return False
+        relations = self._arrays["out_relations"]
+        lo = bisect.bisect_left(relations, code, offsets[src], offsets[src + 1])
+        hi = bisect.bisect_right(relations, code, lo, offsets[src + 1])
+        targets = self._arrays["out_targets"]
+        idx = bisect.bisect_left(targets, dst, lo, hi)
+        return idx < hi and targets[idx] == dst
+
+    def _edge_keys(
+        self, direction: str, node: int, code: typing.Optional[int]
+    ) -> list[int]:
+        """Sorted `(relation << _ID_BITS) | neighbor` keys of `node`'s edges."""
+        keys: list[int] = []
+        offsets = self._arrays[f"{direction}_offsets"]
+        if node < len(offsets) - 1:
+            lo, hi = offsets[node], offsets[node + 1]
+            relations = self._arrays[f"{direction}_relations"]
+            if code is not None:
+                lo, hi = (
+                    bisect.bisect_left(relations, code, lo, hi),
+                    bisect.bisect_right(relations, code, lo, hi),
+                )
+            nodes = self._arrays[f"{direction}_targets"]
+            keys = [(relations[idx] << _ID_BITS) | nodes[idx] for idx in range(lo, hi)]
+        pending = [
+            key
+            for key in self._pending_index[direction].get(node, ())
+            if code is None or key >> _ID_BITS == code
+        ]
+        return sorted(keys + pending) if pending else keys
+
+    def _neighbors(
+        self, direction: str, name: str, relation: typing.Optional[str]
+    ) -> list[str]:
+        code = None if relation is None else self._relation_code(relation)
+        node = self.node_id(name)
+        if node is None:
+            return []
+        return [
+            self.name(key & _ID_MASK) for key in self._edge_keys(direction, node, code)
+        ]
+
+    def _merged_names(self) -> dict[str, array.array]:
+        """The name table with the names added since the last `compact`."""
+        offsets = array.array("q")
+        _extend(offsets, self._arrays["name_offsets"])
+        blob = array.array("B")
+        _extend(blob, self._arrays["names"])
+        encoded = [name.encode("utf-8") for name in self._added_names]
+        for value in encoded:
+            blob.frombytes(value)
+            offsets.append(len(blob))
+
+        old_order = self._arrays["name_order"]
+        new_ids = sorted(
+            range(self._base_nodes, self._base_nodes + len(encoded)),
+            key=lambda node: encoded[node - self._base_nodes],
+        )
+        if len(new_ids) * _ID_BITS > len(old_order):
+            # Many new names: one merge pass over both sorted orders.
+            order = array.array(
+                "i",
+                heapq.merge(
+                    old_order,
+                    new_ids,
+                    key=lambda node: (
+                        encoded[node - self._base_nodes]
+                        if node >= self._base_nodes
+                        else self._name_bytes(node)
+                    ),
+                ),
+            )
+        else:
+            # A few new names: splice them in by binary search.
+            order = array.array("i")
+            prev = 0
+            for node in new_ids:
+                value = encoded[node - self._base_nodes]
+                pos = bisect.bisect_left(old_order, value, key=self._name_bytes)
+                _extend(order, old_order[prev:pos])
+                order.append(node)
+                prev = pos
+            _extend(order, old_order[prev:])
+        return {"name_offsets": offsets, "names": blob, "name_order": order}
+
+    @staticmethod
+    def _relation_code(relation: str) -> int:
+        code = _RELATION_CODES.get(_normalize_relation(relation))
+        if code is None:
+            raise ValueError(f"unknown relation {relation!r}, expected {RELATIONS}")
+        return code
+
+
+def _normalize_relation(relation: str) -> str:
+    return "_".join(relation.strip().lower().replace("-", " ").split())
+
+
+def _empty_index() -> dict[str, array.array]:
+    return {
+        "out_offsets": array.array("q", [0]),
+        "out_targets": array.array("i"),
+        "out_relations": array.array("B"),
+        "in_offsets": array.array("q", [0]),
+        "in_targets": array.array("i"),
+        "in_relations": array.array("B"),
+        "name_offsets": array.array("q", [0]),
+        "names": array.array("B"),
+        "name_order": array.array("i"),
+    }
+
+
+def _extend(target: array.array, values: typing.Any) -> None:
+    """Append a slice of an array or a mapped memoryview to `target` at once."""
+    target.frombytes(memoryview(values).cast("B"))
+
+
+def _merge_index(
+    direction: str,
+    arrays: typing.Mapping[str, typing.Any],
+    pending: dict[int, list[int]],
+    num_nodes: int,
+) -> dict[str, array.array]:
+    """
+    Splice `pending` `(relation << _ID_BITS) | neighbor` keys per node into one
+    CSR index, grown to `num_nodes`. Stretches of nodes without pending edges
+    are copied as whole slices.
+    """
+    offsets = arrays[f"{direction}_offsets"]
+    nodes = arrays[f"{direction}_targets"]
+    relations = arrays[f"{direction}_relations"]
+    stored_nodes = len(offsets) - 1
+
+    new_offsets = array.array("q", [0])
+    new_nodes = array.array("i")
+    new_relations = array.array("B")
+    shift = 0
+    start = 0
+    for node in [*sorted(pending), num_nodes]:
+        end = max(start, min(node, stored_nodes))
+        if start < end:
+            lo, hi = offsets[start], offsets[end]
+            _extend(new_nodes, nodes[lo:hi])
+            _extend(new_relations, relations[lo:hi])
+            new_offsets.extend(map(shift.__add__, offsets[start + 1 : end + 1]))
+        new_offsets.extend(itertools.repeat(new_offsets[-1], node - end))
+        if node == num_nodes:
+            break
+
+        keys = pending[node]
+        shift += len(keys)
+        if node < stored_nodes and offsets[node] < offsets[node + 1]:
+            lo, hi = offsets[node], offsets[node + 1]
+            keys = keys + [
+                (relation << _ID_BITS) | neighbor
+                for relation, neighbor in zip(relations[lo:hi], nodes[lo:hi])
+            ]
+        keys.sort()
+        new_relations.extend([key >> _ID_BITS for key in keys])
+        new_nodes.extend([key & _ID_MASK for key in keys])
+        new_offsets.append(new_offsets[-1] + len(keys))
+        start = node + 1
+
+    return {
+        f"{direction}_offsets": new_offsets,
+        f"{direction}_targets": new_nodes,
+        f"{direction}_relations": new_relations,
+    }
@@ -0,0 +1,150 @@
+# ner_agent/hedging.py
+import asyncio
+import bisect
+import collections
+import logging
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+T = typing.TypeVar("T")
+
+DEFAULT_HEDGE_PERCENTILE = 0.95
+DEFAULT_MAX_HEDGE_RATE = 0.05
+DEFAULT_LATENCY_WINDOW = 512
+DEFAULT_MIN_SAMPLES = 20
+
+
+class LatencyTracker:
+    """Percentiles over the last `window` latencies, kept sorted."""
+
+    def __init__(self, window: int = DEFAULT_LATENCY_WINDOW):
+        self._recent: collections.deque[float] = collections.deque(maxlen=window)
+        self._sorted: list[float] = []
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+    def record(self, latency: float) -> None:
+        if len(self._recent) == self._recent.maxlen:
+            evicted = self._recent[0]
+            del self._sorted[bisect.bisect_left(self._sorted, evicted)]
+        self._recent.append(latency)
+        bisect.insort(self._sorted, latency)
+
+    def percentile(self, q: float) -> float:
+        if not self._sorted:
+            raise ValueError("no latencies recorded")
+        idx = min(len(self._sorted) - 1, int(q * len(self._sorted)))
+        return self._sorted[idx]
+
+
+class HedgePolicy:
+    """
+    When to send a duplicate of a slow call.
+
+    A call that has not finished after the `percentile` latency of recent
+    successful calls to the same model is hedged with a second identical call,
+    and whichever finishes first wins. Models with fewer than `min_samples`
+    recorded latencies are not hedged, and hedges are capped at
+    `max_hedge_rate` of all calls.
+    """
+
+    def __init__(
+        self,
+        *,
+        percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        max_hedge_rate: float = DEFAULT_MAX_HEDGE_RATE,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+        window: int = DEFAULT_LATENCY_WINDOW,
+        min_delay: float = 0.0,
+    ):
+        if not 0 < percentile < 1:
+            raise ValueError("percentile must be between 0 and 1")
+        self.percentile = percentile
+        self.max_hedge_rate = max_hedge_rate
+        self.min_samples = min_samples
+        self.window = window
+        self.min_delay = min_delay
+        self.latencies: dict[str, LatencyTracker] = {}
+        self.calls = 0
+        self.hedges = 0
+
+    def hedge_delay(self, model: str) -> typing.Optional[float]:
+        """Seconds to wait before hedging a call to `model`, or None to not hedge."""
+        tracker = self.latencies.get(model)
+        if tracker is None or len(tracker) < self.min_samples:
+            return None
+        return max(self.min_delay, tracker.percentile(self.percentile))
+
+    def record(self, model: str, latency: float) -> None:
+        tracker = self.latencies.get(model)
+        if tracker is None:
+            tracker = self.latencies[model] = LatencyTracker(self.window)
+        tracker.record(latency)
+
+    def can_hedge(self) -> bool:
+        """Whether one more hedge keeps hedges within `max_hedge_rate` of calls."""
+        return self.hedges + 1 <= self.max_hedge_rate * self.calls
+
+    def try_hedge(self) -> bool:
+        """Count a hedge if it keeps hedges within `max_hedge_rate` of calls."""
+        if not self.can_hedge():
+            return False
+        self.hedges += 1
+        return True
+
+    async def run(
+        self,
+        model: str,
+        factory: typing.Callable[[], typing.Awaitable[T]],
+        *,
+        hedge_factory: typing.Optional[
+            typing.Callable[[], typing.Optional[typing.Awaitable[T]]]
+        ] = None,
+    ) -> T:
+        """
+        Await `factory()`, hedging it with a second call if it is slow. The
+        second call comes from `hedge_factory` if given, which returns None
+        when it cannot be sent now (e.g. no rate limit budget); the call is
+        then not hedged. The losing call is cancelled; if both fail, the first
+        error is raised.
+        """
+        self.calls += 1
+        delay = self.hedge_delay(model)
+
+        started = time.monotonic()
+        primary = asyncio.ensure_future(factory())
+        pending: set[asyncio.Future] = {primary}
+        starts = {primary: started}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done and self.can_hedge():
+                    hedge_call = (hedge_factory or factory)()
+                    if hedge_call is None:
+                        logger.debug(f"Not hedging call to {model}: no budget")
+                    else:
+                        logger.debug(f"Hedging call to {model} after {delay:.3f}s")
+                        self.hedges += 1
+                        hedge = asyncio.ensure_future(hedge_call)
+                        pending.add(hedge)
+                        starts[hedge] = time.monotonic()
+
+            first_error: typing.Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        self.record(model, time.monotonic() - starts[task])
+                        return task.result()
+                    if first_error is None or task is primary:
+                        first_error = task.exception()
+            assert first_error is not None
+            raise first_error
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,209 @@
+# ner_agent/ratelimit.py
+import asyncio
+import contextlib
+import logging
+import random
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 64
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 60.0
+
+
+class TokenBucket:
+    """
+    Bucket refilled continuously at `per_minute / 60` units per second up to
+    `burst`. The level may go negative when actual usage turns out higher than
+    reserved; later callers then wait until the debt is repaid.
+    """
+
+    def __init__(
+        self,
+        per_minute: float,
+        *,
+        burst: typing.Optional[float] = None,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        if per_minute <= 0:
+            raise ValueError("per_minute must be positive")
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute if burst is None else burst
+        self.level = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` (capped at the capacity) can be taken."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= amount
+
+    def refund(self, amount: float) -> None:
+        """Return `amount` (negative to charge more) after reconciling usage."""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+    def drain(self) -> None:
+        self._refill()
+        self.level = min(self.level, 0.0)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budget for one model, with an
+    AIMD concurrency limit.
+
+    Each call reserves one request and its estimated tokens before it is sent,
+    and reconciles the reservation with the reported usage afterwards. A rate
+    limit error drains both buckets, halves the concurrency limit (once per
+    burst of errors: calls admitted before the last decrease do not halve it
+    again) and retries after an exponential backoff with full jitter. Each
+    success raises the limit by about one per limit's worth of calls, up to
+    `max_concurrency`.
+    """
+
+    def __init__(
+        self,
+        *,
+        requests_per_minute: typing.Optional[float] = None,
+        tokens_per_minute: typing.Optional[float] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        min_concurrency: int = 1,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_base: float = DEFAULT_BACKOFF_BASE,
+        backoff_max: float = DEFAULT_BACKOFF_MAX,
+    ):
+        if not 1 <= min_concurrency <= max_concurrency:
+            raise ValueError("need 1 <= min_concurrency <= max_concurrency")
+        self.requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.concurrency = float(max_concurrency)
+        self.in_flight = 0
+        self._epoch = 0  # bumped on every concurrency decrease
+        self._lock = asyncio.Lock()
+        self._slot_freed = asyncio.Condition()
+
+    async def acquire(self, estimated_tokens: int) -> "Reservation":
+        """Wait for a concurrency slot and budget for one call."""
+        async with self._slot_freed:
+            await self._slot_freed.wait_for(
+                lambda: self.in_flight < int(self.concurrency)
+            )
+            self.in_flight += 1
+
+        try:
+            # One waiter at a time, so calls are admitted in arrival order.
+            async with self._lock:
+                while (wait := self._wait_time(estimated_tokens)) > 0:
+                    await asyncio.sleep(wait)
+                if self.requests is not None:
+                    self.requests.take(1)
+                if self.tokens is not None:
+                    self.tokens.take(estimated_tokens)
+        except BaseException:
+            await self._release()
+            raise
+        return Reservation(estimated_tokens, self._epoch)
+
+    def try_acquire(self, estimated_tokens: int) -> typing.Optional["Reservation"]:
+        """
+        Reserve a slot and budget for one call if both are free right now, as
+        for an optional duplicate call; returns None instead of waiting.
+        """
+        if (
+            self.in_flight >= int(self.concurrency)
+            or self._lock.locked()
+            or self._wait_time(estimated_tokens) > 0
+        ):
+            return None
+        self.in_flight += 1
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(estimated_tokens)
+        return Reservation(estimated_tokens, self._epoch)
+
+    async def release(self, reservation: "Reservation") -> None:
+        """Free the slot, reconcile the token reservation and adapt concurrency."""
+        actual_tokens = reservation.actual_tokens
+        if self.tokens is not None and actual_tokens is not None:
+            self.tokens.refund(reservation.estimated_tokens - actual_tokens)
+
+        if reservation.rate_limited:
+            if self.requests is not None:
+                self.requests.drain()
+            if self.tokens is not None:
+                self.tokens.drain()
+            if reservation.epoch == self._epoch:
+                self._epoch += 1
+                self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+                logger.warning(
+                    f"Rate limited, concurrency lowered to {int(self.concurrency)}"
+                )
+        elif actual_tokens is not None:
+            self.concurrency = min(
+                self.max_concurrency, self.concurrency + 1 / self.concurrency
+            )
+        await self._release()
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff delay for retry `attempt` (0-based)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    @contextlib.asynccontextmanager
+    async def reserve(
+        self, estimated_tokens: int
+    ) -> typing.AsyncIterator["Reservation"]:
+        reservation = await self.acquire(estimated_tokens)
+        try:
+            yield reservation
+        finally:
+            await self.release(reservation)
+
+    def _wait_time(self, estimated_tokens: int) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(estimated_tokens))
+        return wait
+
+    async def _release(self) -> None:
+        async with self._slot_freed:
+            self.in_flight -= 1
+            self._slot_freed.notify_all()
+
+
+class Reservation:
+    """Outcome of one reserved call, filled in by the caller."""
+
+    __slots__ = ("estimated_tokens", "epoch", "actual_tokens", "rate_limited")
+
+    def __init__(self, estimated_tokens: int, epoch: int = 0):
+        self.estimated_tokens = estimated_tokens
+        self.epoch = epoch
+        self.actual_tokens: typing.Optional[int] = None
+        self.rate_limited = False
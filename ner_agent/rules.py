@@ -0,0 +1,162 @@
+# ner_agent/rules.py
+import re
+import typing
+
+from ner_agent.spans import leftmost_longest
+
+DATETIME = "DATETIME"
+NUMERIC = "NUMERIC"
+
+_NUM = r"\d+(?:[.,]\d+)*"
+_NUM_START = r"(?<![A-Za-z0-9_.,])"
+_NUM_END = r"(?![0-9_])"
+_WORD_START = r"(?<![^\W\d_])"
+_WORD_END = r"(?![^\W\d_])"
+_SCALE = r"(?:\s?(?:thousand|million|billion|trillion|bn|mn|[kKMB](?![A-Za-z])))?"
+_CJK_SCALE = r"[萬万億亿千百]*"
+
+_MONTHS = (
+    r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?"
+    r"|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?"
+    r"|janvier|février|mars|avril|mai|juin|juillet|août|septembre|octobre"
+    r"|novembre|décembre|enero|febrero|marzo|abril|mayo|junio|julio|agosto"
+    r"|septiembre|octubre|noviembre|diciembre|januar|februar|märz|juni|juli"
+    r"|oktober|dezember)\.?"
+)
+_MERIDIEM = r"(?:[AaPp]\.[Mm]\.|[AaPp][Mm])(?![A-Za-z])"
+_WEEKDAYS = r"(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday)"
+_CURRENCY_PREFIX = (
+    r"(?:US\$|HK\$|NT\$|A\$|C\$|[$€£¥₩₹]|(?:USD|EUR|GBP|JPY|CNY|RMB|TWD|HKD|KRW)\s?"
+    r"|新台幣|台幣|人民幣|人民币|港幣|美金|美元|日幣|日圓)"
+)
+_CURRENCY_SUFFIX = (
+    r"(?:" + _CJK_SCALE + r"(?:元|圓|块|塊|円|원|ドル|달러)"
+    r"|\s?(?:dollars?|euros?|pounds?|yen|yuan|won|rupees?"
+    r"|USD|EUR|GBP|JPY|CNY|TWD)(?![A-Za-z]))"
+)
+_UNITS = (
+    r"\s?(?:kg|mg|g|km/h|km|cm|mm|m|mi|miles?|ft|feet|lbs?|tons?|tonnes?|ml|L"
+    r"|GB|MB|TB|kWh|MW|mph|°C|°F|公里|公斤|公克|公尺|米|キロ|킬로그램|킬로미터)"
+    r"(?![A-Za-z])"
+)
+
+# (entity type, pattern, flags). A match reports its `e` group if it has one.
+DEFAULT_RULES: tuple[tuple[str, str, int], ...] = (
+    # DATETIME
+    (
+        DATETIME,
+        _NUM_START + r"\d{4}-\d{1,2}-\d{1,2}(?:[T ]\d{1,2}:\d{2}(?::\d{2})?)?",
+        0,
+    ),
+    (DATETIME, _NUM_START + r"\d{1,4}/\d{1,2}/\d{1,4}" + _NUM_END, 0),
+    (
+        DATETIME,
+        _WORD_START + _MONTHS + r"\s\d{1,2}(?:st|nd|rd|th)?(?:,?\s\d{4})?" + _NUM_END,
+        re.IGNORECASE,
+    ),
+    (
+        DATETIME,
+        _NUM_START
+        + r"\d{1,2}(?:\.|er|st|nd|rd|th)?\s(?:de\s)?"
+        + _MONTHS
+        + r"(?:,?\s(?:de\s)?\d{4})?"
+        + _WORD_END,
+        re.IGNORECASE,
+    ),
+    (DATETIME, _WORD_START + _MONTHS + r"\s\d{4}" + _NUM_END, re.IGNORECASE),
+    (DATETIME, _WORD_START + r"[QH][1-4]\s?(?:FY\s?)?'?\d{2,4}" + _NUM_END, 0),
+    (DATETIME, _WORD_START + r"FY\s?'?\d{2,4}" + _NUM_END, 0),
+    (
+        DATETIME,
+        _NUM_START + r"\d{1,2}:\d{2}(?::\d{2})?(?:\s?" + _MERIDIEM + r")?",
+        0,
+    ),
+    (DATETIME, _NUM_START + r"\d{1,2}\s?" + _MERIDIEM, 0),
+    (DATETIME, r"\d{2,4}年(?:\d{1,2}月(?:\d{1,2}[日号號])?)?", 0),
+    (DATETIME, r"\d{1,2}月\d{1,2}[日号號]", 0),
+    (
+        DATETIME,
+        r"(?:上午|下午|早上|晚上|中午|凌晨|午前|午後)?\d{1,2}[時时点點](?:\d{1,2}分)?",
+        0,
+    ),
+    (DATETIME, r"\d{4}년(?:\s?\d{1,2}월)?(?:\s?\d{1,2}일)?", 0),
+    (DATETIME, r"\d{1,2}월\s?\d{1,2}일", 0),
+    (DATETIME, r"(?:오전|오후)?\s?\d{1,2}시(?:\s?\d{1,2}분)?", 0),
+    (
+        DATETIME,
+        _WORD_START
+        + r"(?:yesterday|today|tomorrow|tonight|(?:last|next|this)\s(?:week|month"
+        r"|year|weekend|" + _WEEKDAYS + r")|hier|aujourd'hui|demain|ayer|hoy"
+        r"|gestern|heute)" + _WORD_END,
+        re.IGNORECASE,
+    ),
+    (DATETIME, r"(?:前天|昨天|今天|明天|後天|后天|昨日|今日|明日|어제|오늘|내일)", 0),
+    (
+        DATETIME,
+        _NUM_START + r"\d{1,3}[- ]years?[- ]old" + _WORD_END,
+        re.IGNORECASE,
+    ),
+    (DATETIME, _NUM_START + r"\d{1,3}(?:歲|岁|歳|살)", 0),
+    (
+        DATETIME,
+        _WORD_START
+        + r"(?:in|since|by|until|during|from|before|after|en|im|seit|depuis|desde)"
+        r"\s(?P<e>(?:1[5-9]|20)\d{2})" + _NUM_END,
+        re.IGNORECASE,
+    ),
+    # NUMERIC
+    (
+        NUMERIC,
+        _CURRENCY_PREFIX + r"\s?" + _NUM + _SCALE + r"(?:" + _CURRENCY_SUFFIX + r")?",
+        0,
+    ),
+    (NUMERIC, _NUM_START + _NUM + _SCALE + _CURRENCY_SUFFIX, 0),
+    (
+        NUMERIC,
+        _NUM_START
+        + _NUM
+        + r"\s?(?:%|％|percent(?![A-Za-z])|per cent(?![A-Za-z])|パーセント|퍼센트)",
+        0,
+    ),
+    (NUMERIC, _NUM_START + _NUM + _UNITS, 0),
+    (NUMERIC, _NUM_START + r"\d+(?:st|nd|rd|th)" + _WORD_END, 0),
+    (NUMERIC, r"第\d+", 0),
+    (
+        NUMERIC,
+        _WORD_START
+        + r"(?:first|second|third|fourth|fifth|sixth|seventh|eighth|ninth|tenth)"
+        + _WORD_END,
+        re.IGNORECASE,
+    ),
+    (NUMERIC, _NUM_START + _NUM + _SCALE + _CJK_SCALE + _NUM_END, 0),
+)
+
+
+class RuleRecognizer:
+    """
+    Deterministic, multilingual recognizer for `DATETIME` and `NUMERIC`
+    entities. Where matches overlap, the earliest and then longest one wins.
+    """
+
+    def __init__(self, rules: typing.Sequence[tuple[str, str, int]] = DEFAULT_RULES):
+        self.rules = [
+            (entity_type, re.compile(pattern, flags))
+            for entity_type, pattern, flags in rules
+        ]
+        self.entity_types = frozenset(entity_type for entity_type, _ in self.rules)
+
+    def find(self, text: str) -> list[tuple[int, int, str]]:
+        """Return non-overlapping `(start, end, entity_type)`, ordered by start."""
+        matches: list[tuple[int, int, str]] = []
+        for entity_type, pattern in self.rules:
+            for m in pattern.finditer(text):
+                start, end = m.span("e") if "e" in pattern.groupindex else m.span()
+                # Drop surrounding whitespace the optional parts may have taken.
+                while start < end and text[start].isspace():
+                    start += 1
+                while end > start and text[end - 1].isspace():
+                    end -= 1
+                if start < end:
+                    matches.append((start, end, entity_type))
+
+        return leftmost_longest(matches)
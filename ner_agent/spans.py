@@ -0,0 +1,333 @@
+# ner_agent/spans.py
+import bisect
+import collections
+import typing
+import unicodedata
+
+T = typing.TypeVar("T")
+
+# Characters LLMs commonly swap for their ASCII look-alikes, and invisible ones
+# they drop. Applied after NFKC, which already folds full-width forms.
+_CHAR_FOLDS = str.maketrans(
+    {
+        "\u2018": "'",
+        "\u2019": "'",
+        "\u201a": "'",
+        "\u201b": "'",
+        "\u2032": "'",
+        "\u201c": '"',
+        "\u201d": '"',
+        "\u201e": '"',
+        "\u201f": '"',
+        "\u2033": '"',
+        "\u00ab": '"',
+        "\u00bb": '"',
+        "\u2010": "-",
+        "\u2011": "-",
+        "\u2012": "-",
+        "\u2013": "-",
+        "\u2014": "-",
+        "\u2212": "-",
+        "\u00ad": None,
+        "\u200b": None,
+        "\u200c": None,
+        "\u200d": None,
+        "\ufeff": None,
+    }
+)
+
+
+class AhoCorasick:
+    """Multi-pattern matcher reporting every pattern occurrence in one pass."""
+
+    def __init__(self, patterns: typing.Sequence[str]):
+        self.patterns = list(patterns)
+        self.lengths = [len(p) for p in self.patterns]
+
+        self._goto: list[dict[str, int]] = [{}]
+        self._output: list[int] = [-1]  # pattern id ending exactly at the node
+        for pattern_id, pattern in enumerate(self.patterns):
+            if not pattern:
+                raise ValueError("patterns must be non-empty")
+            node = 0
+            for char in pattern:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._output.append(-1)
+                node = next_node
+            if self._output[node] == -1:
+                self._output[node] = pattern_id
+
+        # Failure links, and for each node the nearest proper suffix node that
+        # ends a pattern, so matches are enumerated without walking every link.
+        self._fail = [0] * len(self._goto)
+        self._dict_link = [-1] * len(self._goto)
+        queue = collections.deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[child] = fail if fail != child else 0
+                self._dict_link[child] = (
+                    fail if self._output[fail] != -1 else self._dict_link[fail]
+                )
+
+    def iter_matches(self, text: str) -> typing.Iterator[tuple[int, int]]:
+        """Yield `(start, pattern_id)` for every occurrence, ordered by end."""
+        goto, fail, output, dict_link = (
+            self._goto,
+            self._fail,
+            self._output,
+            self._dict_link,
+        )
+        lengths = self.lengths
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            match = node if output[node] != -1 else dict_link[node]
+            while match != -1:
+                pattern_id = output[match]
+                yield end - lengths[pattern_id], pattern_id
+                match = dict_link[match]
+
+
+class NormalizedText:
+    """
+    A normalized view of `text` with offsets back into the original.
+
+    Each base character and its combining marks are NFKC-normalized together,
+    typographic quotes and dashes are folded to ASCII, invisible characters are
+    dropped and whitespace runs collapse to one space. `starts[i]` and
+    `ends[i]` give the original span that produced normalized character `i`.
+    """
+
+    def __init__(self, text: str):
+        self.original = text
+        parts: list[str] = []
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+
+        pos = 0
+        n = len(text)
+        while pos < n:
+            end = pos + 1
+            if text[pos].isspace():
+                while end < n and text[end].isspace():
+                    end += 1
+                folded = " "
+            else:
+                while end < n and unicodedata.combining(text[end]):
+                    end += 1
+                folded = normalize_surface(text[pos:end], collapse_whitespace=False)
+            for char in folded:
+                parts.append(char)
+                self.starts.append(pos)
+                self.ends.append(end)
+            pos = end
+
+        self.text = "".join(parts)
+
+    def to_original(self, start: int, end: int) -> tuple[int, int]:
+        return (self.starts[start], self.ends[end - 1])
+
+
+def normalize_surface(surface: str, *, collapse_whitespace: bool = True) -> str:
+    """Normalize a surface string the same way `NormalizedText` does."""
+    folded = unicodedata.normalize("NFKC", surface).translate(_CHAR_FOLDS)
+    if collapse_whitespace:
+        folded = " ".join(folded.split())
+    return folded
+
+
+class SpanResolver:
+    """
+    Assign each entity surface its first occurrence in `text` that does not
+    overlap a span already claimed.
+
+    Occurrences of a surface are its non-overlapping left-to-right matches.
+    `prime` finds the occurrences of many surfaces in a single Aho-Corasick
+    pass; surfaces that were not primed are searched on first use. Claimed spans
+    are kept sorted, so each claim costs a binary search, and every occurrence
+    is examined at most once across all claims of its surface.
+
+    With `normalize`, a surface with no free exact occurrence is aligned against
+    a `NormalizedText` view built once per resolver, which tolerates whitespace,
+    full-width, quote and NFKC differences; spans are still reported in
+    original coordinates.
+    """
+
+    def __init__(self, text: str, *, normalize: bool = True):
+        self.text = text
+        self.normalize = normalize
+        self._occurrences: dict[str, list[int]] = {}
+        self._cursor: dict[str, int] = {}
+        self._normalized: NormalizedText | None = None
+        self._normalized_occurrences: dict[str, list[tuple[int, int]]] = {}
+        self._normalized_cursor: dict[str, int] = {}
+        self._claimed: list[tuple[int, int]] = []
+
+    def prime(self, surfaces: typing.Iterable[str]) -> None:
+        pending = list(
+            dict.fromkeys(s for s in surfaces if s and s not in self._occurrences)
+        )
+        if not pending or not self.text:
+            return
+
+        occurrences: list[list[int]] = [[] for _ in pending]
+        next_free = [0] * len(pending)
+        lengths = [len(s) for s in pending]
+        for start, pattern_id in AhoCorasick(pending).iter_matches(self.text):
+            if start >= next_free[pattern_id]:
+                occurrences[pattern_id].append(start)
+                next_free[pattern_id] = start + lengths[pattern_id]
+
+        for surface, starts in zip(pending, occurrences):
+            self._occurrences[surface] = starts
+
+        if self.normalize:
+            self._prime_normalized([s for s, o in zip(pending, occurrences) if not o])
+
+    def _prime_normalized(self, surfaces: list[str]) -> None:
+        by_key: dict[str, list[str]] = {}
+        for surface in surfaces:
+            key = normalize_surface(surface)
+            if key:
+                by_key.setdefault(key, []).append(surface)
+        if not by_key:
+            return
+
+        normalized = self._normalized_view()
+        keys = list(by_key)
+        found: list[list[tuple[int, int]]] = [[] for _ in keys]
+        next_free = [0] * len(keys)
+        for start, key_id in AhoCorasick(keys).iter_matches(normalized.text):
+            if start >= next_free[key_id]:
+                end = start + len(keys[key_id])
+                found[key_id].append(normalized.to_original(start, end))
+                next_free[key_id] = end
+
+        for key, spans in zip(keys, found):
+            for surface in by_key[key]:
+                self._normalized_occurrences[surface] = spans
+
+    def claim(self, surface: str) -> tuple[int, int]:
+        """
+        Claim the next free occurrence of `surface`. Returns (-1, -1) if there is
+        none, and (0, 0) when no text was supplied.
+        """
+        if not self.text:
+            return (0, 0)  # maintain current default behavior when text unknown
+
+        if not surface:
+            return self._claim_empty()
+
+        starts = self._occurrences.get(surface)
+        if starts is None:
+            starts = self._find_occurrences(surface)
+            self._occurrences[surface] = starts
+
+        length = len(surface)
+        cursor = self._cursor.get(surface, 0)
+        # Claims never shrink, so a rejected occurrence stays rejected.
+        while cursor < len(starts):
+            start = starts[cursor]
+            cursor += 1
+            if not self._overlaps(start, start + length):
+                self._cursor[surface] = cursor
+                self._insert(start, start + length)
+                return (start, start + length)
+        self._cursor[surface] = cursor
+
+        if self.normalize:
+            return self._claim_normalized(surface)
+        return (-1, -1)
+
+    def claim_span(self, start: int, end: int) -> bool:
+        """Claim an exact span. Returns False if it overlaps a claimed span."""
+        if self._overlaps(start, end):
+            return False
+        self._insert(start, end)
+        return True
+
+    def _claim_normalized(self, surface: str) -> tuple[int, int]:
+        spans = self._normalized_occurrences.get(surface)
+        if spans is None:
+            spans = []
+            key = normalize_surface(surface)
+            if key:
+                normalized = self._normalized_view()
+                start = normalized.text.find(key)
+                while start != -1:
+                    spans.append(normalized.to_original(start, start + len(key)))
+                    start = normalized.text.find(key, start + len(key))
+            self._normalized_occurrences[surface] = spans
+
+        cursor = self._normalized_cursor.get(surface, 0)
+        while cursor < len(spans):
+            start, end = spans[cursor]
+            cursor += 1
+            if not self._overlaps(start, end):
+                self._normalized_cursor[surface] = cursor
+                self._insert(start, end)
+                return (start, end)
+        self._normalized_cursor[surface] = cursor
+        return (-1, -1)
+
+    def _normalized_view(self) -> NormalizedText:
+        if self._normalized is None:
+            self._normalized = NormalizedText(self.text)
+        return self._normalized
+
+    def _find_occurrences(self, surface: str) -> list[int]:
+        starts: list[int] = []
+        start = self.text.find(surface)
+        while start != -1:
+            starts.append(start)
+            start = self.text.find(surface, start + len(surface))
+        return starts
+
+    def _overlaps(self, start: int, end: int) -> bool:
+        # Claimed spans never overlap, so sorted by start their ends are sorted
+        # too and the last span starting before `end` reaches furthest.
+        idx = bisect.bisect_left(self._claimed, (end,))
+        return idx > 0 and self._claimed[idx - 1][1] > start
+
+    def _insert(self, start: int, end: int) -> None:
+        bisect.insort(self._claimed, (start, end))
+
+    def _claim_empty(self) -> tuple[int, int]:
+        # An empty surface matches at every position; take the first one that
+        # is not strictly inside a claimed span.
+        pos = 0
+        while True:
+            idx = bisect.bisect_left(self._claimed, (pos,))
+            if idx > 0 and self._claimed[idx - 1][1] > pos:
+                pos = self._claimed[idx - 1][1]
+                continue
+            self._insert(pos, pos)
+            return (pos, pos)
+
+
+def leftmost_longest(
+    matches: typing.Iterable[tuple[int, int, T]],
+) -> list[tuple[int, int, T]]:
+    """
+    Keep non-overlapping `(start, end, label)` matches, preferring the earliest
+    and then the longest one. Returns them ordered by start.
+    """
+    found: list[tuple[int, int, T]] = []
+    reach = 0
+    for start, end, label in sorted(matches, key=lambda m: (m[0], m[0] - m[1])):
+        if start >= reach:
+            found.append((start, end, label))
+            reach = end
+    return found
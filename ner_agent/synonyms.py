@@ -0,0 +1,163 @@
+# ner_agent/synonyms.py
+import typing
+
+from ner_agent.spans import normalize_surface
+
+
+class UnionFind:
+    """Disjoint sets over hashable items, with path halving and union by size."""
+
+    def __init__(self, items: typing.Iterable[typing.Hashable] = ()):
+        self._parent: dict[typing.Hashable, typing.Hashable] = {}
+        self._size: dict[typing.Hashable, int] = {}
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: typing.Hashable) -> bool:
+        return item in self._parent
+
+    def add(self, item: typing.Hashable) -> None:
+        if item not in self._parent:
+            self._parent[item] = item
+            self._size[item] = 1
+
+    def find(self, item: typing.Hashable) -> typing.Hashable:
+        self.add(item)
+        parent = self._parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a: typing.Hashable, b: typing.Hashable) -> typing.Hashable:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return root_a
+        if self._size[root_a] < self._size[root_b]:
+            root_a, root_b = root_b, root_a
+        self._parent[root_b] = root_a
+        self._size[root_a] += self._size.pop(root_b)
+        return root_a
+
+    def groups(self) -> list[list[typing.Hashable]]:
+        """Members of each set, in insertion order of their first member."""
+        groups: dict[typing.Hashable, list[typing.Hashable]] = {}
+        for item in self._parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return list(groups.values())
+
+
+class SynonymVerdict(typing.NamedTuple):
+    is_synonymous: bool
+    canonical_name: typing.Optional[str] = None
+
+
+class SynonymVerdictStore:
+    """
+    Memo of synonym verdicts, keyed on the normalized, sorted candidate set.
+
+    Positive verdicts merge their candidates into one group with a union-find,
+    so any set inside a known group is synonymous without a call. A negative
+    verdict is kept as the set of groups it spans: any later set that covers
+    those groups cannot be all synonymous either. Each group keeps the first
+    canonical name it was given, and merged groups keep the larger group's name,
+    so a name does not change from one call to the next.
+    """
+
+    def __init__(self):
+        self._groups = UnionFind()
+        self._canonical: dict[str, str] = {}  # group root -> canonical name
+        self._negatives: list[frozenset[str]] = []
+        self._negatives_by_root: dict[str, list[int]] = {}
+        self._exact: dict[tuple[str, ...], SynonymVerdict] = {}
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    @staticmethod
+    def key(candidates: typing.Iterable[str]) -> tuple[str, ...]:
+        """Order-, case- and width-insensitive key of a candidate list."""
+        return tuple(sorted({normalize_surface(c).casefold() for c in candidates}))
+
+    def lookup(
+        self, candidates: typing.Sequence[str]
+    ) -> typing.Optional[SynonymVerdict]:
+        """The verdict for `candidates` if it follows from known verdicts."""
+        key = self.key(candidates)
+        if not key:
+            return None
+        if (verdict := self._exact.get(key)) is not None:
+            return self._consistent(key, verdict)
+
+        roots = {self._group(name) for name in key}
+        if len(roots) == 1 and key[0] in self._groups:
+            canonical_name = self._canonical.get(next(iter(roots)))
+            if canonical_name or len(key) > 1:
+                return SynonymVerdict(True, canonical_name)
+        if len(key) == 1:
+            return SynonymVerdict(True, candidates[0].strip())
+
+        for root in roots:
+            for idx in self._negatives_by_root.get(root, ()):
+                if all(self._group(name) in roots for name in self._negatives[idx]):
+                    return SynonymVerdict(False)
+        return None
+
+    def record(
+        self,
+        candidates: typing.Sequence[str],
+        is_synonymous: bool,
+        canonical_name: typing.Optional[str] = None,
+    ) -> SynonymVerdict:
+        """Store a verdict and return it with the group's canonical name."""
+        key = self.key(candidates)
+        verdict = SynonymVerdict(is_synonymous, canonical_name)
+        if not key:
+            return verdict
+        self._exact[key] = verdict
+
+        if not is_synonymous:
+            names = frozenset(key)
+            self._negatives.append(names)
+            for root in {self._group(name) for name in names}:
+                self._negatives_by_root.setdefault(root, []).append(
+                    len(self._negatives) - 1
+                )
+            return verdict
+
+        for name in key[1:]:
+            self._union(key[0], name)
+        root = self._root(key[0])
+        if canonical_name and root not in self._canonical:
+            self._canonical[root] = canonical_name
+        return self._consistent(key, verdict)
+
+    def _root(self, name: str) -> str:
+        return typing.cast(str, self._groups.find(name))
+
+    def _group(self, name: str) -> str:
+        # Names without a positive verdict stay out of the union-find and
+        # stand for themselves, as they would as one-name groups.
+        return self._root(name) if name in self._groups else name
+
+    def _union(self, a: str, b: str) -> None:
+        root_a, root_b = self._root(a), self._root(b)
+        if root_a == root_b:
+            return
+        root = typing.cast(str, self._groups.union(root_a, root_b))
+        other = root_b if root == root_a else root_a
+        if other in self._canonical:
+            self._canonical.setdefault(root, self._canonical[other])
+            del self._canonical[other]
+        if other in self._negatives_by_root:
+            self._negatives_by_root.setdefault(root, []).extend(
+                self._negatives_by_root.pop(other)
+            )
+
+    def _consistent(
+        self, key: tuple[str, ...], verdict: SynonymVerdict
+    ) -> SynonymVerdict:
+        if not verdict.is_synonymous or key[0] not in self._groups:
+            return verdict
+        canonical_name = self._canonical.get(self._root(key[0]))
+        return SynonymVerdict(True, canonical_name or verdict.canonical_name)
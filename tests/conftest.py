@@ -1,7 +1,19 @@
+import asyncio
+import typing
+
 import agents
 import logging_bullet_train as lbt
 import openai
 import pytest
+from agents.items import ModelResponse
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseOutputMessage,
+    ResponseOutputText,
+    ResponseTextDeltaEvent,
+    ResponseUsage,
+)
 
 lbt.set_logger("ner_agent")
 lbt.set_logger("tests")
@@ -19,3 +31,109 @@ def chat_model(chat_model_str: str):
         api_key="ollama",
     )
     return agents.OpenAIChatCompletionsModel(model=chat_model_str, openai_client=client)
+
+
+class ScriptedModel(agents.Model):
+    """Offline model that answers with `responder(system_instructions, input)`."""
+
+    def __init__(
+        self,
+        responder: typing.Callable[[str | None, typing.Any], str],
+        *,
+        delay: float = 0.0,
+        model: str = "scripted-model",
+        stream_chunk_size: int = 3,
+    ):
+        self.responder = responder
+        self.delay = delay
+        self.stream_chunk_size = stream_chunk_size
+        self.model = model
+        self.calls: list[tuple[str | None, typing.Any]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_response(
+        self, system_instructions, input, *args, **kwargs
+    ) -> ModelResponse:
+        output_text = await self._respond(system_instructions, input)
+        message = _output_message(output_text)
+        return ModelResponse(
+            output=[message],
+            usage=agents.Usage(
+                requests=1,
+                input_tokens=len(str(system_instructions)) // 4,
+                output_tokens=len(output_text) // 4,
+                total_tokens=(len(str(system_instructions)) + len(output_text)) // 4,
+            ),
+            response_id=None,
+        )
+
+    async def stream_response(self, system_instructions, input, *args, **kwargs):
+        output_text = await self._respond(system_instructions, input)
+        sequence_number = 0
+        for start in range(0, len(output_text), self.stream_chunk_size):
+            yield ResponseTextDeltaEvent(
+                content_index=0,
+                delta=output_text[start : start + self.stream_chunk_size],
+                item_id="msg_scripted",
+                logprobs=[],
+                output_index=0,
+                sequence_number=sequence_number,
+                type="response.output_text.delta",
+            )
+            sequence_number += 1
+
+        input_tokens = len(str(system_instructions)) // 4
+        output_tokens = len(output_text) // 4
+        yield ResponseCompletedEvent(
+            response=Response.model_construct(
+                id="resp_scripted",
+                output=[_output_message(output_text)],
+                usage=ResponseUsage(
+                    input_tokens=input_tokens,
+                    input_tokens_details={"cached_tokens": 0},
+                    output_tokens=output_tokens,
+                    output_tokens_details={"reasoning_tokens": 0},
+                    total_tokens=input_tokens + output_tokens,
+                ),
+            ),
+            sequence_number=sequence_number,
+            type="response.completed",
+        )
+
+    async def _respond(self, system_instructions, input) -> str:
+        input = _user_text(input)
+        self.calls.append((system_instructions, input))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            return self.responder(system_instructions, input)
+        finally:
+            self.in_flight -= 1
+
+
+def _output_message(output_text: str) -> ResponseOutputMessage:
+    return ResponseOutputMessage(
+        id="msg_scripted",
+        content=[
+            ResponseOutputText(annotations=[], text=output_text, type="output_text")
+        ],
+        role="assistant",
+        status="completed",
+        type="message",
+    )
+
+
+def _user_text(input: typing.Any) -> str:
+    if isinstance(input, str):
+        return input
+    return "\n".join(
+        str(item.get("content", "")) for item in input if item.get("role") == "user"
+    )
+
+
+@pytest.fixture
+def scripted_model_cls() -> type[ScriptedModel]:
+    return ScriptedModel
@@ -0,0 +1,173 @@
+# tests/test_batch.py
+import json
+
+import agents
+
+from ner_agent import (
+    EntityType,
+    JointExtractionResult,
+    NerAgent,
+    NerResult,
+    RelationExtractionResult,
+    SynonymsAndCanonicalNameResult,
+)
+from ner_agent.batch import (
+    BatchItemError,
+    batch_custom_id,
+    manifest_path_for,
+    read_batch_results,
+    write_batch_requests,
+)
+
+TEXTS = ["Elon Musk visited Austin.", "Tim Cook lives in Cupertino."]
+
+
+def _result_line(custom_id: str, content: str | None, status_code: int = 200) -> str:
+    return json.dumps(
+        {
+            "id": f"batch_req_{custom_id}",
+            "custom_id": custom_id,
+            "response": {
+                "status_code": status_code,
+                "body": {"choices": [{"message": {"content": content}}]},
+            },
+            "error": None,
+        }
+    )
+
+
+def _read_requests(path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_write_batch_requests_renders_interactive_prompts(tmp_path):
+    agent = NerAgent()
+    requests_path = tmp_path / "requests.jsonl"
+
+    count = write_batch_requests(
+        agent,
+        iter(TEXTS),
+        requests_path,
+        model_settings=agents.ModelSettings(temperature=0.0),
+    )
+
+    requests = _read_requests(requests_path)
+    assert count == len(requests) == 2
+    assert requests[0]["url"] == "/v1/chat/completions"
+    assert requests[0]["custom_id"] == batch_custom_id("run", 0, TEXTS[0])
+    body = requests[1]["body"]
+    assert [m["content"] for m in body["messages"]] == list(
+        agent._render_prompt("run", TEXTS[1])
+    )
+    assert body["temperature"] == 0.0
+    assert "response_format" not in body
+    assert manifest_path_for(requests_path).exists()
+
+
+def test_write_batch_requests_is_stable(tmp_path):
+    agent = NerAgent()
+    first, second = tmp_path / "a.jsonl", tmp_path / "b.jsonl"
+    write_batch_requests(agent, TEXTS, first, method="extract_relations")
+    write_batch_requests(agent, TEXTS, second, method="extract_relations")
+
+    assert first.read_text() == second.read_text()
+    response_format = _read_requests(first)[0]["body"]["response_format"]
+    assert response_format["type"] == "json_schema"
+    assert response_format["json_schema"]["strict"] is True
+
+
+def test_read_batch_results_run(tmp_path):
+    agent = NerAgent()
+    requests_path = tmp_path / "requests.jsonl"
+    write_batch_requests(agent, TEXTS, requests_path)
+    ids = [r["custom_id"] for r in _read_requests(requests_path)]
+
+    results_path = tmp_path / "results.jsonl"
+    results_path.write_text(
+        "\n".join(
+            [
+                _result_line(ids[1], "[Tim Cook](#PERSON) | [done](#DONE)"),
+                _result_line(ids[0], "[Elon Musk](#PERSON) | [Austin](#GPE)"),
+                _result_line("run-9-unknown", "[x](#PERSON)"),
+            ]
+        )
+    )
+
+    results = dict(
+        read_batch_results(agent, results_path, manifest_path_for(requests_path))
+    )
+
+    assert results[ids[0]] == NerResult(
+        text=TEXTS[0],
+        entities=agent._parse_entities(
+            "[Elon Musk](#PERSON) | [Austin](#GPE)", original_text=TEXTS[0]
+        ),
+    )
+    assert results[ids[1]].entities[0].name == EntityType.PERSON
+    assert results[ids[1]].entities[0].start == 0
+    assert isinstance(results["run-9-unknown"], BatchItemError)
+
+
+def test_read_batch_results_structured_outputs(tmp_path):
+    agent = NerAgent()
+    manifest_path = tmp_path / "manifest.jsonl"
+    outputs = {
+        "analyze_entities": (TEXTS[0], {"entities": ["Elon Musk", "Austin"]}),
+        "analyze_synonyms_and_canonical_name": (
+            ["NYC", "New York City"],
+            {"is_synonymous": True, "canonical_name": "New York City"},
+        ),
+        "extract_relations": (
+            "A dog is an animal.",
+            {"triplets": [{"subject": "dog", "relation": "is_a", "object": "animal"}]},
+        ),
+        "extract_entities_and_relations": (
+            TEXTS[1],
+            {
+                "entities": [
+                    {"text": "Tim Cook", "type": "PERSON"},
+                    {"text": "Cupertino", "type": "LOCATION"},
+                ],
+                "triplets": [{"subject": 0, "relation": "related_to", "object": 1}],
+            },
+        ),
+    }
+
+    lines = []
+    for method, (payload, output) in outputs.items():
+        write_batch_requests(
+            agent,
+            [payload],
+            tmp_path / f"{method}.jsonl",
+            method=method,
+            manifest_path=tmp_path / f"{method}.manifest.jsonl",
+        )
+        with manifest_path.open("a") as manifest_file:
+            manifest_file.write((tmp_path / f"{method}.manifest.jsonl").read_text())
+        lines.append(
+            _result_line(batch_custom_id(method, 0, payload), json.dumps(output))
+        )
+    lines.append(_result_line(batch_custom_id("extract_relations", 1, "x"), "{"))
+    lines.append(_result_line(batch_custom_id("run", 0, TEXTS[0]), None, 500))
+    (tmp_path / "results.jsonl").write_text("\n".join(lines))
+
+    results = list(read_batch_results(agent, tmp_path / "results.jsonl", manifest_path))
+
+    entities = results[0][1]
+    assert isinstance(entities, NerResult)
+    assert [(e.value, e.start, e.end) for e in entities.entities] == [
+        ("Elon Musk", 0, 9),
+        ("Austin", 18, 24),
+    ]
+    assert results[1][1] == SynonymsAndCanonicalNameResult(
+        is_synonymous=True, canonical_name="New York City"
+    )
+    assert isinstance(results[2][1], RelationExtractionResult)
+    joint = results[3][1]
+    assert isinstance(joint, JointExtractionResult)
+    assert [(e.value, e.start) for e in joint.ner.entities] == [
+        ("Tim Cook", 0),
+        ("Cupertino", 18),
+    ]
+    assert joint.relations.triplets[0].object == "Cupertino"
+    assert all(isinstance(r, BatchItemError) for _, r in results[4:])
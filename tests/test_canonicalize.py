@@ -0,0 +1,142 @@
+# tests/test_canonicalize.py
+import json
+import re
+
+import agents
+import pytest
+
+from ner_agent import NerAgent, UnionFind
+from ner_agent.canonicalize import (
+    candidate_blocks,
+    canonicalize,
+    fold_key,
+    transliteration_key,
+)
+
+
+def _candidates(input_text) -> list[str]:
+    return json.loads(re.search(r"Input: `(.*)`", str(input_text)).group(1))
+
+
+def _synonym_responder(instructions, input_text) -> str:
+    candidates = _candidates(input_text)
+    if any("Bank" in c for c in candidates):
+        return json.dumps({"is_synonymous": False, "canonical_name": None})
+    return json.dumps(
+        {"is_synonymous": True, "canonical_name": max(candidates, key=len)}
+    )
+
+
+def test_fold_and_transliteration_keys():
+    assert fold_key("ＡＰＰＬＥ  Inc.") == fold_key("apple inc") == "apple inc"
+    assert transliteration_key(fold_key("Müller")) == "muller"
+
+
+def test_union_find_groups():
+    sets = UnionFind("abcde")
+    sets.union("a", "c")
+    sets.union("d", "c")
+    assert sets.find("d") == sets.find("a")
+    assert sorted(map(sorted, sets.groups())) == [["a", "c", "d"], ["b"], ["e"]]
+
+
+def test_candidate_blocks_group_similar_keys():
+    keys = ["jensen huang", "jensen huangg", "müller", "muller", "nvidia", "apple"]
+    blocks = sorted(map(sorted, candidate_blocks(keys)))
+    assert blocks == [
+        ["apple"],
+        ["jensen huang", "jensen huangg"],
+        ["muller", "müller"],
+        ["nvidia"],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_canonicalize_sends_only_ambiguous_blocks(scripted_model_cls):
+    model = scripted_model_cls(_synonym_responder)
+    surfaces = (
+        ["Apple", "apple", "APPLE", "Apple"]
+        + ["Jensen Huang", "Jensen  Huang", "Jensen Huang Jr"]
+        + ["Bank of Taiwan", "Land Bank of Taiwan"]
+        + [f"Company {i:03d}" for i in range(200)]
+    )
+
+    result = await canonicalize(NerAgent(), surfaces, model=model)
+
+    # One call each for the Jensen and Bank blocks; "Company NNN" keys differ
+    # in their numbers and are never blocked together.
+    assert result.model_calls == len(model.calls) == 2
+    mapping = result.mapping()
+    assert mapping["apple"] == mapping["APPLE"] == "Apple"
+    assert mapping["Jensen Huang"] == mapping["Jensen Huang Jr"] == "Jensen Huang Jr"
+    assert mapping["Bank of Taiwan"] == "Bank of Taiwan"
+    assert mapping["Land Bank of Taiwan"] == "Land Bank of Taiwan"
+    assert len(mapping) == len(set(surfaces))
+
+
+@pytest.mark.asyncio
+async def test_canonicalize_chunks_large_blocks(scripted_model_cls):
+    model = scripted_model_cls(_synonym_responder)
+    surfaces = [
+        "Jensen Huang",
+        "Jénsen Huang",
+        "Jensen Huáng",
+        "Jënsen Huang",
+        "Jensen Hüang",
+        "Jensén Huang",
+    ]
+
+    result = await canonicalize(NerAgent(), surfaces, model=model, max_block_size=3)
+
+    assert result.model_calls == len(model.calls) > 1
+    assert all(len(_candidates(input_text)) <= 3 for _, input_text in model.calls)
+    assert [len(c.surfaces) for c in result.clusters] == [len(surfaces)]
+    assert result.clusters[0].resolved_by == "model"
+
+
+def _land_bank_responder(instructions, input_text) -> str:
+    candidates = _candidates(input_text)
+    is_synonymous = len({"Land" in c for c in candidates}) == 1
+    return json.dumps(
+        {
+            "is_synonymous": is_synonymous,
+            "canonical_name": min(candidates, key=len) if is_synonymous else None,
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    "surfaces, expected_calls",
+    [
+        # Rejected chunk, then one pair per key against the anchor.
+        (["Bank of Taiwan", "Bank of Taiwan Ltd", "Land Bank of Taiwan"], 3),
+        # The anchor is the outlier: both pairs fail, the rest is asked again.
+        (["Land Bank of Taiwan", "Bank of Taiwan", "Bank of Taiwan Ltd"], 4),
+    ],
+)
+@pytest.mark.asyncio
+async def test_canonicalize_splits_rejected_chunks(
+    scripted_model_cls, surfaces, expected_calls
+):
+    model = scripted_model_cls(_land_bank_responder)
+
+    result = await canonicalize(NerAgent(), surfaces, model=model)
+
+    assert result.model_calls == len(model.calls) == expected_calls
+    mapping = result.mapping()
+    assert (
+        mapping["Bank of Taiwan"] == mapping["Bank of Taiwan Ltd"] == "Bank of Taiwan"
+    )
+    assert mapping["Land Bank of Taiwan"] == "Land Bank of Taiwan"
+
+
+@pytest.mark.asyncio
+async def test_canonicalize(chat_model: agents.OpenAIChatCompletionsModel):
+    result = await canonicalize(
+        NerAgent(),
+        ["Jensen Huang", "jensen huang", "Jensen H. Huang", "Apple", "Microsoft"],
+        model=chat_model,
+    )
+    mapping = result.mapping()
+    assert mapping["jensen huang"] == mapping["Jensen Huang"]
+    assert mapping["Apple"] != mapping["Microsoft"]
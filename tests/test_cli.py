@@ -0,0 +1,223 @@
+# tests/test_cli.py
+import asyncio
+import json
+import re
+
+import pytest
+
+from ner_agent import NerAgent, cli
+from ner_agent.cli import Checkpoint, build_parser, process_lines
+
+
+def _respond(_instructions: str, input_text: str) -> str:
+    text = re.search(r"'''(.*)'''", input_text, re.S).group(1)
+    return f"[{text.split()[0]}](#PERSON) | [done](#DONE)"
+
+
+def _lines(n: int) -> list[str]:
+    return [
+        json.dumps({"id": f"doc-{i}", "text": f"Name{i} says hi"}) for i in range(n)
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ordered", [False, True])
+async def test_process_lines_writes_one_result_per_line(scripted_model_cls, ordered):
+    model = scripted_model_cls(_respond, delay=0.01)
+    output: list[str] = []
+
+    await process_lines(
+        NerAgent(),
+        iter(_lines(20)),
+        output.append,
+        model=model,
+        concurrency=4,
+        ordered=ordered,
+    )
+
+    records = [json.loads(line) for line in output]
+    assert sorted(r["line"] for r in records) == list(range(20))
+    if ordered:
+        assert [r["line"] for r in records] == list(range(20))
+    assert records[0]["result"]["entities"][0]["value"].startswith("Name")
+    assert model.max_in_flight <= 4
+
+
+@pytest.mark.asyncio
+async def test_process_lines_reports_bad_lines(scripted_model_cls):
+    model = scripted_model_cls(_respond)
+    output: list[str] = []
+
+    await process_lines(
+        NerAgent(), iter(["not json", _lines(1)[0]]), output.append, model=model
+    )
+
+    records = {r["line"]: r for r in map(json.loads, output)}
+    assert "error" in records[0]
+    assert records[1]["id"] == "doc-0"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ordered", [False, True])
+async def test_process_lines_raises_write_errors(scripted_model_cls, ordered):
+    model = scripted_model_cls(_respond)
+    output: list[str] = []
+
+    def _write(line: str) -> None:
+        if len(output) == 2:
+            raise BrokenPipeError
+        output.append(line)
+
+    with pytest.raises(BrokenPipeError):
+        await asyncio.wait_for(
+            process_lines(
+                NerAgent(),
+                iter(_lines(100)),
+                _write,
+                model=model,
+                concurrency=4,
+                ordered=ordered,
+            ),
+            timeout=10,
+        )
+
+    assert len(output) == 2
+    assert len(model.calls) < 100
+
+
+@pytest.mark.asyncio
+async def test_process_lines_resumes_from_checkpoint(scripted_model_cls, tmp_path):
+    path = tmp_path / "run.ckpt"
+    checkpoint = Checkpoint(path)
+    for line_no in [0, 1, 2, 5]:
+        checkpoint.mark_done(line_no)
+    checkpoint.save()
+
+    model = scripted_model_cls(_respond)
+    output: list[str] = []
+    resumed = Checkpoint.load(path)
+    await process_lines(
+        NerAgent(), iter(_lines(8)), output.append, model=model, checkpoint=resumed
+    )
+
+    assert sorted(json.loads(line)["line"] for line in output) == [3, 4, 6, 7]
+    assert len(model.calls) == 4
+    assert (resumed.watermark, resumed.done) == (8, set())
+    assert Checkpoint.load(path).watermark == 8
+
+
+@pytest.mark.asyncio
+async def test_process_lines_retries_failed_lines(scripted_model_cls, tmp_path):
+    path = tmp_path / "run.ckpt"
+    lines = _lines(4)
+    lines[1] = "not json"
+    output: list[str] = []
+
+    await process_lines(
+        NerAgent(),
+        iter(lines),
+        output.append,
+        model=scripted_model_cls(_respond),
+        checkpoint=Checkpoint(path),
+    )
+    checkpoint = Checkpoint.load(path)
+    assert (checkpoint.watermark, checkpoint.failed) == (4, {1})
+    assert not checkpoint.is_done(1)
+
+    lines[1] = _lines(2)[1]
+    output.clear()
+    await process_lines(
+        NerAgent(),
+        iter(lines),
+        output.append,
+        model=scripted_model_cls(_respond),
+        checkpoint=checkpoint,
+    )
+    assert [json.loads(line)["id"] for line in output] == ["doc-1"]
+    assert Checkpoint.load(path).failed == set()
+
+
+def test_main_resume_drops_output_after_checkpoint(
+    scripted_model_cls, tmp_path, monkeypatch
+):
+    model = scripted_model_cls(_respond)
+
+    class _ScriptedAgent(NerAgent):
+        def _to_chat_model(self, model_name=None):
+            return model
+
+    monkeypatch.setattr(cli, "NerAgent", _ScriptedAgent)
+    input_path, output_path = tmp_path / "docs.jsonl", tmp_path / "out.jsonl"
+    ckpt_path = tmp_path / "run.ckpt"
+    input_path.write_text("\n".join(_lines(6)) + "\n")
+    argv = [str(input_path), "-o", str(output_path), "--checkpoint", str(ckpt_path)]
+
+    # A killed run: lines 0-2 checkpointed, lines 3-4 written after the save.
+    saved = "".join(f'{{"line": {i}}}\n' for i in range(3))
+    output_path.write_text(saved + '{"line": 3}\n{"line": 4}\n')
+    checkpoint = Checkpoint(ckpt_path)
+    for line_no in range(3):
+        checkpoint.mark_done(line_no)
+    checkpoint.output_offset = len(saved.encode())
+    checkpoint.save()
+
+    assert cli.main([*argv, "--checkpoint-every", "2"]) == 0
+
+    records = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert sorted(r["line"] for r in records) == list(range(6))
+    assert len(model.calls) == 3
+    assert Checkpoint.load(ckpt_path).output_offset == output_path.stat().st_size
+
+
+def test_main_resumes_twice_without_corrupting_output(
+    scripted_model_cls, tmp_path, monkeypatch
+):
+    model = scripted_model_cls(_respond)
+
+    class _ScriptedAgent(NerAgent):
+        def _to_chat_model(self, model_name=None):
+            return model
+
+    monkeypatch.setattr(cli, "NerAgent", _ScriptedAgent)
+    input_path, output_path = tmp_path / "docs.jsonl", tmp_path / "out.jsonl"
+    ckpt_path = tmp_path / "run.ckpt"
+    argv = [str(input_path), "-o", str(output_path), "--checkpoint", str(ckpt_path)]
+
+    saved = "".join(f'{{"line": {i}}}\n' for i in range(3))
+    output_path.write_text(saved + '{"line": 3}\n{"line": 4}\n')
+    checkpoint = Checkpoint(ckpt_path)
+    for line_no in range(3):
+        checkpoint.mark_done(line_no)
+    checkpoint.output_offset = len(saved.encode())
+    checkpoint.save()
+
+    # The first resume only skips finished lines, so it never writes.
+    input_path.write_text("\n".join(_lines(3)) + "\n")
+    assert cli.main([*argv, "--checkpoint-every", "2"]) == 0
+    assert Checkpoint.load(ckpt_path).output_offset == len(saved.encode())
+
+    input_path.write_text("\n".join(_lines(6)) + "\n")
+    assert cli.main([*argv, "--checkpoint-every", "2"]) == 0
+
+    records = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert sorted(r["line"] for r in records) == list(range(6))
+    assert Checkpoint.load(ckpt_path).output_offset == output_path.stat().st_size
+
+
+def test_checkpoint_keeps_only_lines_above_watermark(tmp_path):
+    checkpoint = Checkpoint(tmp_path / "run.ckpt")
+    for line_no in [1, 2, 0, 4]:
+        checkpoint.mark_done(line_no)
+    assert (checkpoint.watermark, checkpoint.done) == (3, {4})
+    assert checkpoint.is_done(2) and checkpoint.is_done(4)
+    assert not checkpoint.is_done(3)
+
+
+def test_build_parser_defaults():
+    args = build_parser().parse_args(["docs.jsonl", "--ordered"])
+    assert (args.input, args.output, args.method, args.ordered) == (
+        "docs.jsonl",
+        "-",
+        "run",
+        True,
+    )
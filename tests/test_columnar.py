@@ -0,0 +1,70 @@
+# tests/test_columnar.py
+import sys
+
+import pytest
+
+from ner_agent import Entity, EntityType, NerResult
+from ner_agent.columnar import ColumnarNerResult
+
+RESULT = NerResult(
+    text="L’Hôpital Saint-Louis est à Paris, pas à Tokyo.",
+    entities=[
+        Entity(
+            name=EntityType.LOCATION, value="L'Hôpital Saint-Louis", start=0, end=21
+        ),
+        Entity(name=EntityType.LOCATION, value="Paris", start=28, end=33),
+        Entity(name=EntityType.PERSON, value="Ghost", start=-1, end=-1),
+        Entity(name="Tokyo", value="Tokyo", start=41, end=46),
+    ],
+)
+
+
+def test_columnar_round_trip_is_lossless():
+    columnar = ColumnarNerResult.from_ner_result(RESULT)
+
+    assert len(columnar) == 4
+    assert columnar.to_ner_result() == RESULT
+    assert list(columnar) == RESULT.entities
+    assert columnar[-1] == RESULT.entities[-1]
+    # Only values that are not a slice of the text are stored.
+    assert set(columnar.values) == {0, 2}
+    assert columnar.value(1) == "Paris"
+    assert columnar.name(3) == "Tokyo"
+
+
+def test_columnar_buffers():
+    buffers = ColumnarNerResult.from_ner_result(RESULT).buffers()
+
+    assert buffers["starts"].tolist() == [0, 28, -1, 41]
+    assert buffers["ends"].itemsize == 4
+    assert buffers["types"].itemsize == 1
+
+
+def test_columnar_to_numpy():
+    numpy = pytest.importorskip("numpy")
+    arrays = ColumnarNerResult.from_ner_result(RESULT).to_numpy()
+
+    assert arrays["starts"].dtype == numpy.int32
+    assert arrays["types"].dtype == numpy.uint8
+    assert arrays["ends"].tolist() == [21, 33, -1, 46]
+
+
+def test_columnar_is_compact():
+    text = "Paris " * 10_000
+    result = NerResult(
+        text=text,
+        entities=[
+            Entity(name=EntityType.LOCATION, value="Paris", start=i * 6, end=i * 6 + 5)
+            for i in range(10_000)
+        ],
+    )
+    columnar = ColumnarNerResult.from_ner_result(result)
+
+    pydantic_bytes = sum(
+        sys.getsizeof(e) + sys.getsizeof(e.__dict__) + sys.getsizeof(e.value)
+        for e in result.entities
+    )
+    columnar_bytes = sum(
+        sys.getsizeof(c) for c in (columnar.starts, columnar.ends, columnar.types)
+    )
+    assert columnar_bytes * 10 < pydantic_bytes
@@ -0,0 +1,101 @@
+# tests/test_fewshot.py
+import pytest
+
+from ner_agent import (
+    DEFAULT_FEW_SHOT_EXAMPLES,
+    STATIC_TEMPLATE_CACHE_SIZE,
+    FewShotExample,
+    NerAgent,
+    _render_static_template,
+    detect_scripts,
+    select_examples,
+)
+
+ENGLISH = "Alice met Bob in Paris."
+CHINESE = "蘋果公司在台北發表新手機"
+JAPANESE = "東京オリンピックの開会式が行われた。"
+KOREAN = "삼성전자는 서울에서 신제품을 공개했다."
+MIXED = "Jensen Huang (黃仁勳) spoke at 台北國際電腦展."
+
+
+def test_detect_scripts():
+    assert detect_scripts(ENGLISH) == {"latin"}
+    assert detect_scripts(CHINESE) == {"han"}
+    assert detect_scripts(JAPANESE) == {"han", "kana"}
+    assert detect_scripts(KOREAN) == {"hangul"}
+    assert detect_scripts(MIXED) == {"latin", "han"}
+    assert detect_scripts("2024-03-15, 20%") == frozenset()
+
+
+def test_select_examples_by_script():
+    english = select_examples(ENGLISH)
+    assert len(english) == 3
+    assert all(example.script == "latin" for example in english)
+
+    assert [e.script for e in select_examples(KOREAN)] == ["hangul"]
+    assert {e.script for e in select_examples(MIXED)} == {"latin", "han"}
+    assert {e.script for e in select_examples(JAPANESE)} == {"han", "kana"}
+
+    # Scripts without examples fall back to the first ones.
+    assert select_examples("Путин посетил Москву") == DEFAULT_FEW_SHOT_EXAMPLES[:3]
+
+
+@pytest.mark.asyncio
+async def test_run_prompt_carries_matching_examples(scripted_model_cls):
+    model = scripted_model_cls(lambda *_: "[done](#DONE)")
+    agent = NerAgent()
+
+    await agent.run(ENGLISH, model=model)
+    await agent.run(KOREAN, model=model)
+    await agent.run(KOREAN, model=model, hybrid=True)
+
+    english_instructions, korean_instructions, hybrid_instructions = [
+        instructions for instructions, _ in model.calls
+    ]
+    assert "Elon Musk visited" in english_instructions
+    assert "蘋果公司" not in english_instructions
+    assert "삼성전자는" in korean_instructions
+    assert "Elon Musk visited" not in korean_instructions
+    assert "[오전 9시](#DATETIME)" in korean_instructions
+    assert "[오전 9시](#DATETIME)" not in hybrid_instructions
+    assert "[서울](#LOCATION)" in hybrid_instructions
+
+    everything = NerAgent(max_few_shot_examples=len(DEFAULT_FEW_SHOT_EXAMPLES))
+    full_instructions, _ = everything._render_prompt(
+        "run", ENGLISH, examples=DEFAULT_FEW_SHOT_EXAMPLES
+    )
+    assert len(english_instructions) < len(full_instructions)
+
+
+@pytest.mark.asyncio
+async def test_run_uses_hand_picked_examples(scripted_model_cls):
+    model = scripted_model_cls(lambda *_: "[done](#DONE)")
+    example = FewShotExample("Ada Lovelace lived in London.", (("Ada", "PERSON"),))
+    agent = NerAgent(few_shot_examples=[example])
+
+    await agent.run(CHINESE, model=model)
+    await NerAgent().run(ENGLISH, model=model, few_shot_examples=[example])
+
+    for instructions, _ in model.calls:
+        assert "text: '''Ada Lovelace lived in London.'''" in instructions
+        assert "entities: [Ada](#PERSON) | [done](#DONE)" in instructions
+        assert "Elon Musk visited" not in instructions
+
+
+def test_hand_picked_examples_keep_prompt_cache_bounded():
+    agent = NerAgent()
+    for i in range(STATIC_TEMPLATE_CACHE_SIZE + 10):
+        example = FewShotExample(f"Person{i} spoke.", ((f"Person{i}", "PERSON"),))
+        agent._render_prompt("run", ENGLISH, examples=(example,))
+
+    info = _render_static_template.cache_info()
+    assert info.currsize <= info.maxsize == STATIC_TEMPLATE_CACHE_SIZE
+
+
+def test_hand_picked_examples_may_use_lists():
+    examples = [FewShotExample("Bob went home.", [["Bob", "PERSON"]])]
+    agent = NerAgent(few_shot_examples=examples)
+
+    for picked in (agent.few_shot_examples, agent._few_shot_examples("", examples)):
+        instructions = agent._render_prompt("run", ENGLISH, examples=picked)[0]
+        assert "entities: [Bob](#PERSON) | [done](#DONE)" in instructions
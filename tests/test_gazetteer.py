@@ -0,0 +1,161 @@
+# tests/test_gazetteer.py
+import random
+
+import pytest
+
+from ner_agent import Entity, EntityType, Gazetteer, NerAgent
+from ner_agent import gazetteer as gazetteer_module
+from ner_agent.spans import AhoCorasick
+
+ENTRIES = {
+    "Paris": "LOCATION",
+    "Paris Hilton": "PERSON",
+    "Tesla": "PROPER_NOUN",
+    "台北101": "LOCATION",
+    "蘋果公司": "PROPER_NOUN",
+}
+
+
+def test_gazetteer_finds_longest_known_surfaces():
+    gazetteer = Gazetteer(ENTRIES)
+    text = "Paris Hilton flew from Paris to see Tesla; Parisian Teslas do not count."
+
+    found = [(text[s:e], t) for s, e, t in gazetteer.find(text)]
+
+    assert found == [
+        ("Paris Hilton", "PERSON"),
+        ("Paris", "LOCATION"),
+        ("Tesla", "PROPER_NOUN"),
+    ]
+
+
+def test_gazetteer_matches_inside_cjk_text():
+    text = "蘋果公司在台北101發表了新手機"
+    found = [(text[s:e], t) for s, e, t in Gazetteer(ENTRIES).find(text)]
+    assert found == [("蘋果公司", "PROPER_NOUN"), ("台北101", "LOCATION")]
+
+
+def test_gazetteer_save_and_load_round_trip(tmp_path):
+    rng = random.Random(3)
+    entries = {
+        "".join(rng.choice("abcde ") for _ in range(rng.randint(1, 6))).strip()
+        or "x": rng.choice(["PERSON", "LOCATION"])
+        for _ in range(300)
+    }
+    original = Gazetteer(entries)
+    path = tmp_path / "names.gaz"
+    original.save(path)
+
+    loaded = Gazetteer.load(path)
+
+    assert len(loaded) == len(original)
+    assert loaded.fingerprint == original.fingerprint
+    for _ in range(50):
+        text = "".join(rng.choice("abcde .") for _ in range(60))
+        assert loaded.find(text) == original.find(text)
+    assert loaded.entries() == original.entries()
+
+
+def test_gazetteer_learns_from_results(tmp_path):
+    gazetteer = Gazetteer()
+    gazetteer.learn(
+        [
+            Entity(name=EntityType.PERSON, value="Elon Musk", start=0, end=9),
+            Entity(name=EntityType.DATETIME, value="today", start=10, end=15),
+            Entity(name=EntityType.LOCATION, value="Mars", start=-1, end=-1),
+        ]
+    )
+    assert gazetteer.entries() == {"Elon Musk": "PERSON"}
+
+    path = tmp_path / "learned.gaz"
+    gazetteer.save(path)
+    loaded = Gazetteer.load(path)
+    loaded.add("Austin", "LOCATION")
+    assert [t for _, _, t in loaded.find("Elon Musk, Austin")] == [
+        "PERSON",
+        "LOCATION",
+    ]
+
+
+def test_gazetteer_learning_does_not_recompile(monkeypatch):
+    gazetteer = Gazetteer(ENTRIES)
+    gazetteer.find("Paris")
+    fingerprints = {gazetteer.fingerprint}
+    builds = []
+    monkeypatch.setattr(
+        gazetteer_module,
+        "AhoCorasick",
+        lambda surfaces: builds.append(surfaces) or AhoCorasick(surfaces),
+    )
+
+    for name in ["Elon Musk", "Austin", "Musk"]:
+        gazetteer.add(name, "PERSON")
+        gazetteer.compile()
+        fingerprints.add(gazetteer.fingerprint)
+    gazetteer.add("Paris", "PERSON")
+    text = "Elon Musk left Paris for Austin; Muskrats do not count."
+
+    assert [(text[s:e], t) for s, e, t in gazetteer.find(text)] == [
+        ("Elon Musk", "PERSON"),
+        ("Paris", "PERSON"),
+        ("Austin", "PERSON"),
+    ]
+    assert builds == []
+    assert len(fingerprints) == 4
+
+    monkeypatch.setattr(gazetteer_module, "MIN_PENDING_SURFACES", 4)
+    assert gazetteer.find(text)[-1] == (25, 31, "PERSON")
+    assert len(builds) == 1 and gazetteer._pending == {}
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_skips_model_when_gazetteer_covers_text(scripted_model_cls):
+    model = scripted_model_cls(lambda *_: "[done](#DONE)")
+    agent = NerAgent(gazetteer=Gazetteer(ENTRIES))
+
+    result = await agent.run("Tesla, Paris", model=model)
+
+    assert [(e.name, e.value, e.start) for e in result.entities] == [
+        ("PROPER_NOUN", "Tesla", 0),
+        ("LOCATION", "Paris", 7),
+    ]
+    assert model.calls == []
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_asks_model_for_uncovered_numbers(scripted_model_cls):
+    model = scripted_model_cls(lambda *_: "[2024](#DATETIME) | [$5,000,000](#NUMERIC)")
+    agent = NerAgent(gazetteer=Gazetteer(ENTRIES))
+    text = "Tesla 2024: $5,000,000"
+
+    result = await agent.run(text, model=model)
+
+    assert [(e.name, e.value) for e in result.entities] == [
+        ("PROPER_NOUN", "Tesla"),
+        (EntityType.DATETIME, "2024"),
+        (EntityType.NUMERIC, "$5,000,000"),
+    ]
+    assert len(model.calls) == 1
+
+    # In hybrid mode the rules cover the numbers, so the model is skipped.
+    result = await agent.run(text, model=model, hybrid=True)
+
+    assert [e.value for e in result.entities] == ["Tesla", "2024", "$5,000,000"]
+    assert len(model.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_merges_gazetteer_with_model(scripted_model_cls):
+    model = scripted_model_cls(
+        lambda *_: "[Elon Musk](#PERSON) | [Paris Saint-Germain](#PROPER_NOUN)"
+    )
+    agent = NerAgent(gazetteer=Gazetteer(ENTRIES))
+
+    result = await agent.run("Elon Musk met Paris Saint-Germain in Paris.", model=model)
+
+    assert [(e.name, e.value) for e in result.entities] == [
+        (EntityType.PERSON, "Elon Musk"),
+        (EntityType.PROPER_NOUN, "Paris Saint-Germain"),
+        ("LOCATION", "Paris"),
+    ]
+    assert [e.start for e in result.entities] == [0, 14, 37]
@@ -0,0 +1,94 @@
+# tests/test_graph.py
+import logging
+import random
+
+from ner_agent import KnowledgeGraph, Triplet
+from ner_agent.graph import RELATIONS
+
+TRIPLETS = [
+    Triplet(subject="Tesla", relation="is_a", object="company"),
+    Triplet(subject="Tesla", relation="has_a", object="Gigafactory"),
+    Triplet(subject="Elon Musk", relation="related_to", object="Tesla"),
+    Triplet(subject="SpaceX", relation="is_a", object="company"),
+    Triplet(subject="Tesla", relation="is_a", object="company"),
+    Triplet(subject="Tesla", relation="Has A", object="Gigafactory"),
+]
+
+
+def test_graph_interns_and_deduplicates():
+    graph = KnowledgeGraph(TRIPLETS)
+
+    assert len(graph) == 4
+    assert graph.num_nodes == 5
+    assert graph.objects("Tesla") == ["company", "Gigafactory"]
+    assert graph.objects("Tesla", "has_a") == ["Gigafactory"]
+    assert graph.subjects("company", "is_a") == ["Tesla", "SpaceX"]
+    assert graph.subjects("Tesla") == ["Elon Musk"]
+    assert graph.objects("Nobody") == []
+    assert list(graph.triplets("is_a")) == [
+        ("Tesla", "is_a", "company"),
+        ("SpaceX", "is_a", "company"),
+    ]
+
+
+def test_graph_skips_unknown_relations(caplog):
+    graph = KnowledgeGraph()
+    with caplog.at_level(logging.WARNING, logger="ner_agent.graph"):
+        kept = graph.add_triplets(
+            [
+                Triplet(subject="Tesla", relation="competes_with", object="BYD"),
+                Triplet(subject="BYD", relation="is_a", object="company"),
+            ]
+        )
+    assert kept == 1
+    assert "competes_with" in caplog.text
+    assert list(graph.triplets()) == [("BYD", "is_a", "company")]
+
+
+def test_graph_save_load_and_extend(tmp_path):
+    path = tmp_path / "facts.kg"
+    KnowledgeGraph(TRIPLETS).save(path)
+
+    loaded = KnowledgeGraph.load(path)
+    assert len(loaded) == 4
+    assert loaded.node_id("SpaceX") is not None
+    assert loaded.node_id("Blue Origin") is None
+    assert loaded.subjects("company", "is_a") == ["Tesla", "SpaceX"]
+
+    loaded.add("Blue Origin", "is_a", "company")
+    loaded.add("SpaceX", "is_a", "company")
+    assert len(loaded) == 5
+    assert loaded.subjects("company") == ["Tesla", "SpaceX", "Blue Origin"]
+
+    loaded.save(path)
+    assert sorted(KnowledgeGraph.load(path).triplets()) == sorted(loaded.triplets())
+
+
+def test_graph_merges_pending_edges_into_queries(tmp_path, monkeypatch):
+    monkeypatch.setattr("ner_agent.graph.MIN_PENDING_EDGES", 16)
+    rng = random.Random(0)
+    names = [f"node {i}" for i in range(40)]
+    expected: set[tuple[str, str, str]] = set()
+    graph = KnowledgeGraph()
+
+    for step in range(400):
+        edge = (rng.choice(names), rng.choice(RELATIONS), rng.choice(names))
+        graph.add(*edge)
+        expected.add(edge)
+        if step == 200:
+            graph.save(tmp_path / "facts.kg")
+            graph = KnowledgeGraph.load(tmp_path / "facts.kg")
+        if step % 37 == 0:
+            name = rng.choice(names)
+            assert len(graph) == len(expected)
+            assert sorted(graph.objects(name)) == sorted(
+                o for s, _, o in expected if s == name
+            )
+            assert sorted(graph.subjects(name, "has_a")) == sorted(
+                s for s, r, o in expected if o == name and r == "has_a"
+            )
+
+    assert sorted(graph.triplets()) == sorted(expected)
+    graph.compact()
+    assert sorted(graph.triplets()) == sorted(expected)
+    assert all(graph.name(graph.node_id(name)) == name for name in names)
@@ -0,0 +1,128 @@
+# tests/test_hedging.py
+import asyncio
+import time
+
+import pytest
+
+from ner_agent import HedgePolicy, LatencyTracker, NerAgent, RateLimiter
+
+OUTPUT = "[Elon Musk](#PERSON) | [done](#DONE)"
+
+
+def _seeded_policy(model: str = "m", latency: float = 0.01, **kwargs) -> HedgePolicy:
+    policy = HedgePolicy(min_samples=5, max_hedge_rate=1.0, **kwargs)
+    for _ in range(5):
+        policy.record(model, latency)
+    return policy
+
+
+def test_latency_tracker_percentile_over_window():
+    tracker = LatencyTracker(window=4)
+    for latency in [5.0, 1.0, 2.0, 3.0, 4.0]:
+        tracker.record(latency)
+    assert len(tracker) == 4
+    assert tracker.percentile(0.0) == 1.0
+    assert tracker.percentile(0.99) == 4.0  # 5.0 was evicted
+
+
+def test_hedge_policy_needs_samples_and_budget():
+    policy = HedgePolicy(min_samples=3, max_hedge_rate=0.1)
+    policy.record("m", 0.2)
+    assert policy.hedge_delay("m") is None
+    policy.record("m", 0.2)
+    policy.record("m", 0.2)
+    assert policy.hedge_delay("m") == 0.2
+
+    policy.calls = 10
+    assert policy.try_hedge()
+    assert not policy.try_hedge()
+
+
+@pytest.mark.asyncio
+async def test_hedge_policy_runs_duplicate_for_slow_call():
+    policy = _seeded_policy()
+    started: list[float] = []
+    cancelled: list[int] = []
+
+    async def _call() -> int:
+        idx = len(started)
+        started.append(time.monotonic())
+        try:
+            await asyncio.sleep(1.0 if idx == 0 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(idx)
+            raise
+        return idx
+
+    began = time.monotonic()
+    assert await policy.run("m", _call) == 1
+    assert time.monotonic() - began < 0.5
+    await asyncio.sleep(0)
+    assert cancelled == [0]
+    assert policy.hedges == 1
+
+
+@pytest.mark.asyncio
+async def test_hedge_policy_skips_fast_calls_and_raises_errors():
+    policy = _seeded_policy(latency=0.05)
+    calls = 0
+
+    async def _fast() -> str:
+        nonlocal calls
+        calls += 1
+        return "ok"
+
+    assert await policy.run("m", _fast) == "ok"
+    assert calls == 1 and policy.hedges == 0
+
+    async def _fail() -> None:
+        await asyncio.sleep(0.1)
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        await policy.run("m", _fail)
+    assert policy.hedges == 1
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_hedges_slow_calls(scripted_model_cls):
+    model = scripted_model_cls(lambda *_: OUTPUT, delay=1.0)
+    policy = _seeded_policy(model.model)
+    agent = NerAgent(hedging=policy)
+
+    began = time.monotonic()
+    task = asyncio.create_task(agent.run("Elon Musk spoke.", model=model))
+    while not model.calls:
+        await asyncio.sleep(0)
+    model.delay = 0.0  # only the first call stalls
+    result = await task
+
+    assert time.monotonic() - began < 0.5
+    assert [e.value for e in result.entities] == ["Elon Musk"]
+    assert len(model.calls) == 2
+    assert policy.hedges == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_concurrency, hedges", [(1, 0), (2, 1)])
+async def test_ner_agent_hedges_within_rate_limits(
+    scripted_model_cls, max_concurrency, hedges
+):
+    model = scripted_model_cls(lambda *_: OUTPUT, delay=0.3)
+    policy = _seeded_policy(model.model)
+    limiter = RateLimiter(requests_per_minute=60, max_concurrency=max_concurrency)
+    agent = NerAgent(hedging=policy, rate_limits={model.model: limiter})
+
+    task = asyncio.create_task(agent.run("Elon Musk spoke.", model=model))
+    while not model.calls:
+        await asyncio.sleep(0)
+    model.delay = 0.0
+    result = await task
+
+    assert [e.value for e in result.entities] == ["Elon Musk"]
+    # Without a free slot the hedge is skipped; otherwise it takes its own.
+    assert len(model.calls) == 1 + hedges
+    assert policy.hedges == hedges
+    assert limiter.requests.level == pytest.approx(60 - 1 - hedges, abs=0.5)
+    await asyncio.sleep(0.01)
+    assert limiter.in_flight == 0
@@ -0,0 +1,94 @@
+# tests/test_ner_agent_cache.py
+import json
+import pathlib
+
+import agents
+import pytest
+
+from ner_agent import (
+    LRUCache,
+    NerAgent,
+    NerResult,
+    RelationExtractionResult,
+    SQLiteCache,
+    SynonymsAndCanonicalNameResult,
+    TieredCache,
+)
+
+
+def _respond(system_instructions, input) -> str:
+    if "Synonym" in system_instructions:
+        return json.dumps({"is_synonymous": True, "canonical_name": "Hong Kong"})
+    if "Relation Extractor" in system_instructions:
+        return json.dumps(
+            {"triplets": [{"subject": "A", "relation": "is_a", "object": "B"}]}
+        )
+    if "NER) Specialist" in system_instructions:
+        return json.dumps({"entities": ["Paris"]})
+    return "[Paris](#LOCATION) | [done](#DONE)"
+
+
+def test_lru_cache_evicts_by_size():
+    cache = LRUCache(max_bytes=20)
+    cache.set("a", "x" * 8)
+    cache.set("b", "y" * 8)
+    assert cache.get("a") == "x" * 8  # "a" becomes most recently used
+    cache.set("c", "z" * 8)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 8
+    assert cache.get("c") == "z" * 8
+    assert cache.size <= 20
+
+
+def test_sqlite_cache_persists_and_tiers_backfill(tmp_path: pathlib.Path):
+    path = tmp_path / "cache.sqlite3"
+    cache = SQLiteCache(path)
+    cache.set("k", "v")
+    cache.close()
+
+    memory = LRUCache()
+    tiered = TieredCache(memory, SQLiteCache(path))
+    assert tiered.get("k") == "v"
+    assert memory.get("k") == "v"
+    assert tiered.get("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_cache_hits_skip_model(
+    scripted_model_cls, tmp_path: pathlib.Path
+):
+    model = scripted_model_cls(_respond)
+    agent = NerAgent(cache=TieredCache(LRUCache(), SQLiteCache(tmp_path / "c.db")))
+
+    for _ in range(2):
+        assert isinstance(await agent.run("I love Paris.", model=model), NerResult)
+        assert isinstance(
+            await agent.analyze_entities("I love Paris.", model=model), NerResult
+        )
+        assert isinstance(
+            await agent.analyze_synonyms_and_canonical_name(
+                ["Hong Kong", "香港"], model=model
+            ),
+            SynonymsAndCanonicalNameResult,
+        )
+        assert isinstance(
+            await agent.extract_relations("A is a B.", model=model),
+            RelationExtractionResult,
+        )
+    assert len(model.calls) == 4
+
+    # A fresh agent sharing the SQLite file hits without any model call.
+    agent = NerAgent(cache=SQLiteCache(tmp_path / "c.db"))
+    result = await agent.run("I love Paris.", model=model)
+    assert result.entities[0].start == 7
+    assert len(model.calls) == 4
+
+    # Different settings or input miss.
+    await agent.run(
+        "I love Paris.",
+        model=model,
+        model_settings=agents.ModelSettings(temperature=0.0),
+    )
+    await agent.run("I love Paris!", model=model)
+    assert len(model.calls) == 6
@@ -0,0 +1,80 @@
+# tests/test_ner_agent_cascade.py
+import json
+
+import pytest
+
+from ner_agent import LRUCache, NerAgent
+
+TEXT = "Elon Musk visited Austin."
+GOOD = "[Elon Musk](#PERSON) | [Austin](#GPE) | [done](#DONE)"
+
+
+def _models(scripted_model_cls, small_output: str, large_output: str = GOOD):
+    small = scripted_model_cls(lambda *_: small_output, model="small")
+    large = scripted_model_cls(lambda *_: large_output, model="large")
+    return small, large
+
+
+@pytest.mark.asyncio
+async def test_cascade_keeps_good_output_on_small_model(scripted_model_cls):
+    small, large = _models(scripted_model_cls, GOOD)
+
+    result = await NerAgent().run(TEXT, model=small, escalation_model=large)
+
+    assert [e.value for e in result.entities] == ["Elon Musk", "Austin"]
+    assert (len(small.calls), len(large.calls)) == (1, 0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "small_output",
+    [
+        "[Elon Musk](#PERSON) | [Austin](#GPE)",  # missing DONE
+        "[Elon Musk](#PERSON) | [Austin](#CITY) | [done](#DONE)",  # unknown type
+        "[Elon Musk](#PERSON) | [Houston](#GPE) | [done](#DONE)",  # no span
+    ],
+)
+async def test_cascade_escalates_bad_output(scripted_model_cls, small_output):
+    small, large = _models(scripted_model_cls, small_output)
+
+    result = await NerAgent().run(TEXT, model=small, escalation_model=large)
+
+    assert [(e.value, e.start) for e in result.entities] == [
+        ("Elon Musk", 0),
+        ("Austin", 18),
+    ]
+    assert (len(small.calls), len(large.calls)) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_cascade_result_is_cached_apart(scripted_model_cls):
+    small, large = _models(scripted_model_cls, "[Houston](#GPE) | [done](#DONE)")
+    agent = NerAgent(cache=LRUCache())
+
+    first = await agent.run(TEXT, model=small, escalation_model=large)
+    second = await agent.run(TEXT, model=small, escalation_model=large)
+    plain = await agent.run(TEXT, model=small)
+
+    assert first == second
+    assert [e.value for e in plain.entities] == ["Houston"]
+    # The plain call has its own cache entry, so it calls the small model.
+    assert (len(small.calls), len(large.calls)) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_cascade_analyze_entities(scripted_model_cls):
+    small, large = _models(
+        scripted_model_cls,
+        json.dumps({"entities": ["Elon Musk", "Texas"]}),
+        json.dumps({"entities": ["Elon Musk", "Austin"]}),
+    )
+
+    result = await NerAgent().analyze_entities(
+        TEXT, model=small, escalation_model=large
+    )
+
+    assert [(e.value, e.start) for e in result.entities] == [
+        ("Elon Musk", 0),
+        ("Austin", 18),
+    ]
+    assert (len(small.calls), len(large.calls)) == (1, 1)
@@ -0,0 +1,36 @@
+# tests/test_ner_agent_clients.py
+import agents
+import pytest
+
+from ner_agent import NerAgent
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_reuses_clients_and_chat_models():
+    async with NerAgent(
+        base_url="http://localhost:11434/v1", api_key="ollama", max_connections=4
+    ) as agent:
+        small = agent._to_chat_model("gpt-4.1-nano")
+        large = agent._to_chat_model("gpt-4.1")
+
+        assert isinstance(small, agents.OpenAIResponsesModel)
+        assert agent._to_chat_model("gpt-4.1-nano") is small
+        assert small._client is large._client
+        assert len(agent._openai_clients) == 1
+        assert agent.http_limits.max_connections == 4
+
+        client = small._client
+
+    assert client.is_closed()
+    assert agent._openai_clients == {}
+    assert agent._chat_models == {}
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_does_not_own_passed_models(
+    chat_model: agents.OpenAIChatCompletionsModel,
+):
+    agent = NerAgent()
+    assert agent._to_chat_model(chat_model) is chat_model
+    await agent.aclose()
+    assert not chat_model._client.is_closed()
@@ -0,0 +1,91 @@
+# tests/test_ner_agent_extract_entities_and_relations.py
+import json
+import logging
+
+import agents
+import pytest
+
+from ner_agent import EntityType, NerAgent, Triplet
+
+TEXT = "LeBron James plays for the Los Angeles Lakers in Los Angeles."
+OUTPUT = json.dumps(
+    {
+        "entities": [
+            {"text": "LeBron James", "type": "PERSON"},
+            {"text": "Los Angeles Lakers", "type": "PROPER_NOUN"},
+            {"text": "Los Angeles", "type": "LOCATION"},
+            {"text": "basketball", "type": "SPORT"},
+        ],
+        "triplets": [
+            {"subject": 0, "relation": "related_to", "object": 1},
+            {"subject": 1, "relation": "related_to", "object": 2},
+            {"subject": 0, "relation": "is_a", "object": 9},
+        ],
+    }
+)
+
+
+@pytest.mark.asyncio
+async def test_joint_extraction_in_one_call(scripted_model_cls):
+    model = scripted_model_cls(lambda *_: OUTPUT)
+
+    result = await NerAgent().extract_entities_and_relations(TEXT, model=model)
+
+    assert len(model.calls) == 1
+    assert [(e.name, e.value, e.start) for e in result.ner.entities] == [
+        (EntityType.PERSON, "LeBron James", 0),
+        (EntityType.PROPER_NOUN, "Los Angeles Lakers", 27),
+        (EntityType.LOCATION, "Los Angeles", 49),
+    ]
+    assert result.relations.triplets == [
+        Triplet(
+            subject="LeBron James", relation="related_to", object="Los Angeles Lakers"
+        ),
+        Triplet(
+            subject="Los Angeles Lakers", relation="related_to", object="Los Angeles"
+        ),
+    ]
+
+
+@pytest.mark.parametrize(
+    "triplet, warning",
+    [
+        ({"subject": 0, "relation": "related_to", "object": 9}, "unknown entity"),
+        ({"subject": 0, "relation": "related_to", "object": -1}, "unknown entity"),
+        # "basketball" has an unknown type and is dropped.
+        ({"subject": 0, "relation": "related_to", "object": 3}, "unknown entity"),
+        # "Miami Heat" is not in the text and is dropped.
+        ({"subject": 4, "relation": "related_to", "object": 0}, "unknown entity"),
+        ({"subject": 0, "relation": "plays_for", "object": 1}, "unknown relation"),
+    ],
+)
+@pytest.mark.asyncio
+async def test_joint_extraction_drops_dangling_triplets(
+    scripted_model_cls, caplog, triplet, warning
+):
+    output = json.loads(OUTPUT)
+    output["entities"].append({"text": "Miami Heat", "type": "PROPER_NOUN"})
+    output["triplets"] = [{"subject": 1, "relation": "Is_A", "object": 2}, triplet]
+    model = scripted_model_cls(lambda *_: json.dumps(output))
+
+    with caplog.at_level(logging.WARNING, logger="ner_agent"):
+        result = await NerAgent().extract_entities_and_relations(TEXT, model=model)
+
+    values = [e.value for e in result.ner.entities]
+    assert values == ["LeBron James", "Los Angeles Lakers", "Los Angeles"]
+    assert result.relations.triplets == [
+        Triplet(subject="Los Angeles Lakers", relation="is_a", object="Los Angeles")
+    ]
+    assert f"Dropping triplet with {warning}" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_joint_extraction(chat_model: agents.OpenAIChatCompletionsModel):
+    result = await NerAgent().extract_entities_and_relations(
+        TEXT, model=chat_model, verbose=True
+    )
+    values = {e.value for e in result.ner.entities}
+    assert "LeBron James" in values
+    assert all(
+        t.subject in values or t.object in values for t in result.relations.triplets
+    )
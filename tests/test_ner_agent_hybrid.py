@@ -0,0 +1,48 @@
+# tests/test_ner_agent_hybrid.py
+import agents
+import pytest
+
+from ner_agent import EntityType, NerAgent
+
+TEXT = "蘋果公司在台北101發表了iPhone 15，預計售價為新台幣35,000元，2024年3月15日上市"
+OUTPUT = "[蘋果公司](#PROPER_NOUN) | [台北101](#LOCATION) | [iPhone 15](#PROPER_NOUN) | [done](#DONE)"  # noqa: E501
+
+
+@pytest.mark.asyncio
+async def test_hybrid_merges_rule_entities(scripted_model_cls):
+    model = scripted_model_cls(lambda *_: OUTPUT)
+
+    result = await NerAgent().run(TEXT, model=model, hybrid=True)
+
+    assert [(e.name, e.value) for e in result.entities] == [
+        (EntityType.PROPER_NOUN, "蘋果公司"),
+        (EntityType.LOCATION, "台北101"),
+        (EntityType.PROPER_NOUN, "iPhone 15"),
+        (EntityType.NUMERIC, "新台幣35,000元"),
+        (EntityType.DATETIME, "2024年3月15日"),
+    ]
+    assert all(TEXT[e.start : e.end] == e.value for e in result.entities)
+
+    instructions, _ = model.calls[0]
+    assert "- DATETIME:" not in instructions and "- NUMERIC:" not in instructions
+    assert "#NUMERIC" not in instructions
+
+
+@pytest.mark.asyncio
+async def test_hybrid_skips_model_without_other_candidates(scripted_model_cls):
+    model = scripted_model_cls(lambda *_: "[done](#DONE)")
+
+    result = await NerAgent().run("March 15, 2024: 20%", model=model, hybrid=True)
+
+    assert [(e.name, e.value) for e in result.entities] == [
+        (EntityType.DATETIME, "March 15, 2024"),
+        (EntityType.NUMERIC, "20%"),
+    ]
+    assert model.calls == []
+
+
+@pytest.mark.asyncio
+async def test_hybrid_run(chat_model: agents.OpenAIChatCompletionsModel):
+    result = await NerAgent().run(TEXT, model=chat_model, hybrid=True, verbose=True)
+    names = {e.name for e in result.entities}
+    assert {EntityType.NUMERIC, EntityType.DATETIME} <= names
@@ -0,0 +1,72 @@
+# tests/test_ner_agent_parse_entities.py
+import random
+import re
+import time
+
+import pytest
+
+from ner_agent import EntityMarkupParser, NerAgent
+
+# The regex `_parse_entities` used before the incremental parser.
+REFERENCE_PATTERN = re.compile(
+    r"\[([^\]]+)\]\s*\(\s*#\s*([^)]+?)\s*\)", flags=re.IGNORECASE
+)
+
+
+def _reference(output: str) -> list[tuple[str, str]]:
+    return [
+        (m.group(1).strip(), m.group(2).strip())
+        for m in REFERENCE_PATTERN.finditer(output)
+    ]
+
+
+def _parse_in_chunks(output: str, rng: random.Random) -> list[tuple[str, str]]:
+    parser = EntityMarkupParser()
+    found: list[tuple[str, str]] = []
+    pos = 0
+    while pos < len(output):
+        size = rng.randint(1, 6)
+        found.extend(parser.feed(output[pos : pos + size]))
+        pos += size
+    return found + parser.close()
+
+
+@pytest.mark.parametrize(
+    "output",
+    [
+        "[Apple](#PROPER_NOUN) | [Taipei 101](#LOCATION) | [done](#DONE)",
+        "[Apple](#ORG)[Tim Cook](#PERSON)\n[ x ] \n ( \n # person \n )",
+        "[a [b](#X) [](#Y) [c](#) [d] (e) [f](# )",
+        "[a](#X [b](#Y) trailing [c](#Z",
+        "[x](#T [y](#U [z](#V)",
+        "",
+    ],
+)
+def test_entity_markup_parser_matches_reference(output: str):
+    rng = random.Random(0)
+    assert _parse_in_chunks(output, rng) == _reference(output)
+
+
+def test_entity_markup_parser_fuzz_against_reference():
+    rng = random.Random(42)
+    alphabet = "[]()#ab \n|"
+    for _ in range(2000):
+        output = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        assert _parse_in_chunks(output, rng) == _reference(output), output
+
+
+def test_parse_entities_is_linear_on_large_output():
+    text = "Tim Cook met Elon Musk in Paris. "
+    output = " | ".join(
+        ["[Tim Cook](#PERSON) | [Elon Musk](#PERSON) | [Paris](#LOCATION)"] * 50_000
+    )
+    assert len(output) > 3_000_000
+
+    started = time.perf_counter()
+    parser = EntityMarkupParser()
+    markups = parser.feed(output) + parser.close()
+    elapsed = time.perf_counter() - started
+
+    assert len(markups) == 150_000
+    assert elapsed < 5.0
+    assert NerAgent()._parse_entities(output[:200], original_text=text)[2].start == 26
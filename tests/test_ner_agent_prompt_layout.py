@@ -0,0 +1,47 @@
+# tests/test_ner_agent_prompt_layout.py
+import json
+
+import pytest
+
+from ner_agent import NerAgent
+
+
+def _respond(system_instructions, input) -> str:
+    if "Entity and Relation Extractor" in system_instructions:
+        return json.dumps({"entities": [], "triplets": []})
+    if "Synonym" in system_instructions:
+        return json.dumps({"is_synonymous": False, "canonical_name": None})
+    if "Relation Extractor" in system_instructions:
+        return json.dumps({"triplets": []})
+    if "NER) Specialist" in system_instructions:
+        return json.dumps({"entities": []})
+    if "numbered segments" in system_instructions:
+        return "END"
+    return "[done](#DONE)"
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_system_prompts_are_static(scripted_model_cls):
+    model = scripted_model_cls(_respond)
+    agent = NerAgent()
+    inputs = ["Alice met Bob in Paris.", "東京オリンピック", "Carol flew to Berlin."]
+
+    for text in inputs:
+        await agent.run(text, model=model)
+        await agent.analyze_entities(text, model=model)
+        await agent.analyze_synonyms_and_canonical_name([text, "x"], model=model)
+        await agent.extract_relations(text, model=model)
+        await agent.extract_entities_and_relations(text, model=model)
+        await agent.run(text, model=model, compact=True)
+
+    per_method = [model.calls[i::6] for i in range(6)]
+    for method, calls in enumerate(per_method):
+        instructions = [call[0] for call in calls]
+        # run() picks few-shot examples by script, so only same-script inputs
+        # share its system prompt.
+        assert instructions[0] == instructions[2]
+        assert method == 0 or instructions[0] == instructions[1]
+        assert inputs[0] not in instructions[0]
+        for text, (call_instructions, call_input) in zip(inputs, calls):
+            assert text in call_input
+            assert "{{" not in call_instructions and "{{" not in call_input
@@ -0,0 +1,100 @@
+# tests/test_ner_agent_run_chunked.py
+import re
+
+import agents
+import pytest
+
+from ner_agent import (
+    Entity,
+    EntityType,
+    NerAgent,
+    _chunk_sentences,
+    _merge_chunk_entities,
+    _split_sentences,
+)
+
+DOCUMENT = (
+    "Elon Musk visited Austin. "
+    "The weather was mild. "
+    "Tim Cook met Elon Musk in Paris. "
+    "臺北101很高。"
+    "Nothing happened in Austin after that."
+)
+KNOWN = {
+    "Elon Musk": EntityType.PERSON,
+    "Tim Cook": EntityType.PERSON,
+    "Austin": EntityType.LOCATION,
+    "Paris": EntityType.LOCATION,
+    "臺北101": EntityType.LOCATION,
+}
+
+
+def _tag_known(system_instructions, input) -> str:
+    found = [
+        (m.start(), f"[{m.group(0)}](#{KNOWN[m.group(0)]})")
+        for m in re.finditer("|".join(map(re.escape, KNOWN)), input)
+    ]
+    return " | ".join([markup for _, markup in sorted(found)] + ["[done](#DONE)"])
+
+
+def test_split_sentences_covers_text():
+    spans = _split_sentences(DOCUMENT)
+    assert "".join(DOCUMENT[s:e] for s, e in spans) == DOCUMENT
+    assert DOCUMENT[spans[3][0] : spans[3][1]].strip() == "臺北101很高。"
+
+
+def test_chunk_sentences_overlap_and_limit():
+    spans = _split_sentences(DOCUMENT)
+    chunks = _chunk_sentences(spans, max_chars=60, overlap=1)
+
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(DOCUMENT)
+    assert all(e - s <= 60 for s, e in chunks)
+    for (_, prev_end), (next_start, _) in zip(chunks, chunks[1:]):
+        assert next_start < prev_end  # consecutive chunks overlap
+
+
+def test_merge_chunk_entities_removes_overlap_duplicates():
+    merged = _merge_chunk_entities(
+        [
+            [
+                Entity(name=EntityType.LOCATION, value="New York", start=10, end=18),
+                Entity(name=EntityType.PERSON, value="Ghost", start=-1, end=-1),
+            ],
+            [
+                Entity(name=EntityType.LOCATION, value="New York", start=10, end=18),
+                Entity(name=EntityType.LOCATION, value="York", start=14, end=18),
+                Entity(name=EntityType.PERSON, value="Ghost", start=-1, end=-1),
+            ],
+        ]
+    )
+    assert merged == [
+        Entity(name=EntityType.LOCATION, value="New York", start=10, end=18),
+        Entity(name=EntityType.PERSON, value="Ghost", start=-1, end=-1),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_run_chunked_maps_offsets(scripted_model_cls):
+    model = scripted_model_cls(_tag_known)
+
+    result = await NerAgent().run_chunked(
+        DOCUMENT, model=model, max_chunk_chars=60, overlap_sentences=1
+    )
+
+    assert len(model.calls) > 1
+    assert result.text == DOCUMENT
+    expected = sorted(
+        (m.start(), m.end(), m.group(0))
+        for m in re.finditer("|".join(map(re.escape, KNOWN)), DOCUMENT)
+    )
+    assert [(e.start, e.end, e.value) for e in result.entities] == expected
+    for entity in result.entities:
+        assert DOCUMENT[entity.start : entity.end] == entity.value
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_run_chunked(chat_model: agents.OpenAIChatCompletionsModel):
+    result = await NerAgent().run_chunked(
+        DOCUMENT, model=chat_model, max_chunk_chars=60, verbose=True
+    )
+    assert {e.name for e in result.entities} >= {EntityType.PERSON}
@@ -0,0 +1,71 @@
+# tests/test_ner_agent_run_compact.py
+import agents
+import pytest
+
+from ner_agent import EntityType, NerAgent
+
+TEXT = "Elon Musk visited Tesla's Gigafactory in Austin on March 15, 2024, and announced a 20% increase."  # noqa: E501
+CJK_TEXT = "蘋果公司在台北101發表了iPhone 15，預計售價為新台幣35,000元"
+
+
+@pytest.mark.asyncio
+async def test_run_compact_resolves_segment_references(scripted_model_cls):
+    model = scripted_model_cls(lambda *_: "P0-1|O3|L6|L8|D10-13|Q18-19|END")
+
+    result = await NerAgent().run(TEXT, model=model, compact=True)
+
+    assert [(e.name, e.value) for e in result.entities] == [
+        (EntityType.PERSON, "Elon Musk"),
+        (EntityType.PROPER_NOUN, "Tesla"),
+        (EntityType.LOCATION, "Gigafactory"),
+        (EntityType.LOCATION, "Austin"),
+        (EntityType.DATETIME, "March 15, 2024"),
+        (EntityType.NUMERIC, "20%"),
+    ]
+    assert all(TEXT[e.start : e.end] == e.value for e in result.entities)
+
+    _, agent_input = model.calls[0]
+    assert "0:Elon 1:Musk 2:visited" in str(agent_input)
+
+
+@pytest.mark.asyncio
+async def test_run_compact_falls_back_to_copied_text(scripted_model_cls):
+    model = scripted_model_cls(
+        lambda *_: "O=蘋果公司 | L=台北101 | O3-4 | Q=新台幣35,000元 | END"
+    )
+
+    result = await NerAgent().run(CJK_TEXT, model=model, compact=True)
+
+    assert [(e.name, e.value, e.start) for e in result.entities] == [
+        (EntityType.PROPER_NOUN, "蘋果公司", 0),
+        (EntityType.LOCATION, "台北101", 5),
+        (EntityType.PROPER_NOUN, "iPhone 15", 13),
+        (EntityType.NUMERIC, "新台幣35,000元", 28),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_run_compact_escalates_bad_references(scripted_model_cls):
+    small = scripted_model_cls(lambda *_: "P0-1|L99", model="small")
+    large = scripted_model_cls(lambda *_: "P0-1|L8|END", model="large")
+
+    result = await NerAgent().run(
+        TEXT, model=small, escalation_model=large, compact=True, hybrid=True
+    )
+
+    assert [e.value for e in result.entities] == [
+        "Elon Musk",
+        "Austin",
+        "March 15, 2024",
+        "20%",
+    ]
+    instructions, _ = large.calls[0]
+    assert "- D (DATETIME)" not in instructions and "|D10-13|" not in instructions
+
+
+@pytest.mark.asyncio
+async def test_run_compact(chat_model: agents.OpenAIChatCompletionsModel):
+    result = await NerAgent().run(TEXT, model=chat_model, compact=True, verbose=True)
+    values = {e.value for e in result.entities}
+    assert {"Elon Musk", "Austin"} <= values
+    assert all(TEXT[e.start : e.end] == e.value for e in result.entities)
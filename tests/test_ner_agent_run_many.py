@@ -0,0 +1,58 @@
+# tests/test_ner_agent_run_many.py
+import re
+
+import agents
+import pytest
+
+from ner_agent import EntityType, NerAgent, NerResult
+
+TEXTS: list[str] = [
+    "Elon Musk visited Austin.",
+    "Hurricane Katrina devastated New Orleans on August 29, 2005.",
+    "Amazon sold 1,000 Echo Dots in Q4 2023 for $150,000.",
+]
+
+
+def _echo_person(system_instructions, input) -> str:
+    text = re.search(r"'''(.*)'''", input).group(1)
+    if "FAIL" in text:
+        raise RuntimeError("boom")
+    return f"[{text.split()[0]}](#PERSON) | [done](#DONE)"
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_run_many_keeps_order_and_bounds_concurrency(
+    scripted_model_cls,
+):
+    model = scripted_model_cls(_echo_person, delay=0.01)
+    texts = [f"Name{i} is here." for i in range(20)]
+
+    results = await NerAgent().run_many(texts, model=model, concurrency=3)
+
+    assert len(results) == len(texts)
+    assert model.max_in_flight <= 3
+    for i, result in enumerate(results):
+        assert isinstance(result, NerResult)
+        assert result.text == texts[i]
+        assert result.entities[0].value == f"Name{i}"
+        assert result.entities[0].name == EntityType.PERSON
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_run_many_returns_per_item_errors(scripted_model_cls):
+    model = scripted_model_cls(_echo_person)
+
+    results = await NerAgent().run_many(["Alice ok", "FAIL", "", "Bob ok"], model=model)
+
+    assert isinstance(results[0], NerResult)
+    assert isinstance(results[1], RuntimeError)
+    assert isinstance(results[2], ValueError)
+    assert isinstance(results[3], NerResult)
+    assert results[3].entities[0].value == "Bob"
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_run_many(chat_model: agents.OpenAIChatCompletionsModel):
+    agent = NerAgent()
+    results = await agent.run_many(TEXTS, model=chat_model, concurrency=2)
+    assert [r.text for r in results if isinstance(r, NerResult)] == TEXTS
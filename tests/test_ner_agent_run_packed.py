@@ -0,0 +1,76 @@
+# tests/test_ner_agent_run_packed.py
+import re
+
+import agents
+import pytest
+
+from ner_agent import Entity, EntityType, NerAgent, NerResult, _pack_texts
+
+
+def _tag_first_word(system_instructions, input) -> str:
+    texts = re.findall(r"^id: \d+ text: '''(.*)'''$", input, re.M)
+    return "\n".join(
+        f"id: {i} entities: [{text.split()[0]}](#PERSON) | [done](#DONE)"
+        for i, text in enumerate(texts)
+    )
+
+
+def test_pack_texts_respects_budget_and_size():
+    texts = ["short text"] * 10 + ["x" * 4000] + ["short text"] * 3
+
+    packs = _pack_texts(texts, token_budget=50, max_pack_size=4)
+
+    assert [i for pack in packs for i in pack] == list(range(len(texts)))
+    assert all(len(pack) <= 4 for pack in packs)
+    assert [10] in packs  # oversized text is packed alone
+
+
+def test_parse_packed_entities_claims_spans_per_text():
+    output = (
+        "id: 1 entities: [Paris](#LOCATION) | [done](#DONE)\n"
+        "id: 0 entities: [Paris](#LOCATION) | [Tim Cook](#PERSON) | [done](#DONE)\n"
+    )
+    entities = NerAgent()._parse_packed_entities(
+        output, original_texts=["Tim Cook left Paris.", "Paris in spring", "none"]
+    )
+
+    assert entities[0] == [
+        Entity(name=EntityType.LOCATION, value="Paris", start=14, end=19),
+        Entity(name=EntityType.PERSON, value="Tim Cook", start=0, end=8),
+    ]
+    assert entities[1] == [
+        Entity(name=EntityType.LOCATION, value="Paris", start=0, end=5)
+    ]
+    assert entities[2] == []
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_run_packed_splits_results(scripted_model_cls):
+    model = scripted_model_cls(_tag_first_word)
+    texts = [f"Name{i} says hi." for i in range(10)] + [""]
+
+    results = await NerAgent().run_packed(
+        texts, model=model, token_budget=60, max_pack_size=4
+    )
+
+    assert len(model.calls) == 3
+    for i in range(10):
+        assert isinstance(results[i], NerResult)
+        assert results[i].entities == [
+            Entity(
+                name=EntityType.PERSON, value=f"Name{i}", start=0, end=len(f"Name{i}")
+            )
+        ]
+    assert isinstance(results[10], ValueError)
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_run_packed(chat_model: agents.OpenAIChatCompletionsModel):
+    texts = [
+        "Elon Musk visited Austin.",
+        "Hurricane Katrina devastated New Orleans.",
+        "Tim Cook lives in California.",
+    ]
+    results = await NerAgent().run_packed(texts, model=chat_model, verbose=True)
+    assert all(isinstance(r, NerResult) for r in results)
+    assert {e.name for e in results[0].entities} >= {EntityType.PERSON}
@@ -0,0 +1,86 @@
+# tests/test_ner_agent_run_stream.py
+import agents
+import pytest
+
+from ner_agent import (
+    Entity,
+    EntityType,
+    Gazetteer,
+    LRUCache,
+    NerAgent,
+    NerResult,
+    RateLimiter,
+)
+
+TEXT = "Elon Musk visited Tesla's Gigafactory in Austin on March 15, 2024."
+OUTPUT = (
+    "[Elon Musk](#PERSON) | [Tesla](#ORG) |\n[Gigafactory](#LOCATION) "
+    "[Austin](#GPE) | [March 15, 2024](#DATETIME) | [done](#DONE)"
+)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [1, 4, 1000])
+async def test_ner_agent_run_stream_yields_entities(scripted_model_cls, chunk_size):
+    model = scripted_model_cls(lambda *_: OUTPUT, stream_chunk_size=chunk_size)
+    agent = NerAgent()
+
+    stream = agent.run_stream(TEXT, model=model)
+    streamed = [entity async for entity in stream]
+
+    expected = agent._parse_entities(OUTPUT, original_text=TEXT)
+    assert streamed == expected
+    assert stream.result == NerResult(text=TEXT, entities=expected)
+    assert stream.usage is not None and stream.usage.requests == 1
+    assert streamed[1] == Entity(
+        name=EntityType.PROPER_NOUN, value="Tesla", start=18, end=23
+    )
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_run_stream_uses_cache(scripted_model_cls):
+    model = scripted_model_cls(lambda *_: OUTPUT)
+    agent = NerAgent(cache=LRUCache())
+
+    first = [entity async for entity in agent.run_stream(TEXT, model=model)]
+    stream = agent.run_stream(TEXT, model=model)
+    second = [entity async for entity in stream]
+
+    assert first == second
+    assert len(model.calls) == 1
+    assert stream.result.entities == first
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_run_stream_matches_run(scripted_model_cls):
+    model = scripted_model_cls(lambda *_: "[Elon Musk](#PERSON) | [done](#DONE)")
+    limiter = RateLimiter(requests_per_minute=60)
+    agent = NerAgent(
+        cache=LRUCache(),
+        gazetteer=Gazetteer({"Tesla": "PROPER_NOUN"}),
+        rate_limits={model.model: limiter},
+    )
+
+    stream = agent.run_stream(TEXT, model=model)
+    streamed = [entity async for entity in stream]
+
+    # The gazetteer match is yielded after the model's entities and merged
+    # into the result, which run() then reads from the shared cache.
+    assert [e.value for e in streamed] == ["Elon Musk", "Tesla"]
+    assert [e.value for e in stream.result.entities] == ["Elon Musk", "Tesla"]
+    assert await agent.run(TEXT, model=model) == stream.result
+    assert len(model.calls) == 1
+    assert limiter.in_flight == 0
+    assert limiter.requests.level == pytest.approx(59, abs=0.5)
+
+    covered = agent.run_stream("Tesla", model=model)
+    assert [e.value async for e in covered] == ["Tesla"]
+    assert len(model.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_run_stream(chat_model: agents.OpenAIChatCompletionsModel):
+    stream = NerAgent().run_stream(TEXT, model=chat_model, verbose=True)
+    streamed = [entity async for entity in stream]
+    assert stream.result is not None and stream.result.entities == streamed
+    assert {e.name for e in streamed} >= {EntityType.PERSON}
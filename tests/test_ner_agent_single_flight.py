@@ -0,0 +1,81 @@
+# tests/test_ner_agent_single_flight.py
+import asyncio
+
+import agents
+import pytest
+
+from ner_agent import NerAgent
+
+TEXT = "Elon Musk visited Austin."
+OUTPUT = "[Elon Musk](#PERSON) | [Austin](#GPE) | [done](#DONE)"
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_identical_requests(scripted_model_cls):
+    model = scripted_model_cls(lambda *_: OUTPUT, delay=0.05)
+    agent = NerAgent()
+
+    results = await asyncio.gather(*(agent.run(TEXT, model=model) for _ in range(5)))
+
+    assert len(model.calls) == 1
+    assert all(r == results[0] for r in results)
+    assert len({id(r) for r in results}) == 5  # each caller gets its own result
+    assert agent._in_flight == {}
+
+
+@pytest.mark.asyncio
+async def test_single_flight_keeps_distinct_requests_apart(scripted_model_cls):
+    model = scripted_model_cls(lambda *_: OUTPUT, delay=0.05)
+    agent = NerAgent()
+
+    await asyncio.gather(
+        agent.run(TEXT, model=model),
+        agent.run(TEXT + " ", model=model),
+        agent.run(TEXT, model=model, model_settings=agents.ModelSettings(top_p=0.5)),
+        agent.analyze_entities(TEXT, model=scripted_model_cls(lambda *_: "{}")),
+    )
+
+    assert len(model.calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_single_flight_can_be_disabled(scripted_model_cls):
+    model = scripted_model_cls(lambda *_: OUTPUT, delay=0.05)
+    agent = NerAgent(single_flight=False)
+
+    await asyncio.gather(*(agent.run(TEXT, model=model) for _ in range(3)))
+
+    assert len(model.calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_single_flight_survives_cancelled_caller(scripted_model_cls):
+    model = scripted_model_cls(lambda *_: OUTPUT, delay=0.05)
+    agent = NerAgent()
+
+    leader = asyncio.create_task(agent.run(TEXT, model=model))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(agent.run(TEXT, model=model))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    result = await follower
+    assert [e.value for e in result.entities] == ["Elon Musk", "Austin"]
+    assert len(model.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_errors(scripted_model_cls):
+    def _fail(*_):
+        raise RuntimeError("model down")
+
+    model = scripted_model_cls(_fail, delay=0.05)
+    agent = NerAgent()
+
+    results = await asyncio.gather(
+        *(agent.run(TEXT, model=model) for _ in range(3)), return_exceptions=True
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(model.calls) == 1
+    assert agent._in_flight == {}
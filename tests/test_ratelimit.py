@@ -0,0 +1,151 @@
+# tests/test_ratelimit.py
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+from ner_agent import NerAgent, RateLimiter, TokenBucket
+
+OUTPUT = "[Elon Musk](#PERSON) | [done](#DONE)"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _rate_limit_error() -> openai.RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/responses")
+    return openai.RateLimitError(
+        "rate limited", response=httpx.Response(429, request=request), body=None
+    )
+
+
+def test_token_bucket_refills_and_carries_debt():
+    clock = FakeClock()
+    bucket = TokenBucket(600, burst=100, clock=clock)  # 10 per second
+
+    assert bucket.wait_time(100) == 0.0
+    bucket.take(100)
+    assert bucket.wait_time(50) == pytest.approx(5.0)
+
+    clock.now = 2.0
+    bucket.refund(-40)  # used 40 more than reserved
+    assert bucket.level == pytest.approx(-20)
+    assert bucket.wait_time(10) == pytest.approx(3.0)
+
+    clock.now = 100.0
+    assert bucket.wait_time(1000) == 0.0  # capped at the burst size
+    bucket.drain()
+    assert bucket.level == 0.0
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_aimd_concurrency():
+    limiter = RateLimiter(max_concurrency=8, min_concurrency=2)
+
+    burst = [await limiter.acquire(10) for _ in range(4)]
+    for reservation in burst:
+        reservation.rate_limited = True
+        await limiter.release(reservation)
+    assert limiter.concurrency == 4  # one burst of errors halves once
+    assert limiter.in_flight == 0
+
+    for _ in range(3):
+        reservation = await limiter.acquire(10)
+        reservation.rate_limited = True
+        await limiter.release(reservation)
+    assert limiter.concurrency == 2
+
+    for _ in range(10):
+        reservation = await limiter.acquire(10)
+        reservation.actual_tokens = 10
+        await limiter.release(reservation)
+    assert 2 < limiter.concurrency < 8
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_bounds_in_flight_calls():
+    limiter = RateLimiter(max_concurrency=3)
+    peak = 0
+
+    async def _call():
+        nonlocal peak
+        async with limiter.reserve(1):
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(_call() for _ in range(10)))
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_waits_for_request_budget():
+    limiter = RateLimiter(requests_per_minute=6000)  # 100 per second
+    limiter.requests.capacity = limiter.requests.level = 1
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    for _ in range(3):
+        async with limiter.reserve(1):
+            pass
+    assert loop.time() - started >= 0.015
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_try_acquire_never_waits():
+    limiter = RateLimiter(requests_per_minute=2, max_concurrency=2)
+
+    first = limiter.try_acquire(10)
+    second = limiter.try_acquire(10)
+    assert first is not None and second is not None
+    assert limiter.try_acquire(10) is None  # no slot left
+    await limiter.release(first)
+    assert limiter.try_acquire(10) is None  # no request budget left
+    assert limiter.in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_retries_rate_limit_errors(scripted_model_cls):
+    failures = [_rate_limit_error(), _rate_limit_error()]
+
+    def _respond(*_):
+        if failures:
+            raise failures.pop()
+        return OUTPUT
+
+    model = scripted_model_cls(_respond)
+    limiter = RateLimiter(
+        requests_per_minute=60_000,
+        tokens_per_minute=1_000_000,
+        max_concurrency=4,
+        backoff_base=0.001,
+    )
+    agent = NerAgent(rate_limits={model.model: limiter})
+
+    result = await agent.run("Elon Musk spoke.", model=model)
+
+    assert [e.value for e in result.entities] == ["Elon Musk"]
+    assert len(model.calls) == 3
+    assert limiter.concurrency < 4
+    assert limiter.in_flight == 0
+    # The reservation was reconciled with the reported usage.
+    assert limiter.tokens.level <= limiter.tokens.capacity
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_gives_up_after_max_retries(scripted_model_cls):
+    def _respond(*_):
+        raise _rate_limit_error()
+
+    model = scripted_model_cls(_respond)
+    limiter = RateLimiter(max_retries=2, backoff_base=0.001)
+    agent = NerAgent(rate_limits={model.model: limiter})
+
+    with pytest.raises(openai.RateLimitError):
+        await agent.run("Elon Musk spoke.", model=model)
+    assert len(model.calls) == 3
@@ -0,0 +1,64 @@
+# tests/test_rules.py
+import pytest
+
+from ner_agent import RuleRecognizer
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        (
+            "Elon Musk visited Austin on March 15, 2024, announcing a 20% increase.",
+            [("March 15, 2024", "DATETIME"), ("20%", "NUMERIC")],
+        ),
+        (
+            "預計售價為新台幣35,000元",
+            [("新台幣35,000元", "NUMERIC")],
+        ),
+        (
+            "Revenue in Q4 2023 hit $150,000 and 3.5 million users at 9:30 AM.",
+            [
+                ("Q4 2023", "DATETIME"),
+                ("$150,000", "NUMERIC"),
+                ("3.5 million", "NUMERIC"),
+                ("9:30 AM", "DATETIME"),
+            ],
+        ),
+        (
+            "El 15 de marzo de 2024 costó 20 euros.",
+            [("15 de marzo de 2024", "DATETIME"), ("20 euros", "NUMERIC")],
+        ),
+        (
+            "2024年3月15日下午3點，成長20％",
+            [
+                ("2024年3月15日", "DATETIME"),
+                ("下午3點", "DATETIME"),
+                ("20％", "NUMERIC"),
+            ],
+        ),
+        ("서울에서 오전 9시에 공개했다", [("오전 9시", "DATETIME")]),
+        (
+            "The first show is next Friday; she is 5 years old and weighs 10 kg.",
+            [
+                ("first", "NUMERIC"),
+                ("next Friday", "DATETIME"),
+                ("5 years old", "DATETIME"),
+                ("10 kg", "NUMERIC"),
+            ],
+        ),
+        ("Founded in 1999, Galaxy S24 ships.", [("1999", "DATETIME")]),
+    ],
+)
+def test_rule_recognizer_finds_datetime_and_numeric(text, expected):
+    found = RuleRecognizer().find(text)
+    assert [(text[start:end], entity_type) for start, end, entity_type in found] == (
+        expected
+    )
+
+
+def test_rule_recognizer_prefers_longest_match():
+    recognizer = RuleRecognizer([("NUMERIC", r"\d+", 0), ("DATETIME", r"\d+ days", 0)])
+    assert recognizer.find("wait 30 days, 2") == [
+        (5, 12, "DATETIME"),
+        (14, 15, "NUMERIC"),
+    ]
@@ -0,0 +1,117 @@
+# tests/test_span_resolver.py
+import random
+import re
+import time
+
+import pytest
+
+from ner_agent import AhoCorasick, NerAgent, NormalizedText, SpanResolver
+
+
+def _reference_claim_span(
+    original_text: str, surface: str, used_spans: list[tuple[int, int]]
+) -> tuple[int, int]:
+    """The `_claim_span` helper SpanResolver replaces."""
+    if not original_text:
+        return (0, 0)
+    for mt in re.finditer(re.escape(surface), original_text):
+        s, e = mt.span()
+        if all(not (s < ue and e > us) for us, ue in used_spans):
+            used_spans.append((s, e))
+            return (s, e)
+    return (-1, -1)
+
+
+def test_aho_corasick_reports_all_occurrences():
+    matcher = AhoCorasick(["he", "she", "his", "hers"])
+    assert sorted(matcher.iter_matches("ushers")) == [(1, 1), (2, 0), (2, 3)]
+
+
+def test_span_resolver_keeps_claim_semantics():
+    text = "Paris and Paris Hilton met in Paris."
+    resolver = SpanResolver(text)
+    resolver.prime(["Paris", "Paris Hilton", "Rome"])
+
+    assert resolver.claim("Paris Hilton") == (10, 22)
+    assert resolver.claim("Paris") == (0, 5)
+    assert resolver.claim("Paris") == (30, 35)
+    assert resolver.claim("Paris") == (-1, -1)
+    assert resolver.claim("Rome") == (-1, -1)
+    assert resolver.claim("met") == (23, 26)  # not primed
+    assert SpanResolver("").claim("Paris") == (0, 0)
+
+
+def test_span_resolver_fuzz_against_reference():
+    rng = random.Random(7)
+    for _ in range(1000):
+        text = "".join(rng.choice("ab ") for _ in range(rng.randint(0, 30)))
+        surfaces = [
+            "".join(rng.choice("ab ") for _ in range(rng.randint(0, 3)))
+            for _ in range(rng.randint(0, 12))
+        ]
+
+        used_spans: list[tuple[int, int]] = []
+        expected = [_reference_claim_span(text, s, used_spans) for s in surfaces]
+
+        resolver = SpanResolver(text, normalize=False)
+        resolver.prime(surfaces[: len(surfaces) // 2])
+        assert [resolver.claim(s) for s in surfaces] == expected, (text, surfaces)
+
+
+def test_span_resolver_scales_to_many_repeated_entities():
+    names = [f"Company {i:03d}" for i in range(300)]
+    text = " ".join(names * 20)
+    surfaces = names * 20
+
+    started = time.perf_counter()
+    resolver = SpanResolver(text)
+    resolver.prime(surfaces)
+    spans = [resolver.claim(s) for s in surfaces]
+    elapsed = time.perf_counter() - started
+
+    assert all(text[s:e] == surface for (s, e), surface in zip(spans, surfaces))
+    assert elapsed < 2.0
+
+
+@pytest.mark.parametrize(
+    "text,surface,expected",
+    [
+        ("L’Hôpital  Saint‑Louis", "L'Hôpital Saint-Louis", "L’Hôpital  Saint‑Louis"),
+        ("新台幣３５,０００元", "新台幣35,000元", "新台幣３５,０００元"),
+        ("Café de Flore", "Café de Flore", "Café de Flore"),
+        ("the “Dream Team” won", '"Dream Team"', "“Dream Team”"),
+        ("New\nYork", "New York", "New\nYork"),
+    ],
+)
+def test_span_resolver_aligns_normalized_surfaces(
+    text: str, surface: str, expected: str
+):
+    for primed in (True, False):
+        resolver = SpanResolver(text)
+        if primed:
+            resolver.prime([surface])
+        start, end = resolver.claim(surface)
+        assert text[start:end] == expected
+
+
+def test_span_resolver_prefers_exact_occurrences():
+    text = "Ｔｏｋｙｏ and Tokyo"
+    resolver = SpanResolver(text)
+    assert resolver.claim("Tokyo") == (10, 15)
+    assert resolver.claim("Tokyo") == (0, 5)
+    assert resolver.claim("Tokyo") == (-1, -1)
+
+
+def test_normalized_text_maps_offsets():
+    normalized = NormalizedText("a　　ｂ")
+    assert normalized.text == "a b"
+    assert normalized.to_original(2, 3) == (3, 4)
+
+
+def test_parse_entities_aligns_normalized_surfaces():
+    text = "L’Hôpital Saint-Louis est à Paris."
+    entities = NerAgent()._parse_entities(
+        "[L'Hôpital Saint-Louis](#LOCATION) | [Paris](#LOCATION)",
+        original_text=text,
+    )
+    assert [(e.start, e.end) for e in entities] == [(0, 21), (28, 33)]
@@ -0,0 +1,78 @@
+# tests/test_synonyms.py
+import json
+
+import pytest
+
+from ner_agent import NerAgent, SynonymVerdict, SynonymVerdictStore
+
+
+def test_store_is_order_and_case_insensitive():
+    store = SynonymVerdictStore()
+    store.record(["Hong Kong", "香港"], True, "Hong Kong")
+
+    assert store.lookup(["香港", "hong kong"]) == SynonymVerdict(True, "Hong Kong")
+    assert store.lookup(["ＨＯＮＧ ＫＯＮＧ", "香港"]) == SynonymVerdict(
+        True, "Hong Kong"
+    )
+    assert store.lookup(["Hong Kong", "Kowloon"]) is None
+
+
+def test_store_answers_subsets_of_positive_groups():
+    store = SynonymVerdictStore()
+    store.record(["Jensen Huang", "黃仁勳"], True, "Jensen Huang")
+    store.record(["黃仁勳", "jensenhuang"], True, "黃仁勳")
+
+    assert store.lookup(["jensenhuang", "Jensen Huang"]) == SynonymVerdict(
+        True, "Jensen Huang"
+    )
+    assert store.lookup(["jensenhuang"]) == SynonymVerdict(True, "Jensen Huang")
+
+
+def test_store_answers_supersets_of_negative_sets():
+    store = SynonymVerdictStore()
+    store.record(["Apple", "Microsoft"], False)
+    store.record(["Microsoft", "MSFT"], True, "Microsoft")
+
+    assert store.lookup(["Nvidia", "microsoft", "Apple"]) == SynonymVerdict(False)
+    # "MSFT" is in Microsoft's group, so the Apple/Microsoft verdict applies.
+    assert store.lookup(["MSFT", "Apple"]) == SynonymVerdict(False)
+    assert store.lookup(["Nvidia", "Apple"]) is None
+
+
+def test_store_answers_single_names_from_negative_sets():
+    store = SynonymVerdictStore()
+    store.record(["Apple", "Orange"], False)
+
+    assert store.lookup(["Apple"]) == SynonymVerdict(True, "Apple")
+    assert "apple" not in store._groups
+
+    store.record(["Apple", "AAPL"], True)
+    assert store.lookup(["aapl"]) == SynonymVerdict(True, "aapl")
+    assert store.lookup(["AAPL", "Orange"]) == SynonymVerdict(False)
+
+
+def test_store_keeps_canonical_names_stable():
+    store = SynonymVerdictStore()
+    store.record(["New York City", "NYC"], True, "New York City")
+
+    verdict = store.record(["NYC", "New York", "Big Apple"], True, "New York")
+
+    assert verdict == SynonymVerdict(True, "New York City")
+    assert store.lookup(["Big Apple", "New York City"]) == verdict
+
+
+@pytest.mark.asyncio
+async def test_ner_agent_reuses_synonym_verdicts(scripted_model_cls):
+    model = scripted_model_cls(
+        lambda *_: json.dumps({"is_synonymous": True, "canonical_name": "Hong Kong"})
+    )
+    agent = NerAgent(synonym_store=SynonymVerdictStore())
+
+    first = await agent.analyze_synonyms_and_canonical_name(
+        ["Hong Kong", "香港", "HK"], model=model
+    )
+    again = await agent.analyze_synonyms_and_canonical_name(["hk", "香港"], model=model)
+
+    assert first.canonical_name == again.canonical_name == "Hong Kong"
+    assert again.is_synonymous
+    assert len(model.calls) == 1